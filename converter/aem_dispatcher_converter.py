@@ -13,18 +13,28 @@
 """
 
 from util import constants
+from util.config_tree import config_tree
+from util.conversion_manifest import ConversionManifest
 from util.conversion_report.conversion_step import ConversionStep
 from util.conversion_report.conversion_operation import ConversionOperation
 from util.file_operations_utility import FileOperationsUtility
+from util.farm_file_parser import FarmFileParser
+from util.file_transformer import FileTransformer
 from util.folder_operations_utility import FolderOperationsUtility
+from util.parse_cache import ParseCache
+from util.rule_scheduler import RuleScheduler
 from util.setup_logger_utility import logger
+from util.symlink_resolver import symlink_resolver
+from util.variable_index import VariableIndex
+from util.vhost_file_parser import VhostFileParser
 from util.conversion_report.summary_report_writer import SummaryReportWriter
 
-from glob import glob
+from functools import partial
 from ntpath import basename
 from os import linesep
-from os.path import exists, isfile, join, dirname
-from shutil import copy
+from os.path import abspath, join, dirname
+# the standard output of the process, even while the messages of the rules are redirected (e.g. to the standard error)
+from sys import stdout
 
 
 class AEMDispatcherConverter:
@@ -36,22 +46,79 @@ class AEMDispatcherConverter:
     Attributes:
         __sdk_src_path (str): The path to the Dispatcher SDK `src` folder.
         __dispatcher_config_directory (str): The path to the dispatcher configuration `src` folder .
+        __workers (int): The number of worker processes transforming the vhost and farm files.
+        __summary_report_file (str): The path of the summary report.
+        __source_config_directory (str): The path to the dispatcher configuration (folder or archive) staged into
+        `__dispatcher_config_directory`, `None` if the conversion is performed in place.
+        __link_mode (str): How the files left unchanged are staged (copied, reflinked or hardlinked).
+        __sdk_store_path (str): The path to the `SdkStore` folder the SDK files are kept in, `None` if not stored.
+        __dry_run (bool): Whether the conversion is only computed in memory, without writing anything.
+        __patch_file (str): The path of the patch of the conversion to write (`-` for the standard output), `None`
+        for no patch.
+        __manifest_file (str): The path of the `ConversionManifest` of the conversion, `None` to run all rules.
+        __parse_cache_path (str): The path to the `ParseCache` folder the parsed farm and vhost files are kept in,
+        `None` if not cached.
+        __parse_cache_size (int): The maximum size of the parse cache, in megabytes.
+        __changed_file_count (int): The number of files changed (written or removed) by the conversion.
     """
 
     # private attributes
     __sdk_src_path = None
     __dispatcher_config_directory = None
     __conversion_steps = None
+    __workers = 1
+    __summary_report_file = None
+    __source_config_directory = None
+    __link_mode = constants.LINK_MODE_COPY
+    __sdk_store_path = None
+    __dry_run = False
+    __patch_file = None
+    __manifest_file = None
+    __parse_cache_path = None
+    __parse_cache_size = constants.PARSE_CACHE_SIZE
+    __changed_file_count = 0
 
-    def __init__(self, sdk_src_path, dispatcher_config_path):
+    def __init__(self, sdk_src_path, dispatcher_config_path, workers=1,
+                 summary_report_file=constants.SUMMARY_REPORT_FILE, source_config_path=None,
+                 link_mode=constants.LINK_MODE_COPY, sdk_store_path=None, dry_run=False, patch_file=None,
+                 manifest_file=None, parse_cache_path=None, parse_cache_size=constants.PARSE_CACHE_SIZE):
         """
          Parameters:
             sdk_src_path (str): path to the src folder of the dispatcher sdk
             dispatcher_config_path (str): path to dispatcher config folder where the conversion is to be performed
+            workers (int): number of worker processes transforming the vhost and farm files (1 for no worker process)
+            summary_report_file (str): path of the summary report
+            source_config_path (str): path to the dispatcher config folder (or `.zip` or `.tar.gz` archive) to be
+                staged (only the files remaining after the conversion) into `dispatcher_config_path`, `None` to
+                convert `dispatcher_config_path` in place
+            link_mode (str): how the files left unchanged are staged (`copy`, `reflink` or `hardlink`)
+            sdk_store_path (str): path to the store folder of the sdk files, from which the sdk files copied into the
+                configuration are staged (`None` not to store them)
+            dry_run (bool): whether to compute the conversion (and its conversion steps) in memory only, without
+                writing the converted configuration or the summary report
+            patch_file (str): path of the patch (applicable with `git apply` to the original config folder) of the
+                changes made by the conversion, `-` for the standard output, `None` for no patch
+            manifest_file (str): path of the manifest of the conversion, with which only the rules whose inputs
+                changed since the previous conversion (of a configuration staged from `source_config_path` into the
+                same folder) run again, `None` to run all rules
+            parse_cache_path (str): path to the cache folder of the parsed farm and vhost files, from which the files
+                parsed by earlier runs are loaded (`None` not to cache them)
+            parse_cache_size (int): maximum size of the parse cache in megabytes, the least recently used entries
+                being evicted
         """
         self.__sdk_src_path = sdk_src_path
         self.__dispatcher_config_directory = dispatcher_config_path
         self.__conversion_steps = []
+        self.__workers = workers
+        self.__summary_report_file = summary_report_file
+        self.__source_config_directory = source_config_path
+        self.__link_mode = link_mode
+        self.__sdk_store_path = sdk_store_path
+        self.__dry_run = dry_run
+        self.__patch_file = patch_file
+        self.__manifest_file = manifest_file
+        self.__parse_cache_path = parse_cache_path
+        self.__parse_cache_size = parse_cache_size
 
     # execute all conversion rules
     def __transform__(self):
@@ -60,25 +127,128 @@ class AEMDispatcherConverter:
         [1]: https://git.corp.adobe.com/Granite/skyline-dispatcher-sdk/blob/master/docs/TransitionFromAMS.md
         """
 
-        # self.__extract_archive()
-        self.__remove_unused_folders_files()
-        self.__remove_non_publish_vhost_files()
-        self.__remove_vhost_section_not_referring_to_port_80()
-        self.__replace_variable_in_vhost_files()
-        self.__check_rewrites()
-        self.__check_variables()
-        self.__remove_whitelists()
-        self.__remove_non_publish_farms()
-        self.__rename_farm_files()
-        self.__check_cache()
-        self.__check_client_headers()
-        self.__check_filter()
-        self.__check_renders()
-        self.__check_virtualhosts()
-        self.__replace_variable_in_farm_files()
-        self.__remove_non_whitelisted_directives()
+        # the SDK files are read once (and kept in the store, to stage the default files copied from the SDK)
+        if self.__sdk_store_path is not None and not self.__dry_run:
+            config_tree.__load_read_only__(self.__sdk_src_path, self.__sdk_store_path)
+        # the farm and vhost files parsed by earlier runs are loaded from the parse cache (a dry run writes nothing to
+        # it, neither new entries nor evictions)
+        parse_cache = None
+        if self.__parse_cache_path is not None:
+            parse_cache = ParseCache(self.__parse_cache_path, self.__parse_cache_size * 1024 * 1024,
+                                     [FarmFileParser.__parse__, VhostFileParser.__parse__], self.__dry_run)
+        config_tree.__set_parse_cache__(parse_cache)
+        # load the configuration tree once (straight from the archive, if the configuration is one), all rules work
+        # on the in-memory tree
+        config_tree.__load__(self.__dispatcher_config_directory, self.__source_config_directory, self.__link_mode,
+                             self.__dry_run, self.__patch_file is not None)
+        # read the files of the rules ahead, in the order the rules work on them, while the rules run
+        config_tree.__prefetch__([join(self.__dispatcher_config_directory, "**", "*." + extension)
+                                  for extension in (constants.VHOST, "rules", "vars", constants.ANY)])
+        # every rule declares the folders it reads and writes: the rules of the vhost side (conf.d) and of the farm
+        # side (conf.dispatcher.d) are independent, and run concurrently with several workers
+        conf_dir_path = join(self.__dispatcher_config_directory, constants.CONF)
+        conf_modules_d_dir_path = join(self.__dispatcher_config_directory, constants.CONF_MODULES_D)
+        conf_d_dir_path = join(self.__dispatcher_config_directory, constants.CONF_D)
+        conf_dispatcher_d_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D)
+        vhost_rules = [self.__remove_non_publish_vhost_files,
+                       # rules 3 and 7 only rewrite lines of the vhost files, they are fused into a single pass over
+                       # each file
+                       self.__transform_vhost_files,
+                       self.__check_rewrites]
+        farm_rules = [self.__remove_non_publish_farms,
+                      self.__rename_farm_files,
+                      self.__check_cache,
+                      self.__check_client_headers,
+                      self.__check_filter,
+                      self.__check_renders,
+                      self.__check_virtualhosts,
+                      self.__replace_variable_in_farm_files]
+        # with a manifest, the rules whose inputs did not change since the previous conversion do not run again
+        manifest = None
+        if self.__manifest_file is not None:
+            manifest = ConversionManifest(self.__manifest_file,
+                                          {"dispatcher_config_path": abspath(self.__dispatcher_config_directory),
+                                           "sdk_src_path": abspath(self.__sdk_src_path),
+                                           "link_mode": self.__link_mode})
+        rule_scheduler = RuleScheduler(self.__workers, manifest)
+        rule_scheduler.__add_rule__(partial(self.__run_rule, self.__remove_unused_folders_files), [],
+                                    [conf_dir_path, conf_modules_d_dir_path, conf_d_dir_path])
+        for rule in vhost_rules:
+            rule_scheduler.__add_rule__(partial(self.__run_rule, rule), [conf_d_dir_path], [conf_d_dir_path])
+        # the variable usages of the farm files are checked as well: only the variables they use are inputs of the
+        # rule, so editing a farm file does not make the vhost rules run again (the SDK is only read for global.vars)
+        rule_scheduler.__add_rule__(partial(self.__run_rule, self.__check_variables),
+                                    [conf_d_dir_path, join(self.__sdk_src_path, "conf.d", "variables", "global.vars")],
+                                    [conf_d_dir_path],
+                                    [(conf_dispatcher_d_dir_path, VariableIndex.__find_used_names__)])
+        rule_scheduler.__add_rule__(partial(self.__run_rule, self.__remove_whitelists), [conf_d_dir_path],
+                                    [conf_d_dir_path])
+        for rule in farm_rules:
+            rule_scheduler.__add_rule__(partial(self.__run_rule, rule),
+                                        [conf_dispatcher_d_dir_path, self.__sdk_src_path],
+                                        [conf_dispatcher_d_dir_path])
+        rule_scheduler.__add_rule__(partial(self.__run_rule, self.__remove_non_whitelisted_directives),
+                                    [conf_d_dir_path], [conf_d_dir_path])
+        # run the rules and write the converted configuration tree back to disk, the conversion steps are reported
+        # in the order of the rules
+        self.__conversion_steps = rule_scheduler.__run__()
+        self.__changed_file_count = rule_scheduler.__get_changed_file_count__()
+        # the files are written behind, the conversion is complete once they are all on disk
+        config_tree.__wait_for_writes__()
+        if manifest is not None:
+            manifest.__write__()
+        if parse_cache is not None:
+            parse_cache.__evict__()
+        if self.__patch_file is not None:
+            self.__write_patch(rule_scheduler.__get_patch_entries__())
+        if self.__dry_run:
+            # the summary report is left to the caller (see `SummaryReportWriter.__get_summary_report__`)
+            logger.info("AEMDispatcherConverter: Dry run, %d files would change.", self.__changed_file_count)
+            return
+        logger.info("AEMDispatcherConverter: Changed %d files.", self.__changed_file_count)
         # create the summary report for the conversion performed
-        SummaryReportWriter.__write_summary_report__(self.__conversion_steps)
+        SummaryReportWriter.__write_summary_report__(self.__conversion_steps, self.__summary_report_file)
+
+    def __get_conversion_steps__(self):
+        """
+        Get the conversion steps performed by `__transform__`.
+        """
+        return self.__conversion_steps
+
+    def __get_changed_file_count__(self):
+        """
+        Get the number of files changed (written or removed) by `__transform__` (or which would be changed, in a dry
+        run), files left unchanged by the rules are not written.
+        """
+        return self.__changed_file_count
+
+    def __write_patch(self, patch_entries):
+        """
+        Write the patch of the changes made by the conversion, one file entry after the other.
+        """
+        if self.__patch_file == "-":
+            stdout.writelines(entry for path, entry in patch_entries)
+            stdout.flush()
+        else:
+            with open(self.__patch_file, "w") as file:
+                file.write("".join(entry for path, entry in patch_entries))
+        logger.info("AEMDispatcherConverter: Wrote a patch of %d files to %s.", len(patch_entries),
+                    "the standard output" if self.__patch_file == "-" else self.__patch_file)
+
+    def __run_rule(self, rule):
+        """
+        Run given rule (see `RuleScheduler`), returning the conversion steps it performed.
+        """
+        step_count = len(self.__conversion_steps)
+        rule()
+        return self.__conversion_steps[step_count:]
+
+    # 3. and 7. Rewrite the lines of the vhost files, in a single pass over each file
+    def __transform_vhost_files(self):
+        vhost_file_transformer = FileTransformer(self.__workers)
+        self.__remove_vhost_section_not_referring_to_port_80(vhost_file_transformer)
+        self.__replace_variable_in_vhost_files(vhost_file_transformer)
+        vhost_file_transformer.__apply__()
 
     # 1. Get rid of unused subfolders and files.
     # Remove subfolders conf and conf.modules.d, as well as files matching conf.d/*.conf.
@@ -111,9 +281,9 @@ class AEMDispatcherConverter:
             FileOperationsUtility.__delete_all_files_containing_substring__(enabled_vhosts_dir_path, keyword,
                                                                             conversion_step)
         # check for non-symlink enabled_vhost files
-        enabled_vhost_files = [f for f in glob(join(enabled_vhosts_dir_path, "**", "*." + constants.VHOST), recursive=True)]
+        enabled_vhost_files = config_tree.__glob__(join(enabled_vhosts_dir_path, "**", "*." + constants.VHOST))
         for file in enabled_vhost_files:
-            if not self.__is_symlink_file(file):
+            if not symlink_resolver.__is_symlink_file__(file):
                 conversion_operation = ConversionOperation(constants.WARNING, file, "Found non-symlink enabled_vhost file.")
                 conversion_step.__add_operation__(conversion_operation)
                 logger.info("AEMDispatcherConverter: Found non-symlink enabled_vhost file %s", file)
@@ -142,14 +312,16 @@ class AEMDispatcherConverter:
     # ...
     # </VirtualHost>
     # remove them
-    def __remove_vhost_section_not_referring_to_port_80(self):
+    def __remove_vhost_section_not_referring_to_port_80(self, file_transformer):
         conversion_step = self.__remove_vhost_section_not_referring_to_port_80_summary_generator()
         enabled_vhost_dir_path = join(self.__dispatcher_config_directory, constants.CONF_D,
                                       constants.ENABLED_VHOSTS)
         available_vhost_dir_path = join(self.__dispatcher_config_directory, constants.CONF_D,
                                         constants.AVAILABLE_VHOSTS)
-        FileOperationsUtility.__remove_virtual_host_sections_not_port_80__(enabled_vhost_dir_path, conversion_step)
-        FileOperationsUtility.__remove_virtual_host_sections_not_port_80__(available_vhost_dir_path, conversion_step)
+        FileOperationsUtility.__remove_virtual_host_sections_not_port_80__(enabled_vhost_dir_path, conversion_step,
+                                                                           file_transformer)
+        FileOperationsUtility.__remove_virtual_host_sections_not_port_80__(available_vhost_dir_path, conversion_step,
+                                                                           file_transformer)
         self.__conversion_steps.append(conversion_step)
 
     def __remove_vhost_section_not_referring_to_port_80_summary_generator(self):
@@ -168,27 +340,22 @@ class AEMDispatcherConverter:
         rewrites_dir_path = join(self.__dispatcher_config_directory, constants.CONF_D, "rewrites")
         # Remove any file named base_rewrite.rules and xforwarded_forcessl_rewrite.rules and remember to remove Include
         # statements in the virtual host files referring to them.
-        base_rewrite_rules_file = "base_rewrite.rules"
-        xforwarded_forcessl_rewrite_rules = "xforwarded_forcessl_rewrite.rules"
-        if isfile(join(rewrites_dir_path, base_rewrite_rules_file)):
-            logger.debug("AEMDispatcherConverter: Removing %s.", base_rewrite_rules_file)
-            FileOperationsUtility.__remove_include_statement_for_some_rule__(conf_d_dir_path,
-                                                                             constants.INCLUDE_SYNTAX_IN_VHOST,
-                                                                             constants.VHOST,
-                                                                             base_rewrite_rules_file, conversion_step)
-            FileOperationsUtility.__delete_file__(join(rewrites_dir_path, base_rewrite_rules_file),
-                                                  conversion_step)
-        if isfile(join(rewrites_dir_path, xforwarded_forcessl_rewrite_rules)):
-            logger.debug("AEMDispatcherConverter: Removing %s.", xforwarded_forcessl_rewrite_rules)
-            FileOperationsUtility.__remove_include_statement_for_some_rule__(conf_d_dir_path,
-                                                                             constants.INCLUDE_SYNTAX_IN_VHOST,
-                                                                             constants.VHOST,
-                                                                             xforwarded_forcessl_rewrite_rules,
-                                                                             conversion_step)
-            FileOperationsUtility.__delete_file__(join(rewrites_dir_path, xforwarded_forcessl_rewrite_rules),
-                                                  conversion_step)
+        rewrite_rules_files_to_remove = [file_name for file_name in
+                                         ["base_rewrite.rules", "xforwarded_forcessl_rewrite.rules"]
+                                         if config_tree.__isfile__(join(rewrites_dir_path, file_name))]
+        for file_name in rewrite_rules_files_to_remove:
+            logger.debug("AEMDispatcherConverter: Removing %s.", file_name)
+        # every file is deleted once the removal of its Include statements is reported
+        files_by_name = dict((file_name, [join(rewrites_dir_path, file_name)])
+                             for file_name in rewrite_rules_files_to_remove)
+        FileOperationsUtility.__remove_include_statements_for_rules__(conf_d_dir_path,
+                                                                      constants.INCLUDE_SYNTAX_IN_VHOST,
+                                                                      constants.VHOST, rewrite_rules_files_to_remove,
+                                                                      conversion_step,
+                                                                      partial(self.__delete_files_named, files_by_name,
+                                                                              conversion_step))
 
-        files = [f for f in glob(join(rewrites_dir_path, "**", "*.rules"), recursive=True)]
+        files = config_tree.__glob__(join(rewrites_dir_path, "**", "*.rules"))
         file_count = len(files)
         # If conf.d/rewrites now contains a single file
         if file_count == 1:
@@ -207,17 +374,13 @@ class AEMDispatcherConverter:
             # If the folder however contains multiple virtual host specific files
             available_vhost_files = self.__get_all_available_vhost_files()
             if len(available_vhost_files) > 1:
-                for file in files:
-                    old_file_name = basename(file)
-                    # their contents should be copied to the Include statement referring to them in the virtual host files.
-                    rules_extracted_from_file = FileOperationsUtility.__get_content_from_file__(file, True)
-                    FileOperationsUtility.__replace_include_statement_with_content_of_rule_file__(conf_d_dir_path,
-                                                                                                  constants.VHOST,
-                                                                                                  old_file_name,
-                                                                                                  rules_extracted_from_file,
-                                                                                                  constants.INCLUDE_SYNTAX_IN_VHOST,
-                                                                                                  conversion_step)
-                    FileOperationsUtility.__delete_file__(file, conversion_step)
+                # their contents should be copied to the Include statement referring to them in the virtual host files,
+                # all of them in a single pass over each virtual host file, every file being deleted once the
+                # replacement of its Include statements is reported
+                rule_file_contents, files_by_name = self.__get_contents_of_files_by_name(files)
+                FileOperationsUtility.__replace_include_statements_with_content_of_rule_files__(
+                    conf_d_dir_path, constants.VHOST, rule_file_contents, constants.INCLUDE_SYNTAX_IN_VHOST,
+                    conversion_step, partial(self.__delete_files_named, files_by_name, conversion_step))
             elif len(available_vhost_files) == 1:
                 # If the folder however contains multiple rule files specific to a single vhost file, we should
                 # consolidate all the included rule file into a single rule file and include it.
@@ -267,7 +430,7 @@ class AEMDispatcherConverter:
         # Remove any file named ams_default.vars and remember to remove Include statements in the virtual host files
         # referring to them.
         ams_default_vars_file = "ams_default.vars"
-        if isfile(join(variables_dir_path, ams_default_vars_file)):
+        if config_tree.__isfile__(join(variables_dir_path, ams_default_vars_file)):
             logger.debug("AEMDispatcherConverter: Removing %s.", ams_default_vars_file)
             FileOperationsUtility.__remove_include_statement_for_some_rule__(conf_d_dir_path,
                                                                              constants.INCLUDE_SYNTAX_IN_VHOST,
@@ -278,23 +441,32 @@ class AEMDispatcherConverter:
                                                                                      conversion_step)
         # consolidate all variable file into once "custom.vars"
         custom_vars_file = join(variables_dir_path, "custom.vars")
-        variables_list = FileOperationsUtility.__consolidate_variable_files__(files, custom_vars_file,
-                                                                              conversion_step)
-        # adapt the Include statements referring to the old var files in the vhost files.
+        variable_index = VariableIndex()
+        FileOperationsUtility.__consolidate_variable_files__(files, custom_vars_file, conversion_step, variable_index)
+        # adapt the Include statements referring to the old var files in the vhost files, and delete the old files
+        # (every file once the replacement of its Include statements is reported)
+        files_by_name = {}
         for file in files:
-            FileOperationsUtility.__replace_file_name_in_include_statement__(conf_d_dir_path,
-                                                                             constants.VHOST,
-                                                                             constants.INCLUDE_SYNTAX_IN_VHOST,
-                                                                             basename(file),
-                                                                             basename(custom_vars_file),
-                                                                             conversion_step)
-            # delete the old files
-            FileOperationsUtility.__delete_file__(file, conversion_step)
-        # check for undefined variables
-        FileOperationsUtility.__check_for_undefined_variables__(conf_d_dir_path, variables_list)
+            files_by_name.setdefault(basename(file), []).append(file)
+        FileOperationsUtility.__replace_file_names_in_include_statements__(conf_d_dir_path,
+                                                                           constants.VHOST,
+                                                                           constants.INCLUDE_SYNTAX_IN_VHOST,
+                                                                           dict((file_name,
+                                                                                 basename(custom_vars_file))
+                                                                                for file_name in files_by_name),
+                                                                           conversion_step,
+                                                                           partial(self.__delete_files_named,
+                                                                                   files_by_name, conversion_step))
         # Copy the file conf.d/variables/global.vars from the default skyline dispatcher configuration to that location.
         default_global_vars_file_from_sdk = join(self.__sdk_src_path, "conf.d", "variables", "global.vars")
-        copy(default_global_vars_file_from_sdk, variables_dir_path)
+        # check for undefined and unused variables, the variables of global.vars are defined as well
+        if config_tree.__isfile__(default_global_vars_file_from_sdk):
+            variable_index.__add_definitions__(default_global_vars_file_from_sdk,
+                                               config_tree.__read_lines__(default_global_vars_file_from_sdk))
+        conf_dispatcher_d_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D)
+        FileOperationsUtility.__check_variables__(conf_d_dir_path, conf_dispatcher_d_dir_path, variable_index,
+                                                  conversion_step)
+        config_tree.__copy__(default_global_vars_file_from_sdk, variables_dir_path)
         logger.info(
             "AEMDispatcherConverter: Copied file 'conf.d/variables/global.vars' from the "
             "standard dispatcher configuration to %s.", variables_dir_path)
@@ -315,14 +487,13 @@ class AEMDispatcherConverter:
         conversion_step = self.__remove_whitelists_summary_generator()
         conf_d_dir_path = join(self.__dispatcher_config_directory, constants.CONF_D)
         whitelists_dir_path = join(self.__dispatcher_config_directory, constants.CONF_D, "whitelists")
-        files = [f for f in glob(join(whitelists_dir_path, "**", "*.*"), recursive=True)]
+        files = config_tree.__glob__(join(whitelists_dir_path, "**", "*.*"))
         # remove Include statements in the virtual host files referring to some file in that subfolder.
-        for file in files:
-            old_file_name = basename(file)
-            FileOperationsUtility.__remove_include_statement_for_some_rule__(conf_d_dir_path,
-                                                                             constants.INCLUDE_SYNTAX_IN_VHOST,
-                                                                             constants.VHOST, old_file_name,
-                                                                             conversion_step)
+        FileOperationsUtility.__remove_include_statements_for_rules__(conf_d_dir_path,
+                                                                      constants.INCLUDE_SYNTAX_IN_VHOST,
+                                                                      constants.VHOST,
+                                                                      [basename(file) for file in files],
+                                                                      conversion_step)
         # Remove the folder conf.d/whitelists
         FolderOperationsUtility.__delete_folder__(whitelists_dir_path, conversion_step)
         self.__conversion_steps.append(conversion_step)
@@ -334,7 +505,7 @@ class AEMDispatcherConverter:
                               "the virtual host files referring to some file in that subfolder.")
 
     # 7. Replace any variable that is no longer available
-    def __replace_variable_in_vhost_files(self):
+    def __replace_variable_in_vhost_files(self, file_transformer):
         conversion_step = self.__replace_variable_in_vhost_files_summary_generator()
         logger.info(
             "AEMDispatcherConverter: Executing Rule : Replace any variable that is no longer available.")
@@ -342,24 +513,20 @@ class AEMDispatcherConverter:
                                          "In all virtual host files, rename `PUBLISH_DOCROOT` to `DOCROOT` and "
                                          "remove sections referring to variables named `DISP_ID` , "
                                          "`PUBLISH_FORCE_SSL` or `PUBLISH_WHITELIST_ENABLED`.")
-        # In all virtual host files rename PUBLISH_DOCROOT to DOCROOT
-        logger.debug("AEMDispatcherConverter: Renaming PUBLISH_DOCROOT to DOCROOT in all virtual host files.")
-        conf_d_dir_path = join(self.__dispatcher_config_directory, constants.CONF_D)
-        FileOperationsUtility.__replace_all_usage_of_old_variable_with_new_variable__(conf_d_dir_path,
-                                                                                      constants.VHOST,
-                                                                                      "PUBLISH_DOCROOT", "DOCROOT",
-                                                                                      conversion_step)
-        # In all virtual host files remove sections referring to variables named DISP_ID, PUBLISH_FORCE_SSL or
-        # PUBLISH_WHITELIST_ENABLED
+        # In all virtual host files rename PUBLISH_DOCROOT to DOCROOT, and remove sections referring to variables
+        # named DISP_ID, PUBLISH_FORCE_SSL or PUBLISH_WHITELIST_ENABLED (all in a single pass over each file)
         logger.debug(
-            "AEMDispatcherConverter: Removing sections referring to variables named DISP_ID, "
-            "PUBLISH_FORCE_SSL or PUBLISH_WHITELIST_ENABLED in all virtual host files.")
-        FileOperationsUtility.__remove_all_usage_of_old_variable__(conf_d_dir_path, constants.VHOST,
-                                                                   "DISP_ID", conversion_step)
-        FileOperationsUtility.__remove_all_usage_of_old_variable__(conf_d_dir_path, constants.VHOST,
-                                                                   "PUBLISH_FORCE_SSL", conversion_step)
-        FileOperationsUtility.__remove_all_usage_of_old_variable__(conf_d_dir_path, constants.VHOST,
-                                                                   "PUBLISH_WHITELIST_ENABLED", conversion_step)
+            "AEMDispatcherConverter: Renaming PUBLISH_DOCROOT to DOCROOT and removing sections referring to variables "
+            "named DISP_ID, PUBLISH_FORCE_SSL or PUBLISH_WHITELIST_ENABLED in all virtual host files.")
+        conf_d_dir_path = join(self.__dispatcher_config_directory, constants.CONF_D)
+        variable_actions = {
+            "PUBLISH_DOCROOT": (constants.VARIABLE_RENAME, "DOCROOT"),
+            "DISP_ID": (constants.VARIABLE_REMOVE, None),
+            "PUBLISH_FORCE_SSL": (constants.VARIABLE_REMOVE, None),
+            "PUBLISH_WHITELIST_ENABLED": (constants.VARIABLE_REMOVE, None)
+        }
+        FileOperationsUtility.__rewrite_variables__(conf_d_dir_path, constants.VHOST, variable_actions,
+                                                    conversion_step, file_transformer)
         self.__conversion_steps.append(conversion_step)
 
     def __replace_variable_in_vhost_files_summary_generator(self):
@@ -407,20 +574,20 @@ class AEMDispatcherConverter:
         conversion_step = self.__rename_farm_files_summary_generator()
         available_farms_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D,
                                         constants.AVAILABLE_FARMS)
-        files = [f for f in glob(join(available_farms_dir_path, "**", "*.any"), recursive=True)]
+        files = config_tree.__glob__(join(available_farms_dir_path, "**", "*.any"))
         for file in files:
             new_file_name = basename(file).replace("_farm", "").replace(".any", ".farm")
             FileOperationsUtility.__rename_file__(file, join(dirname(file), new_file_name), conversion_step)
         enabled_farms_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D,
                                       constants.ENABLED_FARMS)
-        files = [f for f in glob(join(enabled_farms_dir_path, "**", "*.any"), recursive=True)]
+        files = config_tree.__glob__(join(enabled_farms_dir_path, "**", "*.any"))
         for file in files:
             new_file_name = basename(file).replace("_farm", "").replace(".any", ".farm")
             FileOperationsUtility.__rename_file__(file, join(dirname(file), new_file_name), conversion_step)
         # check for non-symlink enabled_farm files
-        enabled_farm_files = [f for f in glob(join(enabled_farms_dir_path, "**", "*." + constants.FARM), recursive=True)]
+        enabled_farm_files = config_tree.__glob__(join(enabled_farms_dir_path, "**", "*." + constants.FARM))
         for file in enabled_farm_files:
-            if not self.__is_symlink_file(file):
+            if not symlink_resolver.__is_symlink_file__(file):
                 conversion_operation = ConversionOperation(constants.WARNING, file, "Found non-symlink enabled_farm file.")
                 conversion_step.__add_operation__(conversion_operation)
                 logger.info("AEMDispatcherConverter: Found non-symlink enabled_farm file %s", file)
@@ -430,7 +597,7 @@ class AEMDispatcherConverter:
     def __rename_symlink_target_links(self, conversion_step):
         enabled_farms_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D,
                                       constants.ENABLED_FARMS)
-        files = [f for f in glob(join(enabled_farms_dir_path, "**", "*.farm"), recursive=True)]
+        files = config_tree.__glob__(join(enabled_farms_dir_path, "**", "*.farm"))
         # in all enabled_farm files
         for file in files:
             # change the target links to point to the renamed files in available_farms
@@ -441,12 +608,11 @@ class AEMDispatcherConverter:
                 old_target_file_name = basename(old_target)
                 new_target_file_name = old_target_file_name.replace("_farm", "").replace(".any", ".farm")
                 new_target = old_target.replace(old_target_file_name, new_target_file_name)
-                with open(file, "w") as f:
-                    f.write(new_target)
-                    conversion_operation = ConversionOperation(constants.ACTION_RENAMED, file, "Renamed symlink target "
-                                                               + old_target + " to " + new_target)
-                    conversion_step.__add_operation__(conversion_operation)
-                    logger.info("Renamed symlink target in file %s , from '%s' to '%s'", file, old_target, new_target)
+                config_tree.__write_lines__(file, [new_target])
+                conversion_operation = ConversionOperation(constants.ACTION_RENAMED, file, "Renamed symlink target "
+                                                           + old_target + " to " + new_target)
+                conversion_step.__add_operation__(conversion_operation)
+                logger.info("Renamed symlink target in file %s , from '%s' to '%s'", file, old_target, new_target)
 
     def __rename_farm_files_summary_generator(self):
         logger.info(
@@ -464,27 +630,35 @@ class AEMDispatcherConverter:
         cache_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D, "cache")
         # Remove any file prefixed ams_.
         # remove include statements for the deleted files from farm files
-        ams_files = [f for f in glob(join(cache_dir_path, "**", "*ams_*.any"), recursive=True)]
-        cache_files = [f for f in glob(join(cache_dir_path, "**", "*.any"), recursive=True)]
-        for file in ams_files:
-            file_name = basename(file)
-            # if not all files start with 'ams' prefix, replace the $include rule
-            # if all files start with 'ams' prefix, the whole section will be replaced with $include "../cache/rules.any" later
-            if len(cache_files) > len(ams_files):
-                FileOperationsUtility.__replace_rule_in_include_statement__(conf_dispatcher_d_dir_path,
-                                                                            constants.FARM,
-                                                                            constants.INCLUDE_SYNTAX_IN_FARM,
-                                                                            file_name, '"../cache/default_rules.any"',
-                                                                            conversion_step)
-            FileOperationsUtility.__delete_file__(file, conversion_step)
+        ams_files = config_tree.__glob__(join(cache_dir_path, "**", "*ams_*.any"))
+        cache_files = config_tree.__glob__(join(cache_dir_path, "**", "*.any"))
+        # if not all files start with 'ams' prefix, replace the $include rule
+        # if all files start with 'ams' prefix, the whole section will be replaced with $include "../cache/rules.any" later
+        if len(cache_files) > len(ams_files):
+            # every file is deleted once the replacement of its $include rules is reported
+            ams_files_by_name = {}
+            for file in ams_files:
+                ams_files_by_name.setdefault(basename(file), []).append(file)
+            FileOperationsUtility.__replace_rules_in_include_statements__(conf_dispatcher_d_dir_path,
+                                                                          constants.FARM,
+                                                                          constants.INCLUDE_SYNTAX_IN_FARM,
+                                                                          dict((file_name,
+                                                                                '"../cache/default_rules.any"')
+                                                                               for file_name in ams_files_by_name),
+                                                                          conversion_step,
+                                                                          partial(self.__delete_files_named,
+                                                                                  ams_files_by_name, conversion_step))
+        else:
+            for file in ams_files:
+                FileOperationsUtility.__delete_file__(file, conversion_step)
         # If conf.dispatcher.d/cache is now empty, copy the file conf.dispatcher.d/cache/rules.any from the standard
         # dispatcher configuration to this folder.
         # The standard dispatcher configuration can be found in the folder src of the SDK
-        files = [f for f in glob(join(cache_dir_path, "**", "*.any"), recursive=True)]
+        files = config_tree.__glob__(join(cache_dir_path, "**", "*.any"))
         file_count = len(files)
         # copy the 'default_rules.any' file from sdk
         default_rules_file_from_sdk = join(self.__sdk_src_path, "conf.dispatcher.d", "cache", "default_rules.any")
-        copy(default_rules_file_from_sdk, cache_dir_path)
+        config_tree.__copy__(default_rules_file_from_sdk, cache_dir_path)
         logger.info(
             "AEMDispatcherConverter: Copied file 'conf.dispatcher.d/cache/default_rules.any' from the "
             "standard dispatcher configuration to %s.",
@@ -495,7 +669,7 @@ class AEMDispatcherConverter:
         conversion_step.__add_operation__(conversion_operation)
         if file_count == 0:
             rules_file_from_sdk = join(self.__sdk_src_path, "conf.dispatcher.d", "cache", "rules.any")
-            copy(rules_file_from_sdk, cache_dir_path)
+            config_tree.__copy__(rules_file_from_sdk, cache_dir_path)
             logger.info(
                 "AEMDispatcherConverter: Copied file 'conf.dispatcher.d/cache/rules.any' from the standard "
                 "dispatcher configuration to %s.",
@@ -526,16 +700,11 @@ class AEMDispatcherConverter:
             # their contents should be copied to the $include statement referring to them in the farm files.
             available_farm_files = self.__get_all_available_farm_files()
             if len(available_farm_files) > 1:
-                for file in files:
-                    if file.endswith("_cache.any"):
-                        content_from_cache_file = FileOperationsUtility.__get_content_from_file__(file, True)
-                        FileOperationsUtility.__replace_include_statement_with_content_of_rule_file__(
-                            conf_dispatcher_d_dir_path,
-                            constants.FARM, basename(file),
-                            content_from_cache_file,
-                            constants.INCLUDE_SYNTAX_IN_FARM,
-                            conversion_step)
-                        FileOperationsUtility.__delete_file__(file, conversion_step)
+                rule_file_contents, files_by_name = self.__get_contents_of_files_by_name(
+                    [file for file in files if file.endswith("_cache.any")])
+                FileOperationsUtility.__replace_include_statements_with_content_of_rule_files__(
+                    conf_dispatcher_d_dir_path, constants.FARM, rule_file_contents, constants.INCLUDE_SYNTAX_IN_FARM,
+                    conversion_step, partial(self.__delete_files_named, files_by_name, conversion_step))
             elif len(available_farm_files) == 1:
                 # If the folder however contains multiple rule files specific to a single farm file,, we should
                 # consolidate all the included rule file into a single rule file and include it.
@@ -569,7 +738,7 @@ class AEMDispatcherConverter:
         # configuration to that location.
         default_invalidate_file_from_sdk = join(self.__sdk_src_path, "conf.dispatcher.d", "cache",
                                                 "default_invalidate.any")
-        copy(default_invalidate_file_from_sdk, cache_dir_path)
+        config_tree.__copy__(default_invalidate_file_from_sdk, cache_dir_path)
         logger.info(
             "AEMDispatcherConverter: Copied file 'conf.dispatcher.d/cache/default_invalidate.any' from the "
             "standard dispatcher configuration to %s.", cache_dir_path)
@@ -620,7 +789,7 @@ class AEMDispatcherConverter:
         client_headers_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D,
                                        "clientheaders")
         # Remove any file prefixed ams_.
-        ams_files = [f for f in glob(join(client_headers_dir_path, "**", "*ams_*.any"), recursive=True)]
+        ams_files = config_tree.__glob__(join(client_headers_dir_path, "**", "*ams_*.any"))
         for file in ams_files:
             FileOperationsUtility.__delete_file__(file, conversion_step)
         files = FileOperationsUtility.__delete_all_files_not_conforming_to_pattern__(client_headers_dir_path, "*.any",
@@ -642,17 +811,12 @@ class AEMDispatcherConverter:
             # If the folder however contains multiple, farm specific files with that pattern,
             available_farm_files = self.__get_all_available_farm_files()
             if len(available_farm_files) > 1:
-                for file in files:
-                    if file.endswith("_clientheaders.any"):
-                        content_from_client_header_file = FileOperationsUtility.__get_content_from_file__(file, True)
-                        # their contents should be copied to the $include statement referring to them in the farm files.
-                        FileOperationsUtility.__replace_include_statement_with_content_of_rule_file__(
-                            conf_dispatcher_d_dir_path,
-                            constants.FARM, basename(file),
-                            content_from_client_header_file,
-                            constants.INCLUDE_SYNTAX_IN_FARM,
-                            conversion_step)
-                        FileOperationsUtility.__delete_file__(file, conversion_step)
+                # their contents should be copied to the $include statement referring to them in the farm files.
+                rule_file_contents, files_by_name = self.__get_contents_of_files_by_name(
+                    [file for file in files if file.endswith("_clientheaders.any")])
+                FileOperationsUtility.__replace_include_statements_with_content_of_rule_files__(
+                    conf_dispatcher_d_dir_path, constants.FARM, rule_file_contents, constants.INCLUDE_SYNTAX_IN_FARM,
+                    conversion_step, partial(self.__delete_files_named, files_by_name, conversion_step))
             elif len(available_farm_files) == 1:
                 # If the folder however contains multiple rule files specific to a single farm file, we should
                 # consolidate all the included rule file into a single rule file and include it.
@@ -715,14 +879,14 @@ class AEMDispatcherConverter:
         # configuration to that location.
         default_client_headers_file_from_sdk = join(self.__sdk_src_path, constants.CONF_DISPATCHER_D,
                                                     "clientheaders", "default_clientheaders.any")
-        copy(default_client_headers_file_from_sdk, client_headers_dir_path)
+        config_tree.__copy__(default_client_headers_file_from_sdk, client_headers_dir_path)
         logger.info(
             "AEMDispatcherConverter: Copied file 'conf.dispatcher.d/clientheaders/default_clientheaders.any' "
             "from the standard dispatcher configuration to %s.", client_headers_dir_path)
         conversion_step.__add_operation__(ConversionOperation(constants.ACTION_ADDED, client_headers_dir_path,
                                                               "Copied file 'conf.dispatcher.d/clientheaders/default_clientheaders.any' "
                                                               "from the standard dispatcher configuration to " + client_headers_dir_path))
-        if exists(join(client_headers_dir_path, "clientheaders.any")):
+        if config_tree.__exists__(join(client_headers_dir_path, "clientheaders.any")):
             # In each farm file, replace any clientheader include statements that looks as follows:
             # $include "/etc/httpd/conf.dispatcher.d/clientheaders/ams_publish_clientheaders.any"
             # $include "/etc/httpd/conf.dispatcher.d/clientheaders/ams_common_clientheaders.any"
@@ -740,7 +904,7 @@ class AEMDispatcherConverter:
             # configuration to that location.
             client_headers_file_from_sdk = join(self.__sdk_src_path, constants.CONF_DISPATCHER_D,
                                                 "clientheaders", "clientheaders.any")
-            copy(client_headers_file_from_sdk, client_headers_dir_path)
+            config_tree.__copy__(client_headers_file_from_sdk, client_headers_dir_path)
             logger.info(
                 "AEMDispatcherConverter: Copied file 'conf.dispatcher.d/clientheaders/clientheaders.any' "
                 "from the standard dispatcher configuration to %s.", client_headers_dir_path)
@@ -766,7 +930,7 @@ class AEMDispatcherConverter:
         conf_dispatcher_d_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D)
         filters_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D, "filters")
         # Remove any file prefixed ams_.
-        ams_files = [f for f in glob(join(filters_dir_path, "**", "*ams_*.any"), recursive=True)]
+        ams_files = config_tree.__glob__(join(filters_dir_path, "**", "*ams_*.any"))
         for file in ams_files:
             FileOperationsUtility.__delete_file__(file, conversion_step)
         files = FileOperationsUtility.__delete_all_files_not_conforming_to_pattern__(filters_dir_path, "*.any",
@@ -788,17 +952,12 @@ class AEMDispatcherConverter:
         elif file_count > 1:
             available_farm_files = self.__get_all_available_farm_files()
             if len(available_farm_files) > 1:
-                for file in files:
-                    if file.endswith("_filters.any"):
-                        content_from_client_header_file = FileOperationsUtility.__get_content_from_file__(file, True)
-                        # their contents should be copied to the $include statement referring to them in the farm files.
-                        FileOperationsUtility.__replace_include_statement_with_content_of_rule_file__(
-                            conf_dispatcher_d_dir_path,
-                            constants.FARM, basename(file),
-                            content_from_client_header_file,
-                            constants.INCLUDE_SYNTAX_IN_FARM,
-                            conversion_step)
-                        FileOperationsUtility.__delete_file__(file, conversion_step)
+                # their contents should be copied to the $include statement referring to them in the farm files.
+                rule_file_contents, files_by_name = self.__get_contents_of_files_by_name(
+                    [file for file in files if file.endswith("_filters.any")])
+                FileOperationsUtility.__replace_include_statements_with_content_of_rule_files__(
+                    conf_dispatcher_d_dir_path, constants.FARM, rule_file_contents, constants.INCLUDE_SYNTAX_IN_FARM,
+                    conversion_step, partial(self.__delete_files_named, files_by_name, conversion_step))
             elif len(available_farm_files) == 1:
                 # If the folder however contains multiple rule files specific to a single farm file, we should
                 # consolidate all the included rule file into a single rule file and include it.
@@ -854,7 +1013,7 @@ class AEMDispatcherConverter:
         # to that location.
         default_filters_file_from_sdk = join(self.__sdk_src_path, constants.CONF_DISPATCHER_D, "filters",
                                              "default_filters.any")
-        copy(default_filters_file_from_sdk, filters_dir_path)
+        config_tree.__copy__(default_filters_file_from_sdk, filters_dir_path)
         logger.info(
             "AEMDispatcherConverter: Copied file 'conf.dispatcher.d/filters/default_filters.any' from the "
             "standard dispatcher configuration to %s.", filters_dir_path)
@@ -862,7 +1021,7 @@ class AEMDispatcherConverter:
                                                               "Copied file 'conf.dispatcher.d/filters/default_filters.any' "
                                                               "from the standard dispatcher configuration to "
                                                               + filters_dir_path))
-        if exists(join(filters_dir_path, "filters.any")):
+        if config_tree.__exists__(join(filters_dir_path, "filters.any")):
             # In each farm file, replace any filter include statements that looks as follows:
             #
             # $include "/etc/httpd/conf.dispatcher.d/filters/ams_publish_filters.any"
@@ -881,7 +1040,7 @@ class AEMDispatcherConverter:
             # to that location.
             filters_file_from_sdk = join(self.__sdk_src_path, constants.CONF_DISPATCHER_D, "filters",
                                          "filters.any")
-            copy(filters_file_from_sdk, filters_dir_path)
+            config_tree.__copy__(filters_file_from_sdk, filters_dir_path)
             logger.info(
                 "AEMDispatcherConverter: Copied file 'conf.dispatcher.d/filters/filters.any' from the "
                 "standard dispatcher configuration to %s.", filters_dir_path)
@@ -909,14 +1068,14 @@ class AEMDispatcherConverter:
         conf_dispatcher_d_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D)
         renders_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D, "renders")
         # Remove all files in that folder.
-        files = [f for f in glob(join(renders_dir_path, "**", "*.any"), recursive=True)]
+        files = config_tree.__glob__(join(renders_dir_path, "**", "*.any"))
         for file in files:
             FileOperationsUtility.__delete_file__(file, conversion_step)
         # Copy the file conf.dispatcher.d/renders/default_renders.any from the default skyline dispatcher
         # configuration to that location.
         default_filters_file_from_sdk = join(self.__sdk_src_path, constants.CONF_DISPATCHER_D, "renders",
                                              "default_renders.any")
-        copy(default_filters_file_from_sdk, renders_dir_path)
+        config_tree.__copy__(default_filters_file_from_sdk, renders_dir_path)
         logger.info(
             "AEMDispatcherConverter: Copied file 'conf.dispatcher.d/renders/default_renders.any' from the "
             "standard dispatcher configuration to %s.", renders_dir_path)
@@ -975,17 +1134,12 @@ class AEMDispatcherConverter:
             # If the folder however contains multiple, farm specific files with that pattern,
             available_farm_files = self.__get_all_available_farm_files()
             if len(available_farm_files) > 1:
-                for file in files:
-                    if file.endswith("_vhosts.any"):
-                        content_from_vhost_file = FileOperationsUtility.__get_content_from_file__(file, True)
-                        # their contents should be copied to the $include statement referring to them in the farm files.
-                        FileOperationsUtility.__replace_include_statement_with_content_of_rule_file__(
-                            conf_dispatcher_d_dir_path,
-                            constants.FARM, basename(file),
-                            content_from_vhost_file,
-                            constants.INCLUDE_SYNTAX_IN_FARM,
-                            conversion_step)
-                        FileOperationsUtility.__delete_file__(file, conversion_step)
+                # their contents should be copied to the $include statement referring to them in the farm files.
+                rule_file_contents, files_by_name = self.__get_contents_of_files_by_name(
+                    [file for file in files if file.endswith("_vhosts.any")])
+                FileOperationsUtility.__replace_include_statements_with_content_of_rule_files__(
+                    conf_dispatcher_d_dir_path, constants.FARM, rule_file_contents, constants.INCLUDE_SYNTAX_IN_FARM,
+                    conversion_step, partial(self.__delete_files_named, files_by_name, conversion_step))
             elif len(available_farm_files) == 1:
                 # If the folder however contains multiple rule files specific to a single farm file, we should
                 # consolidate all the included rule file into a single rule file and include it.
@@ -1046,7 +1200,7 @@ class AEMDispatcherConverter:
         # configuration to that location.
         default_virtualhost_file_from_sdk = join(self.__sdk_src_path, constants.CONF_DISPATCHER_D, "virtualhosts",
                                                  "default_virtualhosts.any")
-        copy(default_virtualhost_file_from_sdk, dir_of_operation)
+        config_tree.__copy__(default_virtualhost_file_from_sdk, dir_of_operation)
         logger.info(
             "AEMDispatcherConverter: Copied file 'conf.dispatcher.d/virtualhosts/default_virtualhosts.any' "
             "from the standard dispatcher configuration to %s.", dir_of_operation)
@@ -1055,7 +1209,7 @@ class AEMDispatcherConverter:
                                                               "'conf.dispatcher.d/virtualhosts/default_virtualhosts.any'"
                                                               "'from the standard dispatcher configuration to "
                                                               + dir_of_operation))
-        if exists(join(dir_of_operation, "virtualhosts.any")):
+        if config_tree.__exists__(join(dir_of_operation, "virtualhosts.any")):
             # In each farm file, replace any filter include statements that looks as follows:
             # $include "/etc/httpd/conf.dispatcher.d/vhosts/ams_publish_vhosts.any"
             # with the statement:
@@ -1070,7 +1224,7 @@ class AEMDispatcherConverter:
         else:
             virtualhost_file_from_sdk = join(self.__sdk_src_path, constants.CONF_DISPATCHER_D, "virtualhosts",
                                              "virtualhosts.any")
-            copy(virtualhost_file_from_sdk, dir_of_operation)
+            config_tree.__copy__(virtualhost_file_from_sdk, dir_of_operation)
             logger.info(
                 "AEMDispatcherConverter: Copied file 'conf.dispatcher.d/virtualhosts/virtualhosts.any' "
                 "from the standard dispatcher configuration to %s.", dir_of_operation)
@@ -1114,10 +1268,11 @@ class AEMDispatcherConverter:
         conversion_step = self.__replace_variable_in_farm_files_summary_generator()
         # In all farm files rename PUBLISH_DOCROOT to DOCROOT
         conf_dispatcher_d_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D)
-        FileOperationsUtility.__replace_all_usage_of_old_variable_with_new_variable__(conf_dispatcher_d_dir_path,
-                                                                                      constants.FARM,
-                                                                                      "PUBLISH_DOCROOT", "DOCROOT",
-                                                                                      conversion_step)
+        farm_file_transformer = FileTransformer(self.__workers)
+        FileOperationsUtility.__rewrite_variables__(conf_dispatcher_d_dir_path, constants.FARM,
+                                                    {"PUBLISH_DOCROOT": (constants.VARIABLE_RENAME, "DOCROOT")},
+                                                    conversion_step, farm_file_transformer)
+        farm_file_transformer.__apply__()
         self.__conversion_steps.append(conversion_step)
 
     def __replace_variable_in_farm_files_summary_generator(self):
@@ -1128,26 +1283,61 @@ class AEMDispatcherConverter:
     def __get_all_available_vhost_files(self):
         available_vhosts_dir_path = join(self.__dispatcher_config_directory, constants.CONF_D,
                                         constants.AVAILABLE_VHOSTS)
-        files = [f for f in glob(join(available_vhosts_dir_path, "**", "*." + constants.VHOST), recursive=True)]
+        files = config_tree.__glob__(join(available_vhosts_dir_path, "**", "*." + constants.VHOST))
         return files
 
     def __get_all_available_farm_files(self):
         available_farms_dir_path = join(self.__dispatcher_config_directory, constants.CONF_DISPATCHER_D,
                                         constants.AVAILABLE_FARMS)
-        files = [f for f in glob(join(available_farms_dir_path, "**", "*." + constants.FARM), recursive=True)]
+        files = config_tree.__glob__(join(available_farms_dir_path, "**", "*." + constants.FARM))
         return files
 
     # delete all the non-included rule files, and return the files (file paths) that are actually included
+    def __get_contents_of_files_by_name(self, files):
+        """
+        Get the content of rule files (see `FileOperationsUtility.__get_content_from_file__`) by their name, e.g. to
+        replace their include statements with it. Of several files with the same name, the content of the first one is
+        used, as the include statements are replaced by then.
+
+        Parameters:
+            files (List[str]): The paths of the rule files
+
+        Returns:
+            Tuple[dict, dict]: The content of the rule files keyed by their name (in the order of `files`), and the
+            files to delete once the include statements of every name are replaced (a file named like a previous one
+            is deleted along with the file before it, i.e. in the order of `files`)
+        """
+        contents = {}
+        files_by_name = {}
+        previous_file_name = None
+        for file in files:
+            file_name = basename(file)
+            if file_name not in contents:
+                contents[file_name] = FileOperationsUtility.__get_content_from_file__(file, True)
+                files_by_name[file_name] = []
+                previous_file_name = file_name
+            files_by_name[previous_file_name].append(file)
+        return contents, files_by_name
+
+    def __delete_files_named(self, files_by_name, conversion_step, file_name):
+        """
+        Delete the files with given name (e.g. once the Include statements referring to them are adapted).
+
+        Parameters:
+            files_by_name (dict): The paths of the files, keyed by their name
+            conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
+            file_name (str): The name of the files to delete
+        """
+        for file in files_by_name[file_name]:
+            FileOperationsUtility.__delete_file__(file, conversion_step)
+
     def __filter_and_remove_unused_files(self, all_files, used_file_names, conversion_step):
-        used_files = set()
+        # the used files are kept in the order given (a set of paths would order them by the hash of the path, i.e.
+        # depending on the location of the target folder)
+        used_files = []
         for file in all_files:
             if basename(file) in used_file_names:
-                used_files.add(file)
+                used_files.append(file)
             else:
                 FileOperationsUtility.__delete_file__(file, conversion_step)
         return used_files
-
-    # this is a hack to check if files are symlinks
-    def __is_symlink_file(self, file):
-        file_content = FileOperationsUtility.__get_content_from_file__(file, False)
-        return len(file_content) == 2 and file_content[1].startswith("../")
@@ -0,0 +1,181 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from converter.aem_dispatcher_converter import AEMDispatcherConverter
+from util import constants
+from util.archive_utility import ArchiveUtility
+from util.config_tree import config_tree
+from util.conversion_report.conversion_result import ConversionResult
+from util.conversion_report.summary_report_writer import SummaryReportWriter
+from util.setup_logger_utility import logger, log_to_file
+
+from concurrent.futures import ProcessPoolExecutor
+from ntpath import basename
+from os import listdir, makedirs
+from os.path import abspath, dirname, exists, isdir, join, normpath
+from shutil import rmtree
+
+
+class FleetConverter:
+    """
+    FleetConverter converts a fleet of Adobe Managed Services dispatcher configurations (e.g. one per tenant) with
+    the AEMDispatcherConverter, several configurations at once.
+
+    Every configuration is converted into its own folder of the output folder (`<output>/<name>/src`), along with its
+    own summary report and log. Configurations may be folders or `.zip` / `.tar.gz` archives (named after the archive,
+    without its extension). The files of the dispatcher SDK are read once per worker process and shared by all
+    conversions it performs, and a fleet summary report lists the outcome of every conversion.
+
+    Attributes:
+    __sdk_src_path (str): The path to the Dispatcher SDK `src` folder.
+    __output_path (str): The folder in which the configurations are converted.
+    __workers (int): The number of configurations converted at once (each in its own worker process).
+    __link_mode (str): How the files left unchanged are staged into the output folder.
+    __sdk_store_path (str): The path to the `SdkStore` folder the SDK files are kept in, `None` if not stored.
+    __parse_cache_path (str): The path to the `ParseCache` folder shared by the conversions, `None` if not cached.
+    __parse_cache_size (int): The maximum size of the parse cache, in megabytes.
+    """
+    __sdk_src_path = None
+    __output_path = None
+    __workers = 1
+    __link_mode = constants.LINK_MODE_COPY
+    __sdk_store_path = None
+    __parse_cache_path = None
+    __parse_cache_size = constants.PARSE_CACHE_SIZE
+
+    def __init__(self, sdk_src_path, output_path, workers=1, link_mode=constants.LINK_MODE_COPY,
+                 sdk_store_path=None, parse_cache_path=None, parse_cache_size=constants.PARSE_CACHE_SIZE):
+        """
+        Parameters:
+            sdk_src_path (str): path to the src folder of the dispatcher sdk
+            output_path (str): path to the folder in which the configurations are converted
+            workers (int): number of configurations converted at once
+            link_mode (str): how the files left unchanged are staged (`copy`, `reflink` or `hardlink`)
+            sdk_store_path (str): path to the store folder of the sdk files, from which the sdk files copied into the
+                configurations are staged (e.g. hardlinked), `None` not to store them
+            parse_cache_path (str): path to the cache folder of the parsed farm and vhost files, shared by the
+                conversions of the fleet (`None` not to cache them)
+            parse_cache_size (int): maximum size of the parse cache, in megabytes
+        """
+        self.__sdk_src_path = sdk_src_path
+        self.__output_path = output_path
+        self.__workers = workers
+        self.__link_mode = link_mode
+        self.__sdk_store_path = sdk_store_path
+        self.__parse_cache_path = parse_cache_path
+        self.__parse_cache_size = parse_cache_size
+
+    @staticmethod
+    def __find_configurations__(batch_path):
+        """
+        Find the dispatcher configurations of a fleet: either the sub-folders (and archives) of given folder, or the
+        folders (or archives) listed in given manifest file (one path per line, relative to the manifest, `#` starting
+        a comment).
+
+        Parameters:
+            batch_path (str): The path to the folder holding the configurations, or to the manifest
+
+        Returns:
+            List[Tuple[str, str]]: The name and path of every configuration, in order
+        """
+        if isdir(batch_path):
+            config_paths = [join(batch_path, name) for name in sorted(listdir(batch_path))
+                            if isdir(join(batch_path, name)) or ArchiveUtility.__is_archive__(join(batch_path, name))]
+        else:
+            config_paths = []
+            with open(batch_path) as file:
+                for line in file:
+                    line = line.split("#", 1)[0].strip()
+                    if line:
+                        config_paths.append(join(dirname(batch_path), line))
+        configurations = []
+        names = set()
+        for config_path in config_paths:
+            name = basename(normpath(config_path))
+            if ArchiveUtility.__is_archive__(config_path):
+                name = next(name[:-len(extension)] for extension in constants.ARCHIVE_EXTENSIONS
+                            if name.lower().endswith(extension))
+            if name in names:
+                logger.error("FleetConverter: Skipping %s, a configuration named '%s' is already converted.",
+                             config_path, name)
+                continue
+            names.add(name)
+            configurations.append((name, config_path))
+        return configurations
+
+    def __convert__(self, batch_path):
+        """
+        Convert all dispatcher configurations of the fleet and write the fleet summary report.
+
+        Parameters:
+            batch_path (str): The path to the folder holding the configurations, or to the manifest
+
+        Returns:
+            List[ConversionResult]: The outcome of the conversion of every configuration, in order
+        """
+        configurations = FleetConverter.__find_configurations__(batch_path)
+        makedirs(self.__output_path, exist_ok=True)
+        logger.info("FleetConverter: Converting %d configurations with %d worker processes.", len(configurations),
+                    self.__workers)
+        # read (and store) the SDK before starting the worker processes, which share it (if they are forked)
+        config_tree.__load_read_only__(self.__sdk_src_path, self.__sdk_store_path)
+        arguments = [(name, config_path, self.__sdk_src_path, join(self.__output_path, name), self.__link_mode,
+                      self.__sdk_store_path, self.__parse_cache_path, self.__parse_cache_size)
+                     for name, config_path in configurations]
+        if self.__workers > 1 and len(configurations) > 1:
+            with ProcessPoolExecutor(max_workers=self.__workers) as executor:
+                results = list(executor.map(FleetConverter.__convert_configuration__, *zip(*arguments)))
+        else:
+            results = [FleetConverter.__convert_configuration__(*argument) for argument in arguments]
+        for result in results:
+            if result.__get_error__() is not None:
+                logger.error("FleetConverter: Could not convert %s - %s.", result.__get_name__(),
+                             result.__get_error__())
+        SummaryReportWriter.__write_fleet_summary_report__(results,
+                                                           join(self.__output_path, constants.FLEET_REPORT_FILE_NAME))
+        return results
+
+    @staticmethod
+    def __convert_configuration__(name, config_path, sdk_src_path, target_path, link_mode=constants.LINK_MODE_COPY,
+                                  sdk_store_path=None, parse_cache_path=None,
+                                  parse_cache_size=constants.PARSE_CACHE_SIZE):
+        """
+        Convert a single dispatcher configuration of the fleet into the target folder (`<target>/src`), along with its
+        summary report and log. The configuration is staged into the target folder by the conversion.
+
+        Returns:
+            ConversionResult
+        """
+        if exists(target_path):
+            rmtree(target_path)
+        dispatcher_src_path = join(target_path, "src")
+        config_tree.__load_read_only__(sdk_src_path, sdk_store_path)
+        try:
+            if not isdir(config_path) and not ArchiveUtility.__is_archive__(config_path):
+                raise NotADirectoryError("Not a dispatcher configuration folder or archive: " + config_path)
+            makedirs(target_path)
+            with log_to_file(join(target_path, constants.LOG_FILE_NAME)):
+                converter = AEMDispatcherConverter(sdk_src_path, dispatcher_src_path, 1,
+                                                   join(target_path, constants.SUMMARY_REPORT_FILE_NAME),
+                                                   config_path, link_mode, sdk_store_path,
+                                                   parse_cache_path=parse_cache_path,
+                                                   parse_cache_size=parse_cache_size)
+                converter.__transform__()
+        # a configuration failing to convert does not stop the conversion of the rest of the fleet
+        except Exception as e:
+            return ConversionResult(name, constants.CONVERSION_FAILED, abspath(target_path), error=str(e))
+        conversion_steps = converter.__get_conversion_steps__()
+        return ConversionResult(name, constants.CONVERSION_SUCCEEDED, abspath(target_path),
+                                len([step for step in conversion_steps if step.__is_performed__()]),
+                                sum(len(step.__get_operations__()) for step in conversion_steps))
@@ -13,24 +13,151 @@
 """
 
 from converter.aem_dispatcher_converter import AEMDispatcherConverter
+from converter.fleet_converter import FleetConverter
 from util import constants
+from util.archive_utility import ArchiveUtility
+from util.config_watcher import ConfigWatcher
+from util.conversion_report.summary_report_writer import SummaryReportWriter
+from util.setup_logger_utility import logger
 
 from argparse import ArgumentParser
-from shutil import copytree, rmtree
-from os.path import exists
+from contextlib import redirect_stdout
+from shutil import rmtree
+from os.path import exists, join
+from sys import stderr, stdout
 
-parser = ArgumentParser()
-parser.add_argument('--sdk_src', help='Absolute path to the src folder of the dispatcher sdk')
-parser.add_argument('--cfg', help='Absolute path to dispatcher config folder')
-args = parser.parse_args()
+# the conversion only runs in the main module, so that worker processes (started with `--workers`) can import it
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument('--sdk_src', help='Absolute path to the src folder of the dispatcher sdk')
+    parser.add_argument('--cfg', help='Absolute path to dispatcher config folder (or to a .zip or .tar.gz archive of '
+                                      'it)')
+    parser.add_argument('--batch', help='Path to a folder holding the dispatcher config folders of a fleet (or to a '
+                                        'manifest listing them, one per line), instead of --cfg')
+    parser.add_argument('--output', default=constants.TARGET_FOLDER,
+                        help='Folder in which the dispatcher configs of a fleet are converted (default: ./target)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes running independent rules and transforming the vhost and '
+                             'farm files, or converting the dispatcher configs of a fleet (default: 1)')
+    parser.add_argument('--link-mode', dest='link_mode', choices=constants.LINK_MODES,
+                        default=constants.LINK_MODE_COPY,
+                        help='How the files left unchanged by the conversion are staged into the target folder: '
+                             'copied, reflinked (on file systems supporting it) or hardlinked (default: copy)')
+    parser.add_argument('--archive',
+                        help='Also write the converted config (src) and the summary report into given .zip or .tar.gz '
+                             'archive, - writing a .tar.gz archive to the standard output')
+    parser.add_argument('--patch',
+                        help='Also write a patch (unified diff, applicable with git apply in the dispatcher config '
+                             'folder) of the changes made by the conversion into given file, - for the standard '
+                             'output')
+    parser.add_argument('--dry-run', dest='dry_run', action='store_true',
+                        help='Compute the conversion in memory only and print the summary report, without writing the '
+                             'converted config (the target folder is left untouched)')
+    parser.add_argument('--sdk-store', dest='sdk_store_path',
+                        help='Folder keeping the files of the dispatcher sdk across runs: the default files copied '
+                             'from the sdk are staged from it with --link-mode (e.g. hardlinked) instead of being '
+                             'written again')
+    parser.add_argument('--parse-cache', dest='parse_cache_path',
+                        help='Folder keeping the parsed farm and vhost files across runs: files whose content was '
+                             'parsed before are loaded from it instead of being parsed again')
+    parser.add_argument('--parse-cache-size', dest='parse_cache_size', type=int, default=constants.PARSE_CACHE_SIZE,
+                        help='Maximum size of the --parse-cache folder in megabytes, the least recently used entries '
+                             'being evicted (default: 256)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Keep the target folder of the previous conversion and only run the rules again whose '
+                             'inputs (files of the dispatcher config and sdk) changed since, reusing the converted '
+                             'files and summary report of the other rules')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and convert the dispatcher config again (incrementally, see --incremental) '
+                             'whenever it changes, until interrupted with Ctrl+C')
+    args = parser.parse_args()
+    if args.dry_run and (args.batch is not None or args.archive is not None):
+        parser.error("--dry-run cannot be combined with --batch or --archive")
+    if args.patch is not None and args.batch is not None:
+        parser.error("--patch cannot be combined with --batch")
+    if (args.incremental or args.watch) and (args.batch is not None or args.dry_run or args.patch is not None):
+        parser.error("--incremental and --watch cannot be combined with --batch, --dry-run or --patch")
+    if args.watch and (args.cfg is None or args.archive is not None):
+        parser.error("--watch requires --cfg, and cannot be combined with --archive")
+    if args.patch == "-" and args.archive == "-":
+        parser.error("--patch and --archive cannot both be written to the standard output")
+    # with the patch or the archive written to the standard output, the messages go to the standard error
+    output = stderr if "-" in (args.patch, args.archive) else stdout
 
-# if `target` folder already exists, delete it
-if exists(constants.TARGET_FOLDER):
-    rmtree(constants.TARGET_FOLDER)
-copytree(args.cfg, constants.TARGET_DISPATCHER_SRC_FOLDER, True)
-converter = AEMDispatcherConverter(args.sdk_src, constants.TARGET_DISPATCHER_SRC_FOLDER)
-converter.__transform__()
-print("\nTransformation Complete!\n")
-print("Please check", constants.TARGET_DISPATCHER_SRC_FOLDER, "folder for transformed configuration files.")
-print("Please check", constants.SUMMARY_REPORT_FILE, "for summary report.")
-print("Please check", constants.LOG_FILE, "for logs.")
+    if args.batch is not None:
+        fleet_converter = FleetConverter(args.sdk_src, args.output, max(1, args.workers), args.link_mode,
+                                         args.sdk_store_path, args.parse_cache_path, args.parse_cache_size)
+        results = fleet_converter.__convert__(args.batch)
+        failed_count = len([result for result in results if result.__get_status__() != constants.CONVERSION_SUCCEEDED])
+        print("\nTransformation Complete!\n")
+        print("Converted", len(results) - failed_count, "of", len(results), "dispatcher configurations.")
+        print("Please check", join(args.output, constants.FLEET_REPORT_FILE_NAME), "for the fleet summary report.")
+        print("Please check", constants.LOG_FILE, "for logs.")
+    elif args.dry_run:
+        # the rules run on the configuration tree loaded from --cfg, as they would when staging it into `target`
+        converter = AEMDispatcherConverter(args.sdk_src, constants.TARGET_DISPATCHER_SRC_FOLDER, max(1, args.workers),
+                                           source_config_path=args.cfg, dry_run=True, patch_file=args.patch,
+                                           parse_cache_path=args.parse_cache_path,
+                                           parse_cache_size=args.parse_cache_size)
+        with redirect_stdout(stderr):
+            converter.__transform__()
+        # the summary report is printed, unless the patch is
+        if args.patch != "-":
+            print(SummaryReportWriter.__get_summary_report__(converter.__get_conversion_steps__()))
+        print("Dry run complete,", converter.__get_changed_file_count__(), "files would change.", file=stderr)
+        print("Please check", constants.LOG_FILE, "for logs.", file=stderr)
+    else:
+        # a watched configuration is converted incrementally on every change
+        incremental = args.incremental or args.watch
+        # if `target` folder already exists, delete it (an incremental conversion keeps what it can reuse)
+        if exists(constants.TARGET_FOLDER) and not incremental:
+            rmtree(constants.TARGET_FOLDER)
+        # changes made while a conversion runs are picked up by the next one
+        watcher = ConfigWatcher(args.cfg) if args.watch else None
+        try:
+            while True:
+                # the configuration is staged into the `target` folder by the conversion, only the remaining files
+                # are copied
+                converter = AEMDispatcherConverter(args.sdk_src, constants.TARGET_DISPATCHER_SRC_FOLDER,
+                                                   max(1, args.workers), source_config_path=args.cfg,
+                                                   link_mode=args.link_mode, sdk_store_path=args.sdk_store_path,
+                                                   patch_file=args.patch,
+                                                   manifest_file=constants.MANIFEST_FILE if incremental else None,
+                                                   parse_cache_path=args.parse_cache_path,
+                                                   parse_cache_size=args.parse_cache_size)
+                try:
+                    with redirect_stdout(output):
+                        converter.__transform__()
+                except Exception as e:
+                    # e.g. a file being saved, the next change converts the configuration again
+                    if watcher is None:
+                        raise
+                    logger.exception("Could not convert %s.", args.cfg)
+                    print("\nCould not convert", args.cfg, "-", e, file=output)
+                else:
+                    if args.archive is not None:
+                        ArchiveUtility.__write_archive__(args.archive, constants.TARGET_DISPATCHER_SRC_FOLDER,
+                                                         [constants.SUMMARY_REPORT_FILE])
+                    print("\nTransformation Complete!\n", file=output)
+                    print("Changed", converter.__get_changed_file_count__(), "files.", file=output)
+                    print("Please check", constants.TARGET_DISPATCHER_SRC_FOLDER,
+                          "folder for transformed configuration files.", file=output)
+                    if args.archive is not None and args.archive != "-":
+                        print("Please check", args.archive, "for the archive of the transformed configuration.",
+                              file=output)
+                    if args.patch is not None and args.patch != "-":
+                        print("Please check", args.patch, "for the patch of the transformed configuration.",
+                              file=output)
+                    print("Please check", constants.SUMMARY_REPORT_FILE, "for summary report.", file=output)
+                    print("Please check", constants.LOG_FILE, "for logs.", file=output)
+                if watcher is None:
+                    break
+                print("\nWatching", args.cfg, "for changes, press Ctrl+C to stop.", file=output, flush=True)
+                watcher.__wait_for_change__()
+        except KeyboardInterrupt:
+            if watcher is None:
+                raise
+            print("\nStopped watching", args.cfg, file=output)
+        finally:
+            if watcher is not None:
+                watcher.__close__()
@@ -0,0 +1,81 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util import constants
+from util.config_tree import config_tree
+from util.conversion_report.conversion_step import ConversionStep
+from util.file_operations_utility import FileOperationsUtility
+
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+VHOST_CONTENT = """<VirtualHost *:80>
+  # serve ${DISP_ID} here
+  # root ${PUBLISH_DOCROOT}
+  DocumentRoot ${PUBLISH_DOCROOT}
+  Header set X-Dispatcher ${DISP_ID}
+  <If "${PUBLISH_FORCE_SSL} == 1">
+    RewriteEngine on
+  </If>
+  ServerName publish
+</VirtualHost>
+"""
+
+# output and report rows of the baseline, rewriting the variables one after the other
+# (`__replace_all_usage_of_old_variable_with_new_variable__`, then `__remove_all_usage_of_old_variable__`)
+BASELINE_VHOST_CONTENT = """<VirtualHost *:80>
+  # root ${DOCROOT}
+  DocumentRoot ${DOCROOT}
+  ServerName publish
+</VirtualHost>
+"""
+BASELINE_OPERATIONS = [
+    (constants.ACTION_REPLACED, "Replaced variable 'PUBLISH_DOCROOT with new variable 'DOCROOT'"),
+    (constants.ACTION_REPLACED, "Replaced variable 'PUBLISH_DOCROOT with new variable 'DOCROOT'"),
+    (constants.ACTION_REMOVED, "Removed variable 'DISP_ID'"),
+    (constants.ACTION_REMOVED, "Removed variable 'DISP_ID'"),
+    (constants.ACTION_REMOVED, "Removed 'if' condition which used variable 'PUBLISH_FORCE_SSL'")
+]
+
+
+class VariableRewriteTest(TestCase):
+
+    def test_rewrite_matches_baseline(self):
+        with TemporaryDirectory() as dir_path:
+            file_path = join(dir_path, "default.vhost")
+            with open(file_path, "w") as file:
+                file.write(VHOST_CONTENT)
+            config_tree.__load__(dir_path)
+            conversion_step = ConversionStep("Replace any variable that is no longer available", "")
+            variable_actions = {
+                "PUBLISH_DOCROOT": (constants.VARIABLE_RENAME, "DOCROOT"),
+                "DISP_ID": (constants.VARIABLE_REMOVE, None),
+                "PUBLISH_FORCE_SSL": (constants.VARIABLE_REMOVE, None),
+                "PUBLISH_WHITELIST_ENABLED": (constants.VARIABLE_REMOVE, None)
+            }
+            FileOperationsUtility.__rewrite_variables__(dir_path, constants.VHOST, variable_actions, conversion_step)
+            config_tree.__flush__()
+            config_tree.__wait_for_writes__()
+            with open(file_path) as file:
+                self.assertEqual(BASELINE_VHOST_CONTENT, file.read())
+            self.assertEqual([(operation_type, file_path, operation_action)
+                              for operation_type, operation_action in BASELINE_OPERATIONS],
+                             [(operation.__get_operation_type__(), operation.__get_operation_location__(),
+                               operation.__get_operation_action__())
+                              for operation in conversion_step.__get_operations__()])
+
+
+if __name__ == "__main__":
+    main()
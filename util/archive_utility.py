@@ -0,0 +1,153 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util import constants
+from util.setup_logger_utility import logger
+
+from ntpath import basename
+from os import readlink, sep, walk
+from os.path import isdir, isfile, islink, join, normpath, relpath
+from stat import S_IFLNK, S_ISLNK
+from sys import stdout
+from tarfile import open as open_tar
+from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
+
+
+class ArchiveUtility:
+    """
+    Reads dispatcher configurations from `.zip` and `.tar.gz` archives straight into memory (see `ConfigTree.__load__`)
+    and writes converted configurations back out as archives, without extracting anything to disk in between.
+    """
+
+    @staticmethod
+    def __is_archive__(path):
+        """
+        Check whether the path names an archive (by its extension) rather than a folder.
+        """
+        return path is not None and not isdir(path) \
+            and any(path.lower().endswith(extension) for extension in constants.ARCHIVE_EXTENSIONS)
+
+    @staticmethod
+    def __read_archive__(archive_path):
+        """
+        Read the entries of an archive. An archive holding a single top-level folder (e.g. `src/...`) is read as that
+        folder, unless it is one of the folders of a configuration (e.g. `conf.d`). Entries which would lie outside of
+        the archive (absolute paths or `..`) are skipped.
+
+        Parameters:
+            archive_path (str): The path to the `.zip` or `.tar.gz` archive
+
+        Returns:
+            List[Tuple[str, str, str, bytes]]: The path (relative, '/' separated), type (`FILE_NODE`, `SYMLINK_NODE`
+                or `DIRECTORY_NODE`), symlink target (only for symlinks) and content (only for files) of every entry
+        """
+        if archive_path.lower().endswith(".zip"):
+            entries = ArchiveUtility.__read_zip(archive_path)
+        else:
+            entries = ArchiveUtility.__read_tar(archive_path)
+        valid_entries = []
+        for name, entry_type, link_target, content in entries:
+            components = [component for component in name.replace("\\", "/").split("/") if component not in ("", ".")]
+            if name.startswith("/") or ".." in components:
+                logger.error("ArchiveUtility: Skipping %s of %s, it lies outside of the archive.", name, archive_path)
+                continue
+            if components:
+                valid_entries.append(("/".join(components), entry_type, link_target, content))
+        # a single top-level folder (other than the folders of a configuration) is the configuration folder itself
+        top_level_names = set(name.split("/")[0] for name, entry_type, link_target, content in valid_entries)
+        if len(top_level_names) == 1:
+            top_level_name = top_level_names.pop()
+            configuration_folders = (constants.CONF, constants.CONF_D, constants.CONF_DISPATCHER_D,
+                                     constants.CONF_MODULES_D)
+            if top_level_name not in configuration_folders \
+                    and all(name != top_level_name or entry_type == constants.DIRECTORY_NODE
+                            for name, entry_type, link_target, content in valid_entries):
+                valid_entries = [(name[len(top_level_name) + 1:], entry_type, link_target, content)
+                                 for name, entry_type, link_target, content in valid_entries
+                                 if name != top_level_name]
+        return valid_entries
+
+    @staticmethod
+    def __write_archive__(archive_path, folder_path, file_paths):
+        """
+        Write a folder and files into an archive, `-` writing a `.tar.gz` archive to the standard output. The entries
+        are streamed into the archive one at a time.
+
+        Parameters:
+            archive_path (str): The path to the `.zip` or `.tar.gz` archive, or `-` for the standard output
+            folder_path (str): The path to the folder, added under its own name (e.g. `src`)
+            file_paths (List[str]): The paths to the files added next to the folder (e.g. the summary report)
+        """
+        folder_name = basename(normpath(folder_path))
+        entries = []
+        for dir_path, dir_names, file_names in walk(folder_path):
+            dir_names.sort()
+            dir_name = normpath(join(folder_name, relpath(dir_path, folder_path)))
+            entries.append((dir_path, dir_name))
+            entries.extend((join(dir_path, name), join(dir_name, name)) for name in sorted(file_names))
+            # symlinks to folders are archived as symlinks
+            entries.extend((join(dir_path, name), join(dir_name, name)) for name in dir_names
+                           if islink(join(dir_path, name)))
+        entries.extend((file_path, basename(file_path)) for file_path in file_paths if isfile(file_path))
+        if archive_path.lower().endswith(".zip"):
+            with ZipFile(archive_path, "w", ZIP_DEFLATED) as archive:
+                for path, name in entries:
+                    if islink(path):
+                        info = ZipInfo(name.replace(sep, "/"))
+                        info.external_attr = (S_IFLNK | 0o777) << 16
+                        archive.writestr(info, readlink(path))
+                    else:
+                        archive.write(path, name)
+        else:
+            # the standard output is written as a stream, without seeking back
+            archive = open_tar(fileobj=stdout.buffer, mode="w|gz") if archive_path == "-" \
+                else open_tar(archive_path, "w:gz")
+            with archive:
+                for path, name in entries:
+                    archive.add(path, name, recursive=False)
+        logger.info("ArchiveUtility: Wrote %d entries to %s", len(entries),
+                    "the standard output" if archive_path == "-" else archive_path)
+
+    @staticmethod
+    def __read_zip(archive_path):
+        entries = []
+        with ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if info.filename.endswith("/"):
+                    entries.append((info.filename, constants.DIRECTORY_NODE, None, None))
+                elif S_ISLNK(info.external_attr >> 16):
+                    entries.append((info.filename, constants.SYMLINK_NODE, archive.read(info).decode(), None))
+                else:
+                    entries.append((info.filename, constants.FILE_NODE, None, archive.read(info)))
+        return entries
+
+    @staticmethod
+    def __read_tar(archive_path):
+        entries = []
+        # the members are read in order, as a stream
+        with open_tar(archive_path, "r|*") as archive:
+            for member in archive:
+                if member.isdir():
+                    entries.append((member.name, constants.DIRECTORY_NODE, None, None))
+                elif member.issym():
+                    entries.append((member.name, constants.SYMLINK_NODE, member.linkname, None))
+                elif member.isfile():
+                    with archive.extractfile(member) as file:
+                        entries.append((member.name, constants.FILE_NODE, None, file.read()))
+                elif member.islnk():
+                    # hardlinks share the content of the file they link to, read before them
+                    content = next((content for name, entry_type, link_target, content in entries
+                                    if name == member.linkname and entry_type == constants.FILE_NODE), b"")
+                    entries.append((member.name, constants.FILE_NODE, None, content))
+        return entries
@@ -0,0 +1,69 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from os import getpid, remove, replace
+from os.path import basename, dirname, join, lexists
+from shutil import copy2, copymode
+from threading import get_ident
+
+
+class AtomicFileUtility:
+    """
+    Writes files atomically: the content is written to a temporary file next to the file, which then replaces it, so
+    the file is never seen partially written, neither by concurrent runs nor after an interrupted one. A hardlinked
+    file is replaced rather than changed, so the file it is linked to is left untouched.
+    """
+
+    @staticmethod
+    def __write__(path, content, mode_path=None):
+        """
+        Write a file atomically.
+
+        Parameters:
+            path (str): The path of the file to write (its folder must exist).
+            content (str or bytes): The content of the file, written as text or as binary data.
+            mode_path (str): The file whose permissions the written file gets, if it exists (`None` for the default
+                permissions).
+        """
+        def write(temporary_path):
+            with open(temporary_path, "wb" if isinstance(content, bytes) else "w") as file:
+                file.write(content)
+            if mode_path is not None and lexists(mode_path):
+                copymode(mode_path, temporary_path)
+
+        AtomicFileUtility.__replace(path, write)
+
+    @staticmethod
+    def __copy__(source_path, path):
+        """
+        Copy a file (with its permissions and modification time) atomically.
+
+        Parameters:
+            source_path (str): The path of the file to copy.
+            path (str): The path of the copy (its folder must exist).
+        """
+        AtomicFileUtility.__replace(path, lambda temporary_path: copy2(source_path, temporary_path))
+
+    @staticmethod
+    def __replace(path, write):
+        # unique per process and thread, so concurrent writers of the same file never share a temporary file
+        temporary_path = join(dirname(path), "." + basename(path) + "." + str(getpid()) + "." + str(get_ident()) +
+                              ".tmp")
+        try:
+            write(temporary_path)
+            replace(temporary_path, path)
+        except BaseException:
+            if lexists(temporary_path):
+                remove(temporary_path)
+            raise
@@ -0,0 +1,1372 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util import constants
+from util.archive_utility import ArchiveUtility
+from util.atomic_file_utility import AtomicFileUtility
+from util.sdk_store import SdkStore
+from util.setup_logger_utility import logger
+
+from concurrent.futures import ThreadPoolExecutor
+from errno import EISDIR, ELOOP, ENOENT, ENOTDIR, ENOTEMPTY
+from difflib import SequenceMatcher, unified_diff
+from filecmp import cmp
+from functools import partial
+from glob import glob
+from hashlib import sha256
+from io import BytesIO, TextIOWrapper
+from mmap import ACCESS_READ, mmap
+from ntpath import basename
+from os import fstat, getpid, link, listdir, makedirs, readlink, remove, rename, scandir, sep, stat, \
+    strerror, symlink, walk
+from os.path import abspath, dirname, exists, isabs, isdir, isfile, islink, join, lexists, normpath, realpath
+from re import compile, escape
+from shutil import copy, copy2, copymode, copystat, rmtree
+
+try:
+    # Python 3.8+ on Linux
+    from os import copy_file_range
+except ImportError:
+    copy_file_range = None
+
+
+class ConfigTreeNode:
+    """
+    ConfigTreeNode describes a single entry (file, symlink or directory) of the in-memory configuration tree.
+    """
+
+    # private attributes
+    __type = None
+    # key the entry was loaded from, `None` for new entries
+    __origin = None
+    __link_target = None
+    # content of the file, `None` until it has been read
+    __lines = None
+    # content of the file as read from disk
+    __original_lines = None
+    __modified = False
+    # results of the parsers run on the current content, keyed by parser
+    __parsed = None
+    # file on disk holding the current content (e.g. the stored object of an SDK file), if any
+    __stored_path = None
+
+    def __init__(self, node_type, origin=None, link_target=None, lines=None):
+        """
+        Parameters:
+            node_type (str): The type of the entry
+            origin (str): The key the entry was loaded from, `None` for new entries
+            link_target (str): The target of the symlink (only for symlinks)
+            lines (List[str]): The content of the file, if already known (only for files)
+        """
+        self.__type = node_type
+        self.__origin = origin
+        self.__link_target = link_target
+        self.__lines = lines
+        self.__modified = origin is None
+        self.__parsed = {}
+
+    def __get_type__(self):
+        return self.__type
+
+    def __get_origin__(self):
+        return self.__origin
+
+    def __get_link_target__(self):
+        return self.__link_target
+
+    def __get_lines__(self):
+        return self.__lines
+
+    def __set_lines__(self, lines, modified=True):
+        self.__lines = lines
+        if not modified:
+            self.__original_lines = lines
+        self.__modified = self.__modified or modified
+        self.__parsed = {}
+        self.__stored_path = None
+
+    def __get_original_lines__(self):
+        return self.__original_lines
+
+    def __get_stored_path__(self):
+        return self.__stored_path
+
+    def __set_stored_path__(self, stored_path):
+        self.__stored_path = stored_path
+
+    def __get_parsed__(self, parser):
+        return self.__parsed.get(parser)
+
+    def __set_parsed__(self, parser, parsed):
+        self.__parsed[parser] = parsed
+
+    def __is_modified__(self):
+        """
+        Check whether the content of the file differs from the content read from disk (content written without
+        having been read is considered modified).
+        """
+        return self.__modified and (self.__original_lines is None or self.__lines != self.__original_lines)
+
+
+class ConfigTree:
+    """
+    ConfigTree is an in-memory model of a dispatcher configuration `src` tree. It is indexed once by `__load__`, file
+    contents are read the first time they are needed, and all changes are kept in memory until `__flush__` writes them
+    back. Paths outside of the loaded root (e.g. files of the dispatcher SDK) are passed through to the file system.
+    """
+
+    # private attributes
+    __root = None
+    # folder the tree was loaded from (the root, unless it is staged), or archive it was read from
+    __source = None
+    # content of the files of the archive the tree was read from, keyed by their key
+    __archive_files = None
+    __link_mode = constants.LINK_MODE_COPY
+    __dry_run = False
+    # entries of the tree, keyed by their path relative to the root ('/' separated)
+    __nodes = None
+    # type and symlink target of every entry found on disk when the tree was loaded
+    __original_nodes = None
+    __original_link_targets = None
+    # type of every entry left in the root by a previous conversion (see `__keep_root__`)
+    __previous_entries = None
+    __patch_entries = None
+    # names of the entries of every directory, and keys of the entries with every file extension
+    __children = None
+    __keys_by_extension = None
+    # functions notified of every changed file (`None` when a new tree is loaded)
+    __listeners = None
+    # read-only files outside of the tree (e.g. of the SDK), kept across loads, and their objects in the `SdkStore`
+    __read_only_files = None
+    __stored_files = None
+    __stored_sources = None
+    # kept across loads of the tree
+    __parse_cache = None
+    # files being read ahead and written behind by the threads of the process `__io_pid`
+    __pending_reads = None
+    __pending_writes = None
+    __io_executor = None
+    __io_pid = None
+
+    # number of threads reading files ahead and writing them behind (file I/O releases the GIL)
+    __IO_THREADS = 8
+
+    # the action of every link mode, as logged
+    __STAGED_FILE_ACTIONS = {constants.LINK_MODE_COPY: "copied", constants.LINK_MODE_REFLINK: "reflinked",
+                             constants.LINK_MODE_HARDLINK: "hardlinked"}
+
+    # maximum number of symlinks followed while resolving a path (same limit as the linux kernel)
+    __MAX_SYMLINK_DEPTH = 40
+
+    def __init__(self):
+        self.__nodes = {}
+        self.__original_nodes = {}
+        self.__children = {}
+        self.__keys_by_extension = {}
+        self.__listeners = []
+        self.__read_only_files = {}
+        self.__stored_files = {}
+        self.__stored_sources = {}
+        self.__pending_reads = {}
+        self.__pending_writes = []
+
+    def __load__(self, root_path, source_path=None, link_mode=constants.LINK_MODE_COPY, dry_run=False, patch=False):
+        """
+        Index the files, symlinks and directories under given folder. File contents are read lazily.
+        With a source folder, the tree is loaded from the source folder and staged into the (new or empty) root folder
+        by `__flush__`, so the entries removed by the conversion rules are never copied. The source may also be a
+        `.zip` or `.tar.gz` archive, which is read into memory (see `ArchiveUtility.__read_archive__`) and staged the
+        same way, without being extracted first.
+
+        Parameters:
+            root_path (str): The path to the dispatcher configuration `src` folder
+            source_path (str): The path to the folder (or archive) to load the tree from, `None` to load it from
+                `root_path`
+            link_mode (str): How unchanged files are staged from the source folder (`LINK_MODE_COPY`,
+                `LINK_MODE_REFLINK` or `LINK_MODE_HARDLINK`)
+            dry_run (bool): Whether the tree is never written back: `__flush__` then only counts the changes
+            patch (bool): Whether `__flush__` collects a patch of the changes (see `__get_patch_entries__`)
+        """
+        # the previous tree is written completely before its files are loaded again
+        self.__wait_for_writes__()
+        self.__cancel_reads()
+        self.__root = normpath(abspath(root_path))
+        self.__source = self.__root if source_path is None else normpath(abspath(source_path))
+        self.__link_mode = link_mode
+        self.__dry_run = dry_run
+        self.__patch_entries = [] if patch else None
+        self.__previous_entries = None
+        self.__nodes = {}
+        self.__children = {}
+        self.__keys_by_extension = {}
+        self.__add_node("", ConfigTreeNode(constants.DIRECTORY_NODE, ""))
+        self.__archive_files = None
+        if ArchiveUtility.__is_archive__(self.__source):
+            self.__load_archive()
+        # a single scandir per directory, the type of the entries comes with the directory listing
+        dir_keys = [] if self.__archive_files is not None else [""]
+        while dir_keys:
+            dir_key = dir_keys.pop()
+            for entry in scandir(self.__source_path(dir_key)):
+                key = entry.name if dir_key == "" else dir_key + "/" + entry.name
+                if entry.is_symlink():
+                    self.__add_node(key, ConfigTreeNode(constants.SYMLINK_NODE, key, readlink(entry.path)))
+                elif entry.is_dir():
+                    self.__add_node(key, ConfigTreeNode(constants.DIRECTORY_NODE, key))
+                    dir_keys.append(key)
+                else:
+                    self.__add_node(key, ConfigTreeNode(constants.FILE_NODE, key))
+        self.__original_nodes = dict((key, node.__get_type__()) for key, node in self.__nodes.items())
+        self.__original_link_targets = dict((key, node.__get_link_target__()) for key, node in self.__nodes.items()
+                                            if node.__get_type__() == constants.SYMLINK_NODE)
+        logger.info("ConfigTree: Loaded %d entries from %s", len(self.__nodes), self.__source)
+        for listener in self.__listeners:
+            listener(None)
+
+    def __load_archive(self):
+        """
+        Add the entries of the archive the tree is loaded from, keeping the content of its files in memory. Folders
+        only implied by the paths of the entries are added as well.
+        """
+        self.__archive_files = {}
+        for key, entry_type, link_target, content in sorted(ArchiveUtility.__read_archive__(self.__source),
+                                                            key=lambda entry: entry[0]):
+            if key in self.__nodes:
+                continue
+            components = key.split("/")
+            parent_key = ""
+            for component in components[:-1]:
+                parent_key = component if parent_key == "" else parent_key + "/" + component
+                if parent_key not in self.__nodes:
+                    self.__add_node(parent_key, ConfigTreeNode(constants.DIRECTORY_NODE, parent_key))
+            if self.__nodes[parent_key].__get_type__() != constants.DIRECTORY_NODE:
+                logger.error("ConfigTree: Skipping %s of %s, %s is not a directory.", key, self.__source, parent_key)
+                continue
+            self.__add_node(key, ConfigTreeNode(entry_type, key, link_target))
+            if entry_type == constants.FILE_NODE:
+                self.__archive_files[key] = content
+
+    def __load_read_only__(self, root_path, store_path=None):
+        """
+        Read all files under given folder (outside of the configuration tree) once, so that they are served from
+        memory by all conversions performed in this process, e.g. the `src` folder of the dispatcher SDK shared by
+        the conversions of a fleet. The files must not be changed by the conversion rules.
+        With a store folder, the files are kept in an `SdkStore` as well: the files copied from the folder into a
+        staged tree are then staged from the store (e.g. reflinked, never hardlinked) rather than written again.
+
+        Parameters:
+            root_path (str): The path to the read-only folder
+            store_path (str): The path to the `SdkStore` folder, `None` not to store the files
+        """
+        root_path = normpath(abspath(root_path))
+        if root_path in self.__read_only_files or not isdir(root_path):
+            return
+        if store_path is not None:
+            try:
+                stored_files = SdkStore.__store__(root_path, store_path)
+                self.__stored_files.update(stored_files)
+                self.__stored_sources.update((object_path, path) for path, object_path in stored_files.items())
+            except OSError as e:
+                # the files are written into the tree instead
+                logger.error("ConfigTree: Could not store %s - %s.", e.filename, e.strerror)
+        # the folder itself is recorded as well, so that it is only read once
+        self.__read_only_files[root_path] = None
+        file_count = 0
+        for dir_path, dir_names, file_names in walk(root_path):
+            for file_name in file_names:
+                path = join(dir_path, file_name)
+                try:
+                    with open(path) as file:
+                        self.__read_only_files[path] = file.readlines()
+                    file_count += 1
+                except (OSError, UnicodeDecodeError) as e:
+                    # served from the file system instead
+                    logger.debug("ConfigTree: Could not read %s - %s.", path, e)
+        logger.info("ConfigTree: Loaded %d read-only files from %s", file_count, root_path)
+
+    def __prefetch__(self, patterns):
+        """
+        Read the files matching given glob patterns ahead, on a pool of threads, so that the I/O overlaps with the
+        work of the conversion rules. Files are read in the order of the patterns (e.g. the files of the next rules
+        first); the first access to a file waits for its read instead of reading it again.
+
+        Parameters:
+            patterns (List[str]): The glob patterns of the files to read ahead
+        """
+        # the files of an archive are in memory already
+        if self.__root is None or self.__archive_files is not None:
+            return
+        read_count = 0
+        for pattern in patterns:
+            for path in self.__glob__(pattern):
+                key = self.__resolve_or_none(path)
+                node = self.__nodes.get(key) if key is not None else None
+                if node is None or node.__get_type__() != constants.FILE_NODE or node.__get_lines__() is not None \
+                        or node.__get_origin__() in self.__pending_reads:
+                    continue
+                self.__pending_reads[node.__get_origin__()] = \
+                    self.__get_io_executor().submit(ConfigTree.__read_file, self.__source_path(node.__get_origin__()))
+                read_count += 1
+        logger.debug("ConfigTree: Reading %d files ahead.", read_count)
+
+    def __flush__(self, paths=None, excluded_paths=None):
+        """
+        Write the state of the tree back to disk: entries removed or moved away are deleted, new and modified
+        entries are written. Files whose content is unchanged (including files written with their original content)
+        are left untouched, changed files are replaced atomically (see `AtomicFileUtility`).
+        A tree loaded from a separate source folder is staged into its (empty) root instead: only the entries still in
+        the tree are created, the files never changed being copied, reflinked or hardlinked from the source folder
+        (see `__load__`). Into a root holding the entries of a previous conversion (see `__keep_root__`), only the
+        entries differing from them are staged, and the entries no longer in the tree are removed.
+        Deletions, directories and symlinks are applied right away, file contents are written (or staged) behind on
+        a pool of threads: `__wait_for_writes__` waits until they are all on disk.
+        A tree loaded for a dry run is not written at all, the changes are only counted.
+        A tree loaded with `patch` also gets an entry of the patch for every file (or symlink) written or removed,
+        compared one file at a time with its original content (see `__get_patch_entries__`).
+
+        Parameters:
+            paths (List[str]): The paths (files or folders) to write back, `None` for the complete tree
+            excluded_paths (List[str]): The paths (files or folders) not to write back (e.g. written by another
+                process). Changes outside of the written paths are reported as errors and not written.
+
+        Returns:
+            int: The number of files (and symlinks) written or removed
+        """
+        if self.__root is None:
+            return 0
+        changed_file_count = 0
+        staging = self.__source != self.__root
+        # files not read so far are not needed anymore
+        self.__cancel_reads()
+        flushed_keys = None if paths is None else self.__keys_of(paths)
+        excluded_keys = [] if excluded_paths is None else self.__keys_of(excluded_paths)
+        # the entries moved away from their original location, which are renamed rather than removed in the patch
+        moved_keys = set(node.__get_origin__() for key, node in self.__nodes.items()
+                         if node.__get_origin__() not in (None, key)
+                         and node.__get_type__() == self.__original_nodes.get(node.__get_origin__()))
+        # delete entries which do not exist (at their original location) anymore, deepest entries first
+        for key in sorted(self.__original_nodes, reverse=True):
+            node = self.__nodes.get(key)
+            if node is not None and node.__get_origin__() == key \
+                    and node.__get_type__() == self.__original_nodes[key]:
+                continue
+            path = self.__path(key)
+            if not ConfigTree.__is_within(key, flushed_keys) or ConfigTree.__is_within(key, excluded_keys):
+                logger.error("ConfigTree: Not removing %s, it lies outside of the flushed paths.", path)
+                continue
+            if self.__original_nodes[key] != constants.DIRECTORY_NODE:
+                # the entries of a previous conversion are only counted if they are removed from the root (below)
+                if not staging or self.__previous_entries is None:
+                    changed_file_count += 1
+                if self.__patch_entries is not None and key not in moved_keys:
+                    self.__patch_entries.append((key, self.__get_patch_entry(key, None, None)))
+            # a staged tree does not hold the removed entries in the first place
+            if staging or self.__dry_run:
+                continue
+            if self.__original_nodes[key] == constants.DIRECTORY_NODE and not islink(path):
+                rmtree(path, ignore_errors=True)
+            elif lexists(path):
+                remove(path)
+            logger.debug("ConfigTree: Removed %s", path)
+        # delete the entries of a previous conversion which are not in the tree anymore (or of another type), deepest
+        # entries first
+        if staging and self.__previous_entries is not None and not self.__dry_run:
+            for key in sorted(self.__previous_entries, reverse=True):
+                node = self.__nodes.get(key)
+                if node is not None and node.__get_type__() == self.__previous_entries[key] \
+                        or not ConfigTree.__is_within(key, flushed_keys) \
+                        or ConfigTree.__is_within(key, excluded_keys):
+                    continue
+                path = self.__path(key)
+                if self.__previous_entries.pop(key) == constants.DIRECTORY_NODE:
+                    rmtree(path, ignore_errors=True)
+                else:
+                    if lexists(path):
+                        remove(path)
+                    changed_file_count += 1
+                logger.debug("ConfigTree: Removed %s", path)
+        # create new directories, symlinks and write new or modified files, parents first
+        staged_file_count = 0
+        for key in sorted(self.__nodes):
+            node = self.__nodes[key]
+            path = self.__path(key)
+            origin = node.__get_origin__()
+            unchanged = origin == key and not node.__is_modified__()
+            if not ConfigTree.__is_within(key, flushed_keys) or ConfigTree.__is_within(key, excluded_keys):
+                if not unchanged:
+                    logger.error("ConfigTree: Not writing %s, it lies outside of the flushed paths.", path)
+                continue
+            if self.__patch_entries is not None and not unchanged \
+                    and node.__get_type__() != constants.DIRECTORY_NODE:
+                original_key = origin if origin is not None \
+                    and node.__get_type__() == self.__original_nodes.get(origin) else None
+                self.__patch_entries.append((key, self.__get_patch_entry(original_key, key, node)))
+            if self.__dry_run:
+                if not unchanged and node.__get_type__() != constants.DIRECTORY_NODE:
+                    changed_file_count += 1
+                continue
+            if staging and self.__previous_entries is not None:
+                # the entries a previous conversion left as they are staged now are left untouched, the other ones
+                # are replaced (and counted as changed, even if the conversion did not change them)
+                if self.__is_previous_entry(key, node):
+                    continue
+                if node.__get_type__() != constants.DIRECTORY_NODE:
+                    if self.__previous_entries.get(key) == constants.FILE_NODE:
+                        remove(path)
+                    unchanged = False
+            if node.__get_type__() == constants.DIRECTORY_NODE:
+                makedirs(path, exist_ok=True)
+                if staging and origin is not None and self.__archive_files is None:
+                    copymode(self.__source_path(origin), path)
+            elif node.__get_type__() == constants.SYMLINK_NODE:
+                if unchanged and not staging:
+                    continue
+                if lexists(path):
+                    remove(path)
+                symlink(node.__get_link_target__(), path)
+                if not unchanged:
+                    changed_file_count += 1
+            elif staging and origin is not None and not node.__is_modified__():
+                # the file is staged from the source folder (or written as read from the archive), even if it was moved
+                if self.__archive_files is not None:
+                    future = self.__get_io_executor().submit(ConfigTree.__write_content, path,
+                                                             self.__archive_files[origin])
+                else:
+                    future = self.__get_io_executor().submit(ConfigTree.__stage_file, self.__source_path(origin),
+                                                             path, self.__link_mode)
+                self.__pending_writes.append((path, future))
+                staged_file_count += 1
+                if not unchanged:
+                    changed_file_count += 1
+            elif unchanged:
+                continue
+            elif staging and node.__get_stored_path__() is not None:
+                # a file copied from a store (and not changed since) is staged from the store
+                stored_path = node.__get_stored_path__()
+                self.__pending_writes.append((path, self.__get_io_executor().submit(
+                    ConfigTree.__stage_stored_file, stored_path, self.__stored_sources[stored_path], path,
+                    self.__link_mode)))
+                staged_file_count += 1
+                changed_file_count += 1
+            else:
+                mode_path = self.__source_path(origin) \
+                    if staging and origin is not None and self.__archive_files is None else path
+                self.__pending_writes.append((path, self.__get_io_executor().submit(
+                    AtomicFileUtility.__write__, path, "".join(node.__get_lines__()), mode_path)))
+                changed_file_count += 1
+        if self.__dry_run:
+            logger.info("ConfigTree: Dry run, not writing configuration tree to %s (%d files would change).",
+                        self.__root, changed_file_count)
+        elif staging:
+            logger.info("ConfigTree: Staged configuration tree from %s to %s (%d files changed, %d files %s).",
+                        self.__source, self.__root, changed_file_count, staged_file_count,
+                        "extracted" if self.__archive_files is not None
+                        else ConfigTree.__STAGED_FILE_ACTIONS[self.__link_mode])
+        else:
+            logger.info("ConfigTree: Flushed configuration tree to %s (%d files changed).", self.__root,
+                        changed_file_count)
+        return changed_file_count
+
+    def __wait_for_writes__(self):
+        """
+        Wait until all files written behind by `__flush__` are on disk. The first error of the writes (if any) is
+        raised once all writes are done.
+        """
+        self.__leave_parent_io()
+        pending_writes = self.__pending_writes
+        self.__pending_writes = []
+        error = None
+        for path, future in pending_writes:
+            try:
+                future.result()
+                logger.debug("ConfigTree: Wrote %s", path)
+            except OSError as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+    def __stop_io__(self):
+        """
+        Complete the reads ahead and the writes behind, and stop the threads performing them, before this process is
+        forked: a process forked while a thread holds a lock (e.g. of the logging handlers or of the queue of the
+        pool) may deadlock. The files read ahead are handed to the forked processes along with the tree, and the
+        threads are started again on their next use. The first error of the writes (if any) is raised.
+        """
+        self.__leave_parent_io()
+        if self.__io_executor is not None:
+            self.__io_executor.shutdown(wait=True)
+            self.__io_executor = None
+            self.__io_pid = None
+        self.__wait_for_writes__()
+
+    def __get_patch_entries__(self):
+        """
+        Get the entries of the patch collected by `__flush__` since the tree was loaded with `patch`: one entry (in
+        the format of `git diff`, applicable with `git apply`) per file or symlink created, changed, renamed or
+        removed, along with the path of the file relative to the root. The patch is the concatenation of the
+        entries, sorted by path.
+
+        Returns:
+            List[Tuple[str, str]]: The path and entry of every changed file, `None` if no patch is collected
+        """
+        return self.__patch_entries
+
+    def __get_original_digests__(self, paths, file_digests, parser=None):
+        """
+        Get a digest of the original content (as loaded) of every entry under given paths: the SHA-256 hash of every
+        file, the target of every symlink (`-> target`), and `/` for directories. With a parser, only the files are
+        digested, by the hash of their parsed representation (following the symlinks to files), and the files parsed
+        like an empty file are left out, so e.g. adding a farm file not using any variable changes nothing.
+        Paths outside of the tree (e.g. the files of the dispatcher SDK) are read from the file system.
+
+        Parameters:
+            paths (List[str]): The paths (files or folders) of the entries
+            file_digests (dict): The size, modification time and hash of the files hashed before, keyed by their path
+                on disk (as recorded by `SdkStore`, along with the name of the parser for parsed files): files whose
+                size and modification time did not change are not hashed again. The files hashed are added.
+            parser (Callable[[List[str]], Any]): The function parsing the lines of the files, whose result (its `repr`)
+                is hashed rather than the content of the files, e.g. to only depend on the variables used in the files
+                (`None` to hash the content)
+
+        Returns:
+            dict: The digest of every entry, keyed by its key (by its absolute path, outside of the tree)
+        """
+        digests = {}
+        empty_digest = None if parser is None else ConfigTree.__get_parsed_digest(list, parser, None)
+        for path in paths:
+            key = self.__key(path)
+            if key is None:
+                ConfigTree.__add_disk_digests(normpath(abspath(path)), file_digests, digests, parser, empty_digest)
+                continue
+            for original_key, node_type in self.__original_nodes.items():
+                if not ConfigTree.__is_within(original_key, [key]):
+                    continue
+                if parser is not None:
+                    digest = self.__get_original_parsed_digest(original_key, file_digests, parser)
+                    if digest is not None and digest != empty_digest:
+                        digests[original_key] = digest
+                elif node_type == constants.DIRECTORY_NODE:
+                    digests[original_key] = "/"
+                elif node_type == constants.SYMLINK_NODE:
+                    digests[original_key] = "-> " + self.__original_link_targets[original_key]
+                elif self.__archive_files is not None:
+                    digests[original_key] = sha256(self.__archive_files[original_key]).hexdigest()
+                else:
+                    digests[original_key] = ConfigTree.__get_file_digest(self.__source_path(original_key),
+                                                                         file_digests)
+        return digests
+
+    def __get_original_parsed_digest(self, key, file_digests, parser):
+        """
+        Get the hash of the parsed representation of the original content of a file, or of the file a symlink
+        resolves to (the tree is resolved as loaded). Symlinks not resolving to a file of the tree are digested by
+        their target, and directories not at all (`None`).
+        """
+        node_type = self.__original_nodes.get(key)
+        if node_type == constants.SYMLINK_NODE:
+            target_key = self.__resolve_or_none(self.__path(key))
+            if target_key is None or self.__original_nodes.get(target_key) != constants.FILE_NODE:
+                return "-> " + self.__original_link_targets[key]
+            key = target_key
+        elif node_type != constants.FILE_NODE:
+            return None
+        if self.__archive_files is not None:
+            content = self.__archive_files[key]
+            return ConfigTree.__get_parsed_digest(partial(ConfigTree.__decode, content), parser,
+                                                  lambda: sha256(content).hexdigest())
+        return ConfigTree.__get_file_digest(self.__source_path(key), file_digests, parser)
+
+    def __keep_root__(self, kept_paths):
+        """
+        Keep the entries found on disk in the root of a staged tree (e.g. staged by a previous conversion):
+        `__flush__` then compares the entries of the tree with them, only staging the entries which differ and
+        removing the ones no longer in the tree, so the files the conversion produces as before are not written again.
+        The kept paths are left as they are (see `excluded_paths` of `__flush__`). A tree converted in place is left
+        untouched.
+
+        Parameters:
+            kept_paths (List[str]): The paths (files or folders) to leave as they are
+        """
+        if self.__root is None or self.__source == self.__root or not isdir(self.__root):
+            return
+        kept_keys = self.__keys_of(kept_paths)
+        self.__previous_entries = {}
+        dir_keys = [""]
+        while dir_keys:
+            dir_key = dir_keys.pop()
+            for entry in scandir(self.__path(dir_key)):
+                key = entry.name if dir_key == "" else dir_key + "/" + entry.name
+                if ConfigTree.__is_within(key, kept_keys):
+                    continue
+                if entry.is_symlink():
+                    self.__previous_entries[key] = constants.SYMLINK_NODE
+                elif entry.is_dir():
+                    self.__previous_entries[key] = constants.DIRECTORY_NODE
+                    dir_keys.append(key)
+                else:
+                    self.__previous_entries[key] = constants.FILE_NODE
+        logger.info("ConfigTree: Found %d entries of a previous conversion in %s, keeping %d paths.",
+                    len(self.__previous_entries), self.__root, len(kept_keys))
+
+    def __is_previous_entry(self, key, node):
+        """
+        Check whether the root holds the entry as a previous conversion left it (see `__keep_root__`): a directory,
+        a symlink with the same target, or a file with the same content (compared with the file it is staged from,
+        if its size and modification time differ).
+        """
+        if self.__previous_entries is None or self.__previous_entries.get(key) != node.__get_type__():
+            return False
+        path = self.__path(key)
+        origin = node.__get_origin__()
+        try:
+            if node.__get_type__() == constants.DIRECTORY_NODE:
+                return True
+            if node.__get_type__() == constants.SYMLINK_NODE:
+                return readlink(path) == node.__get_link_target__()
+            if origin is not None and not node.__is_modified__():
+                if self.__archive_files is not None:
+                    return ConfigTree.__has_content(path, self.__archive_files[origin])
+                return cmp(self.__source_path(origin), path)
+            if node.__get_stored_path__() is not None:
+                return cmp(node.__get_stored_path__(), path)
+            return ConfigTree.__has_content(path, "".join(node.__get_lines__()))
+        except (OSError, ValueError) as e:
+            logger.debug("ConfigTree: Could not compare %s - %s, writing it again.", path, e)
+            return False
+
+    def __get_root__(self):
+        """
+        Get the absolute path of the loaded configuration folder (`None` if no tree has been loaded).
+        """
+        return self.__root
+
+    def __add_listener__(self, listener):
+        """
+        Register a function to be notified (with the absolute path of the file) of every file whose content changed,
+        or which was created, removed or moved within the tree. The function is called with `None` when a new tree
+        is loaded.
+        """
+        self.__listeners.append(listener)
+
+    def __realpath__(self, path):
+        """
+        Get the absolute path of given path with all symlinks within the tree resolved.
+        """
+        key = self.__resolve(path, True)
+        if key is None:
+            return realpath(path)
+        return self.__path(key)
+
+    def __exists__(self, path):
+        """
+        Check whether the path exists (following symlinks).
+        """
+        key = self.__resolve_or_none(path)
+        if key is None:
+            return self.__read_only_lines(path) is not None or exists(path)
+        return key in self.__nodes
+
+    def __isfile__(self, path):
+        """
+        Check whether the path is an existing regular file (following symlinks).
+        """
+        key = self.__resolve_or_none(path)
+        if key is None:
+            return self.__read_only_lines(path) is not None or isfile(path)
+        return key in self.__nodes and self.__nodes[key].__get_type__() == constants.FILE_NODE
+
+    def __isdir__(self, path):
+        """
+        Check whether the path is an existing directory (following symlinks).
+        """
+        key = self.__resolve_or_none(path)
+        if key is None:
+            return isdir(path)
+        return key in self.__nodes and self.__nodes[key].__get_type__() == constants.DIRECTORY_NODE
+
+    def __islink__(self, path):
+        """
+        Check whether the path is a symlink.
+        """
+        key = self.__resolve(path, False)
+        if key is None:
+            return islink(path)
+        return key in self.__nodes and self.__nodes[key].__get_type__() == constants.SYMLINK_NODE
+
+    def __listdir__(self, path):
+        """
+        Get the names of the entries in given directory.
+        """
+        key = self.__resolve(path, True)
+        if key is None:
+            return listdir(path)
+        self.__require_directory(key, path)
+        return sorted(self.__children[key])
+
+    def __glob__(self, pattern):
+        """
+        Return the (sorted) paths matching the given pattern, with the semantics of `glob(pattern, recursive=True)`.
+        """
+        components = pattern.replace("\\", "/").split("/") if sep == "\\" else pattern.split("/")
+        literal_count = 0
+        for component in components:
+            if ConfigTree.__MAGIC_CHECK.search(component):
+                break
+            literal_count += 1
+        if literal_count == len(components):
+            return [pattern] if self.__lexists(pattern) else []
+        literal_path = sep.join(components[:literal_count])
+        base_key = self.__resolve(literal_path if literal_path else ".", True)
+        if base_key is None:
+            return sorted(glob(pattern, recursive=True))
+        if base_key not in self.__nodes:
+            return []
+        regex = ConfigTree.__translate(components[literal_count:])
+        prefix = "" if base_key == "" else base_key + "/"
+        matches = []
+        for key in self.__glob_candidates(base_key, components[literal_count:]):
+            if regex.fullmatch(key[len(prefix):]):
+                matches.append(join(literal_path, key[len(prefix):].replace("/", sep)))
+        return sorted(matches)
+
+    def __read_lines__(self, path):
+        """
+        Return (a copy of) the lines of given file, following symlinks.
+        """
+        key = self.__resolve(path, True)
+        if key is None:
+            lines = self.__read_only_lines(path)
+            if lines is not None:
+                return list(lines)
+            with open(path) as file:
+                return file.readlines()
+        node = self.__require_file(key, path)
+        return list(self.__lines_of(key, node))
+
+    def __write_lines__(self, path, lines):
+        """
+        Replace the content of given file (creating it if required), following symlinks.
+        """
+        key = self.__resolve(path, True)
+        if key is None:
+            with open(path, "w") as file:
+                file.write("".join(lines))
+            return
+        node = self.__nodes.get(key)
+        if node is None:
+            self.__require_directory(self.__parent(key), path)
+            self.__add_node(key, ConfigTreeNode(constants.FILE_NODE, None, None, list(lines)))
+        elif node.__get_type__() == constants.DIRECTORY_NODE:
+            raise IsADirectoryError(EISDIR, strerror(EISDIR), path)
+        else:
+            node.__set_lines__(list(lines))
+        self.__notify(key)
+
+    def __get_parsed__(self, path, parser):
+        """
+        Return `parser(lines)` for given file, following symlinks. The result is cached until the content of the
+        file changes, so every rule working on the same version of a file shares a single parse.
+        The parser receives the lines held by the tree and must not modify them. With a parse cache (see
+        `__set_parse_cache__`), the result is loaded from the cache if the same content was parsed before.
+
+        Parameters:
+            path (str): The path to the file
+            parser (Callable[[List[str]], Any]): The function parsing the lines of the file
+        """
+        key = self.__resolve(path, True)
+        if key is None:
+            return self.__parse(self.__read_lines__(path), parser)
+        node = self.__require_file(key, path)
+        parsed = node.__get_parsed__(parser)
+        if parsed is None:
+            parsed = self.__parse(self.__lines_of(key, node), parser)
+            node.__set_parsed__(parser, parsed)
+        return parsed
+
+    def __set_parse_cache__(self, parse_cache):
+        """
+        Set the persistent cache of the parsed representations of the files used by `__get_parsed__` (`None` for no
+        cache), e.g. shared by all conversions of a fleet.
+
+        Parameters:
+            parse_cache (ParseCache): The parse cache
+        """
+        self.__parse_cache = parse_cache
+
+    def __contains_any__(self, path, tokens):
+        """
+        Check whether the content of given file contains any of the tokens (e.g. the variables or file names a rule
+        looks for), following symlinks, so that the rules can skip the files they cannot match without parsing their
+        lines. The content of the files read so far is searched in memory (joined once per version of the file),
+        files not read yet are memory-mapped and searched on disk, without being read into the tree.
+
+        Parameters:
+            path (str): The path to the file
+            tokens (Iterable[str]): The tokens to look for
+
+        Returns:
+            bool: `True` if any of the tokens occurs in the file
+        """
+        tokens = list(tokens)
+        key = self.__resolve(path, True)
+        if key is None:
+            lines = self.__read_only_lines(path)
+            if lines is None:
+                return ConfigTree.__file_contains_any(path, tokens)
+            text = "".join(lines)
+        else:
+            node = self.__require_file(key, path)
+            self.__leave_parent_io()
+            if node.__get_lines__() is None and self.__archive_files is not None:
+                content = self.__archive_files[node.__get_origin__()]
+                return any(token.encode() in content for token in tokens)
+            if node.__get_lines__() is None and node.__get_origin__() not in self.__pending_reads:
+                return ConfigTree.__file_contains_any(self.__source_path(node.__get_origin__()), tokens)
+            text = node.__get_parsed__(ConfigTree.__join_lines)
+            if text is None:
+                text = ConfigTree.__join_lines(self.__lines_of(key, node))
+                node.__set_parsed__(ConfigTree.__join_lines, text)
+        return any(token in text for token in tokens)
+
+    def __remove__(self, path):
+        """
+        Remove given file or symlink.
+        """
+        key = self.__resolve(path, False)
+        if key is None:
+            remove(path)
+            return
+        if key not in self.__nodes:
+            raise FileNotFoundError(ENOENT, strerror(ENOENT), path)
+        if self.__nodes[key].__get_type__() == constants.DIRECTORY_NODE:
+            raise IsADirectoryError(EISDIR, strerror(EISDIR), path)
+        if self.__remove_node(key).__get_type__() == constants.FILE_NODE:
+            self.__notify(key)
+
+    def __rmtree__(self, path):
+        """
+        Remove given directory and all entries in it.
+        """
+        key = self.__resolve(path, False)
+        if key is None:
+            rmtree(path)
+            return
+        self.__require_directory(key, path)
+        for child_key in self.__subtree(key):
+            if self.__remove_node(child_key).__get_type__() == constants.FILE_NODE:
+                self.__notify(child_key)
+
+    def __rename__(self, src_path, dest_path):
+        """
+        Rename (move) given file, symlink or directory.
+        """
+        src_key = self.__resolve(src_path, False)
+        dest_key = self.__resolve(dest_path, False)
+        if src_key is None and dest_key is None:
+            rename(src_path, dest_path)
+            return
+        if src_key is None or dest_key is None:
+            raise OSError("ConfigTree: Cannot move entries into or out of the configuration tree", src_path)
+        if src_key not in self.__nodes:
+            raise FileNotFoundError(ENOENT, strerror(ENOENT), src_path)
+        self.__require_directory(self.__parent(dest_key), dest_path)
+        if src_key == dest_key:
+            return
+        dest_node = self.__nodes.get(dest_key)
+        if dest_node is not None and dest_node.__get_type__() == constants.DIRECTORY_NODE:
+            if self.__nodes[src_key].__get_type__() != constants.DIRECTORY_NODE:
+                raise IsADirectoryError(EISDIR, strerror(EISDIR), dest_path)
+            if self.__children[dest_key]:
+                raise OSError(ENOTEMPTY, strerror(ENOTEMPTY), dest_path)
+        if dest_node is not None:
+            self.__remove_node(dest_key)
+        # moved files are read now, since their original location is going to be removed on flush
+        moved_keys = self.__subtree(src_key)
+        for key in moved_keys:
+            node = self.__remove_node(key)
+            self.__add_node(dest_key + key[len(src_key):], node)
+            if node.__get_type__() == constants.FILE_NODE:
+                self.__lines_of(key, node)
+                self.__notify(key)
+                self.__notify(dest_key + key[len(src_key):])
+
+    def __copy__(self, src_path, dest_path):
+        """
+        Copy given file (with the semantics of `shutil.copy`), either from the file system or from within the tree.
+        A file already holding the same content is left untouched. A stored read-only file (see
+        `__load_read_only__`) copied into a staged tree is staged from the store by `__flush__`.
+        """
+        if self.__isdir__(dest_path):
+            dest_path = join(dest_path, basename(src_path))
+        dest_key = self.__resolve(dest_path, True)
+        src_key = self.__resolve(src_path, True)
+        if dest_key is None and src_key is None:
+            copy(src_path, dest_path)
+            return
+        lines = self.__read_lines__(src_path)
+        dest_node = self.__nodes.get(dest_key) if dest_key is not None else None
+        if dest_node is not None and dest_node.__get_type__() == constants.FILE_NODE \
+                and self.__lines_of(dest_key, dest_node) == lines:
+            logger.debug("ConfigTree: Not copying %s, %s is identical.", src_path, dest_path)
+            return
+        self.__write_lines__(dest_path, lines)
+        if dest_key is not None and src_key is None:
+            self.__nodes[dest_key].__set_stored_path__(self.__stored_files.get(normpath(abspath(src_path))))
+
+    # characters denoting a glob pattern
+    __MAGIC_CHECK = compile('[*?[]')
+
+    @staticmethod
+    def __translate(components):
+        """
+        Translate the (non-literal) components of a glob pattern into a regular expression matching relative keys.
+        """
+        regex = ""
+        for index, component in enumerate(components):
+            last = index == len(components) - 1
+            if component == "**":
+                # zero or more (non-hidden) directories
+                regex += "(?:[^/.][^/]*(?:/[^/.][^/]*)*)?" if last else "(?:[^/.][^/]*/)*"
+                continue
+            # like `glob`, wildcards do not match hidden entries
+            part = "" if component.startswith(".") else "(?!\\.)"
+            i = 0
+            while i < len(component):
+                char = component[i]
+                if char == "*":
+                    part += "[^/]*"
+                elif char == "?":
+                    part += "[^/]"
+                elif char == "[" and component.find("]", i + 2) != -1:
+                    end = component.find("]", i + 2)
+                    content = component[i + 1:end]
+                    if content.startswith("!"):
+                        content = "^" + content[1:]
+                    part += "[" + content.replace("\\", "\\\\") + "]"
+                    i = end
+                else:
+                    part += escape(char)
+                i += 1
+            regex += part if last else part + "/"
+        return compile(regex)
+
+    def __parse(self, lines, parser):
+        if self.__parse_cache is None:
+            return parser(lines)
+        return self.__parse_cache.__get_parsed__(lines, parser)
+
+    def __key(self, path):
+        """
+        Get the key of a path (relative to the root), or `None` if the path lies outside of the tree.
+        """
+        if self.__root is None:
+            return None
+        path = normpath(abspath(path))
+        if path == self.__root:
+            return ""
+        if not path.startswith(self.__root + sep):
+            return None
+        return path[len(self.__root) + 1:].replace(sep, "/")
+
+    def __read_only_lines(self, path):
+        """
+        Get the content of given read-only file (see `__load_read_only__`), or `None` if it is not a read-only file.
+        """
+        if not self.__read_only_files:
+            return None
+        return self.__read_only_files.get(normpath(abspath(path)))
+
+    def __path(self, key):
+        return self.__root if key == "" else join(self.__root, key.replace("/", sep))
+
+    def __source_path(self, key):
+        """
+        Get the path of an entry in the folder the tree was loaded from.
+        """
+        return self.__source if key == "" else join(self.__source, key.replace("/", sep))
+
+    def __keys_of(self, paths):
+        """
+        Get the keys of the paths lying within the tree.
+        """
+        return [key for key in (self.__key(path) for path in paths) if key is not None]
+
+    def __resolve(self, path, follow_last):
+        """
+        Get the key of a path after resolving the symlinks in it, or `None` if the path lies outside of the tree.
+        Symlinks pointing outside of the tree resolve to `None` as well.
+        """
+        key = self.__key(path)
+        depth = 0
+        while key is not None:
+            resolved = ""
+            components = key.split("/") if key else []
+            for index, component in enumerate(components):
+                current = component if resolved == "" else resolved + "/" + component
+                node = self.__nodes.get(current)
+                last = index == len(components) - 1
+                if node is not None and node.__get_type__() == constants.SYMLINK_NODE and (follow_last or not last):
+                    depth += 1
+                    if depth > ConfigTree.__MAX_SYMLINK_DEPTH:
+                        raise OSError(ELOOP, strerror(ELOOP), path)
+                    target = node.__get_link_target__()
+                    target_path = target if isabs(target) else join(dirname(self.__path(current)), target)
+                    remainder = components[index + 1:]
+                    key = self.__key(join(target_path, *remainder) if remainder else target_path)
+                    break
+                resolved = current
+            else:
+                return key
+        return None
+
+    def __resolve_or_none(self, path):
+        """
+        Resolve the path (following all symlinks), with paths caught in a symlink loop resolving to `None`
+        (like `os.path`, the queries then report them as not existing).
+        """
+        try:
+            return self.__resolve(path, True)
+        except OSError:
+            return None
+
+    def __lexists(self, path):
+        key = self.__resolve(path, False)
+        if key is None:
+            return lexists(path)
+        return key in self.__nodes
+
+    @staticmethod
+    def __is_within(key, keys):
+        """
+        Check whether the entry is (or lies within) any of given entries, `None` standing for the complete tree.
+        """
+        return keys is None or any(other_key == "" or key == other_key or key.startswith(other_key + "/")
+                                   for other_key in keys)
+
+    @staticmethod
+    def __parent(key):
+        return key[:key.rfind("/")] if "/" in key else ""
+
+    def __subtree(self, key, max_depth=None):
+        """
+        Get the keys of given entry and all entries below it (parents first), down to given depth.
+        """
+        keys = [key]
+        level = [key]
+        depth = 0
+        while level and (max_depth is None or depth < max_depth):
+            level = [name if parent == "" else parent + "/" + name
+                     for parent in level for name in self.__children.get(parent, ())]
+            keys.extend(level)
+            depth += 1
+        return keys
+
+    def __glob_candidates(self, base_key, components):
+        """
+        Get the keys below given base which may match the (non-literal) components of a glob pattern: the keys with
+        the extension of the last component if it has a literal one (e.g. `*.vhost`), otherwise the keys down to the
+        depth of the pattern.
+        """
+        last = components[-1]
+        extension = last[last.rfind(".") + 1:] if last.startswith("*.") else None
+        if extension is not None and not ConfigTree.__MAGIC_CHECK.search(extension) and "." not in extension:
+            prefix = "" if base_key == "" else base_key + "/"
+            return [key for key in self.__keys_by_extension.get(extension, ()) if key.startswith(prefix)]
+        max_depth = None if "**" in components else len(components)
+        return self.__subtree(base_key, max_depth)[1:]
+
+    def __add_node(self, key, node):
+        """
+        Add an entry to the tree and its indexes.
+        """
+        self.__nodes[key] = node
+        if node.__get_type__() == constants.DIRECTORY_NODE:
+            self.__children[key] = set()
+        if key == "":
+            return
+        name = key[key.rfind("/") + 1:]
+        self.__children[self.__parent(key)].add(name)
+        if "." in name:
+            self.__keys_by_extension.setdefault(name[name.rfind(".") + 1:], set()).add(key)
+
+    def __remove_node(self, key):
+        """
+        Remove an entry from the tree and its indexes, returning it.
+        """
+        node = self.__nodes.pop(key)
+        self.__children.pop(key, None)
+        name = key[key.rfind("/") + 1:]
+        if self.__parent(key) in self.__children:
+            self.__children[self.__parent(key)].discard(name)
+        if "." in name:
+            self.__keys_by_extension[name[name.rfind(".") + 1:]].discard(key)
+        return node
+
+    def __require_directory(self, key, path):
+        if key not in self.__nodes:
+            raise FileNotFoundError(ENOENT, strerror(ENOENT), path)
+        if self.__nodes[key].__get_type__() != constants.DIRECTORY_NODE:
+            raise NotADirectoryError(ENOTDIR, strerror(ENOTDIR), path)
+
+    def __require_file(self, key, path):
+        node = self.__nodes.get(key)
+        if node is None:
+            raise FileNotFoundError(ENOENT, strerror(ENOENT), path)
+        if node.__get_type__() == constants.DIRECTORY_NODE:
+            raise IsADirectoryError(EISDIR, strerror(EISDIR), path)
+        return node
+
+    def __notify(self, key):
+        path = self.__path(key)
+        for listener in self.__listeners:
+            listener(path)
+
+    def __lines_of(self, key, node):
+        """
+        Get the lines of a file node, reading them from disk on first access (or waiting for them, if the file is
+        being read ahead).
+        """
+        if node.__get_lines__() is None:
+            self.__leave_parent_io()
+            future = self.__pending_reads.pop(node.__get_origin__(), None)
+            if future is not None:
+                node.__set_lines__(future.result(), False)
+            elif self.__archive_files is not None:
+                node.__set_lines__(ConfigTree.__decode(self.__archive_files[node.__get_origin__()]), False)
+            else:
+                node.__set_lines__(ConfigTree.__read_file(self.__source_path(node.__get_origin__())), False)
+        return node.__get_lines__()
+
+    def __get_io_executor(self):
+        """
+        Get the pool of threads reading and writing files, starting it in this process if required.
+        """
+        self.__leave_parent_io()
+        if self.__io_executor is None:
+            self.__io_executor = ThreadPoolExecutor(max_workers=ConfigTree.__IO_THREADS)
+            self.__io_pid = getpid()
+        return self.__io_executor
+
+    def __leave_parent_io(self):
+        """
+        Forget the reads and writes of the parent process in a forked process: the threads performing them do not
+        run in this process (the files are read again if needed, the parent waits for its own writes).
+        """
+        if self.__io_pid is not None and self.__io_pid != getpid():
+            self.__io_executor = None
+            self.__io_pid = None
+            self.__pending_reads = {}
+            self.__pending_writes = []
+
+    def __cancel_reads(self):
+        """
+        Forget the files being read ahead (the reads which already started complete in the background).
+        """
+        self.__leave_parent_io()
+        for future in self.__pending_reads.values():
+            future.cancel()
+        self.__pending_reads = {}
+
+    def __get_patch_entry(self, original_key, key, node):
+        """
+        Get the entry of the patch turning the original file (or symlink) at `original_key` into given node at `key`.
+        A file created has no original key, a file removed neither a key nor a node; a file moved away from its
+        original key is renamed.
+        """
+        old_name = "a/" + (original_key if original_key is not None else key)
+        new_name = "b/" + (key if key is not None else original_key)
+        header = ["diff --git " + old_name + " " + new_name + "\n"]
+        try:
+            old_lines = [] if original_key is None else self.__original_content(original_key, node)
+            new_lines = [] if node is None else ([node.__get_link_target__()]
+                                                 if node.__get_type__() == constants.SYMLINK_NODE
+                                                 else self.__lines_of(key, node))
+        except (OSError, UnicodeDecodeError) as e:
+            logger.error("ConfigTree: Could not compare %s with its original content - %s.", new_name[2:], e)
+            return "".join(header) + "Binary files " + old_name + " and " + new_name + " differ\n"
+        if original_key is None:
+            header.append("new file mode " + ConfigTree.__patch_mode(node.__get_type__()) + "\n")
+        elif node is None:
+            header.append("deleted file mode " + ConfigTree.__patch_mode(self.__original_nodes[original_key]) + "\n")
+        elif original_key != key:
+            similarity = int(SequenceMatcher(None, old_lines, new_lines).ratio() * 100) if old_lines != new_lines \
+                else 100
+            header.extend(["similarity index " + str(similarity) + "%\n", "rename from " + original_key + "\n",
+                           "rename to " + key + "\n"])
+        diff = unified_diff(old_lines, new_lines, "/dev/null" if original_key is None else old_name,
+                            "/dev/null" if node is None else new_name)
+        # lines without line break are marked as such, like `diff` does
+        return "".join(header) + "".join(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n"
+                                         for line in diff)
+
+    def __original_content(self, key, node):
+        """
+        Get the original content of an entry, as loaded (the target of a symlink, as a single line without line
+        break).
+        """
+        if self.__original_nodes[key] == constants.SYMLINK_NODE:
+            return [self.__original_link_targets[key]]
+        if node is not None and node.__get_original_lines__() is not None:
+            return node.__get_original_lines__()
+        if self.__archive_files is not None:
+            return ConfigTree.__decode(self.__archive_files[key])
+        return ConfigTree.__read_file(self.__source_path(key))
+
+    @staticmethod
+    def __patch_mode(node_type):
+        return "120000" if node_type == constants.SYMLINK_NODE else "100644"
+
+    @staticmethod
+    def __stage_file(source_path, path, link_mode):
+        """
+        Stage a file from the source folder, with given link mode. Files which cannot be hardlinked or reflinked
+        (e.g. across file systems) are copied.
+        """
+        if link_mode == constants.LINK_MODE_HARDLINK:
+            try:
+                link(source_path, path)
+                return
+            except OSError as e:
+                logger.debug("ConfigTree: Could not hardlink %s - %s, copying it.", source_path, e.strerror)
+        elif link_mode == constants.LINK_MODE_REFLINK and copy_file_range is not None:
+            try:
+                # copy_file_range shares the extents of the file on file systems supporting it (e.g. Btrfs or XFS)
+                with open(source_path, "rb") as source_file, open(path, "wb") as file:
+                    remaining = fstat(source_file.fileno()).st_size
+                    while remaining > 0:
+                        copied = copy_file_range(source_file.fileno(), file.fileno(), remaining)
+                        if copied == 0:
+                            break
+                        remaining -= copied
+                if remaining == 0:
+                    copystat(source_path, path)
+                    return
+            except OSError as e:
+                logger.debug("ConfigTree: Could not reflink %s - %s, copying it.", source_path, e.strerror)
+        copy2(source_path, path)
+
+    @staticmethod
+    def __stage_stored_file(stored_path, source_path, path, link_mode):
+        """
+        Stage a file from the object it is stored as in an `SdkStore`, once the object is checked (see
+        `SdkStore.__check_object__`). Stored objects are copied rather than hardlinked: the customer edits the files
+        copied from the SDK, which must not change the object shared with other conversions.
+        """
+        if not SdkStore.__check_object__(stored_path, source_path):
+            stored_path = source_path
+        ConfigTree.__stage_file(stored_path, path, constants.LINK_MODE_COPY
+                                if link_mode == constants.LINK_MODE_HARDLINK else link_mode)
+
+    @staticmethod
+    def __get_file_digest(path, file_digests, parser=None):
+        """
+        Get the SHA-256 hash of a file on disk (or of its parsed representation), unless its size and modification
+        time are the ones recorded in `file_digests` (see `__get_original_digests__`).
+        """
+        stats = stat(path)
+        digest_key = path if parser is None else path + " " + parser.__module__ + "." + parser.__qualname__
+        recorded = file_digests.get(digest_key)
+        if recorded is not None and recorded[0] == stats.st_size and recorded[1] == stats.st_mtime_ns:
+            return recorded[2]
+        digest = SdkStore.__hash_file__(path) if parser is None \
+            else ConfigTree.__get_parsed_digest(partial(ConfigTree.__read_file, path), parser,
+                                                partial(SdkStore.__hash_file__, path))
+        file_digests[digest_key] = [stats.st_size, stats.st_mtime_ns, digest]
+        return digest
+
+    @staticmethod
+    def __get_parsed_digest(read_lines, parser, hash_content):
+        """
+        Get the SHA-256 hash of the parsed representation of the lines of a file (see `__get_original_digests__`), or
+        the hash of its content if it cannot be read as text (e.g. a binary file).
+        """
+        try:
+            return sha256(repr(parser(read_lines())).encode()).hexdigest()
+        except ValueError:
+            return hash_content()
+
+    @staticmethod
+    def __add_disk_digests(path, file_digests, digests, parser=None, empty_digest=None):
+        """
+        Add the digests of the entries under given path of the file system (see `__get_original_digests__`).
+        """
+        if parser is not None:
+            entry_paths = [path] if not isdir(path) or islink(path) \
+                else [join(dir_path, name) for dir_path, dir_names, file_names in walk(path)
+                      for name in dir_names + file_names]
+            for entry_path in entry_paths:
+                if isfile(entry_path):
+                    digest = ConfigTree.__get_file_digest(entry_path, file_digests, parser)
+                    if digest != empty_digest:
+                        digests[entry_path] = digest
+                elif islink(entry_path):
+                    digests[entry_path] = "-> " + readlink(entry_path)
+        elif islink(path):
+            digests[path] = "-> " + readlink(path)
+        elif isfile(path):
+            digests[path] = ConfigTree.__get_file_digest(path, file_digests)
+        elif isdir(path):
+            for dir_path, dir_names, file_names in walk(path):
+                digests[dir_path] = "/"
+                for name in dir_names + file_names:
+                    entry_path = join(dir_path, name)
+                    if islink(entry_path):
+                        digests[entry_path] = "-> " + readlink(entry_path)
+                    elif name in file_names:
+                        digests[entry_path] = ConfigTree.__get_file_digest(entry_path, file_digests)
+
+    @staticmethod
+    def __join_lines(lines):
+        return "".join(lines)
+
+    @staticmethod
+    def __file_contains_any(path, tokens):
+        """
+        Search the tokens in given file on disk, through a read-only memory map of the file.
+        """
+        with open(path, "rb") as file:
+            # empty files cannot be mapped
+            if fstat(file.fileno()).st_size == 0:
+                return False
+            with mmap(file.fileno(), 0, access=ACCESS_READ) as content:
+                return any(content.find(token.encode()) != -1 for token in tokens)
+
+    @staticmethod
+    def __decode(content):
+        """
+        Decode the content of a file read from an archive, like a file opened in text mode.
+        """
+        return TextIOWrapper(BytesIO(content)).readlines()
+
+    @staticmethod
+    def __has_content(path, content):
+        """
+        Check whether a file holds given content (text, as written by `AtomicFileUtility`, or binary data).
+        """
+        with open(path, "rb") if isinstance(content, bytes) else open(path, newline="") as file:
+            return file.read() == content
+
+    @staticmethod
+    def __write_content(path, content):
+        with open(path, "wb") as file:
+            file.write(content)
+
+    @staticmethod
+    def __read_file(path):
+        with open(path) as file:
+            return file.readlines()
+
+
+# the configuration tree shared by the converter and the file and folder utilities
+config_tree = ConfigTree()
@@ -0,0 +1,185 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util import constants
+from util.setup_logger_utility import logger
+
+from ctypes import CDLL, get_errno
+from ctypes.util import find_library
+from os import close, lstat, read, strerror, walk
+from os.path import isdir, join
+from select import select
+from struct import calcsize, unpack_from
+from time import sleep
+
+
+class ConfigWatcher:
+    """
+    Watches a dispatcher configuration (folder or archive) for changes, e.g. to convert it again whenever one of its
+    files is saved (`main.py --watch`).
+
+    Where inotify is available (Linux), every folder of the configuration is watched, the folders created later being
+    watched as well once they are found. Otherwise, and for archives, the configuration is polled: the type, size and
+    modification time of all its entries are compared with the ones found before. Changes are collected until the
+    configuration stays unchanged for a moment, so that saving several files (or a file in several writes) leads to
+    a single conversion.
+
+    Attributes:
+    __path (str): The path to the configuration folder or archive.
+    __inotify (CDLL): The C library providing inotify, `None` when polling.
+    __inotify_fd (int): The inotify file descriptor, `None` when polling.
+    __entries (dict): The type, size and modification time of every entry found by the last poll, keyed by its path.
+    """
+    __path = None
+    __inotify = None
+    __inotify_fd = None
+    __entries = None
+
+    # the events watched by inotify: IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE,
+    # IN_DELETE, IN_DELETE_SELF and IN_MOVE_SELF
+    __INOTIFY_EVENTS = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200 | 0x400 | 0x800
+
+    # IN_CLOEXEC, the inotify file descriptor is not inherited by the processes started by the conversion
+    __INOTIFY_FLAGS = 0o2000000
+
+    # header of an inotify event (watch descriptor, mask, cookie and length of the name following it)
+    __EVENT_HEADER = "iIII"
+
+    # size of the buffer the inotify events are read into
+    __BUFFER_SIZE = 1 << 16
+
+    def __init__(self, path):
+        """
+        Start watching the configuration: the changes made from now on are reported by `__wait_for_change__`.
+
+        Parameters:
+            path (str): The path to the configuration folder or archive
+        """
+        self.__path = path
+        if isdir(path):
+            self.__start_inotify()
+        if self.__inotify_fd is None:
+            self.__entries = self.__poll()
+        logger.info("ConfigWatcher: Watching %s (%s).", path, "polling" if self.__inotify_fd is None else "inotify")
+
+    def __wait_for_change__(self):
+        """
+        Wait until the configuration changed, and then until it stays unchanged for `WATCH_SETTLE_TIME` seconds.
+
+        Returns:
+            int: The number of changes (inotify events or changed entries) seen
+        """
+        if self.__inotify_fd is not None:
+            select([self.__inotify_fd], [], [])
+            change_count = self.__read_events()
+            while select([self.__inotify_fd], [], [], constants.WATCH_SETTLE_TIME)[0]:
+                change_count += self.__read_events()
+            # the folders created meanwhile are watched as well
+            if not self.__add_watches():
+                self.__close__()
+                self.__entries = self.__poll()
+        else:
+            entries = self.__entries
+            while entries == self.__entries:
+                sleep(constants.WATCH_POLL_INTERVAL)
+                entries = self.__poll()
+            while True:
+                sleep(constants.WATCH_SETTLE_TIME)
+                settled_entries = self.__poll()
+                if settled_entries == entries:
+                    break
+                entries = settled_entries
+            change_count = len(set(entries.items()) ^ set(self.__entries.items()))
+            self.__entries = entries
+        logger.info("ConfigWatcher: %s changed (%d changes).", self.__path, change_count)
+        return change_count
+
+    def __close__(self):
+        """
+        Stop watching the configuration.
+        """
+        if self.__inotify_fd is not None:
+            close(self.__inotify_fd)
+            self.__inotify_fd = None
+
+    def __start_inotify(self):
+        """
+        Watch the folders of the configuration with inotify, where available.
+        """
+        try:
+            inotify = CDLL(find_library("c"), use_errno=True)
+            inotify_fd = inotify.inotify_init1(ConfigWatcher.__INOTIFY_FLAGS)
+        except (OSError, AttributeError, TypeError) as e:
+            logger.debug("ConfigWatcher: inotify is not available - %s.", e)
+            return
+        if inotify_fd < 0:
+            logger.debug("ConfigWatcher: inotify is not available - %s.", strerror(get_errno()))
+            return
+        self.__inotify = inotify
+        self.__inotify_fd = inotify_fd
+        if not self.__add_watches():
+            self.__close__()
+
+    def __add_watches(self):
+        """
+        Watch every folder of the configuration (folders watched already keep their watch).
+
+        Returns:
+            bool: `False` if a folder could not be watched (e.g. the limit of watches is reached)
+        """
+        for dir_path, dir_names, file_names in walk(self.__path):
+            if self.__inotify.inotify_add_watch(self.__inotify_fd, dir_path.encode(),
+                                                ConfigWatcher.__INOTIFY_EVENTS) < 0:
+                logger.error("ConfigWatcher: Could not watch %s - %s, polling instead.", dir_path,
+                             strerror(get_errno()))
+                return False
+        return True
+
+    def __read_events(self):
+        """
+        Read the pending inotify events.
+
+        Returns:
+            int: The number of events read
+        """
+        data = read(self.__inotify_fd, ConfigWatcher.__BUFFER_SIZE)
+        header_size = calcsize(ConfigWatcher.__EVENT_HEADER)
+        event_count = 0
+        offset = 0
+        while offset + header_size <= len(data):
+            watch_descriptor, mask, cookie, name_length = unpack_from(ConfigWatcher.__EVENT_HEADER, data, offset)
+            offset += header_size + name_length
+            event_count += 1
+        return event_count
+
+    def __poll(self):
+        """
+        Get the type, size and modification time of every entry of the configuration.
+        """
+        entries = {}
+        try:
+            stats = lstat(self.__path)
+            entries[self.__path] = (stats.st_mode, stats.st_size, stats.st_mtime_ns)
+        except OSError:
+            # e.g. an archive being replaced
+            return entries
+        for dir_path, dir_names, file_names in walk(self.__path):
+            for name in dir_names + file_names:
+                path = join(dir_path, name)
+                try:
+                    stats = lstat(path)
+                except OSError:
+                    continue
+                entries[path] = (stats.st_mode, stats.st_size, stats.st_mtime_ns)
+        return entries
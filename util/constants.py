@@ -18,9 +18,31 @@ TARGET_FOLDER = "./target"
 
 TARGET_DISPATCHER_SRC_FOLDER = join(TARGET_FOLDER, "src")
 
-LOG_FILE = "./result.log"
+LOG_FILE_NAME = "result.log"
 
-SUMMARY_REPORT_FILE = join(TARGET_FOLDER, "conversion-report.md")
+LOG_FILE = join(".", LOG_FILE_NAME)
+
+SUMMARY_REPORT_FILE_NAME = "conversion-report.md"
+
+SUMMARY_REPORT_FILE = join(TARGET_FOLDER, SUMMARY_REPORT_FILE_NAME)
+
+FLEET_REPORT_FILE_NAME = "fleet-report.md"
+
+MANIFEST_FILE = join(TARGET_FOLDER, "conversion-manifest.json")
+
+# default maximum size of the parse cache, in megabytes
+PARSE_CACHE_SIZE = 256
+
+# seconds between two polls of a watched configuration (where it cannot be watched with inotify)
+WATCH_POLL_INTERVAL = 0.5
+
+# seconds a watched configuration must stay unchanged before it is converted again
+WATCH_SETTLE_TIME = 0.1
+
+# status of the conversion of a configuration of a fleet
+CONVERSION_SUCCEEDED = "Converted"
+
+CONVERSION_FAILED = "Failed"
 
 SUMMARY_REPORT_LINE_SEPARATOR = "\n"
 
@@ -90,10 +112,33 @@ IF_BLOCK_END = "</If>"
 
 IFMODULE_END = "</IfModule>"
 
+# actions of the variable rewrite table
+VARIABLE_RENAME = "rename"
+
+VARIABLE_REMOVE = "remove"
+
 BLOCK_START = "block_start"
 
 BLOCK_END = "block_end"
 
+FILE_NODE = "file"
+
+SYMLINK_NODE = "symlink"
+
+DIRECTORY_NODE = "directory"
+
+# how the unchanged files are staged from the source dispatcher configuration folder
+LINK_MODE_COPY = "copy"
+
+LINK_MODE_REFLINK = "reflink"
+
+LINK_MODE_HARDLINK = "hardlink"
+
+LINK_MODES = [LINK_MODE_COPY, LINK_MODE_REFLINK, LINK_MODE_HARDLINK]
+
+# the archives a dispatcher configuration can be read from, and written to
+ARCHIVE_EXTENSIONS = [".zip", ".tar.gz", ".tgz"]
+
 # whitelisted directives (in lower case for ease of comparision; directives can be case-insensitive)
 WHITELISTED_DIRECTIVES_LIST = [
     '<directory>',
@@ -0,0 +1,206 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util.atomic_file_utility import AtomicFileUtility
+from util.config_tree import config_tree
+from util.conversion_report.conversion_operation import ConversionOperation
+from util.conversion_report.conversion_step import ConversionStep
+from util.setup_logger_utility import logger
+
+from hashlib import sha256
+from json import dumps, load
+from os import listdir, lstat, makedirs, readlink, walk
+from os.path import abspath, dirname, isdir, islink, isfile, join
+
+
+class ConversionManifest:
+    """
+    The manifest of a conversion, kept next to the converted configuration, with which the next conversion of the
+    configuration only runs the rules whose inputs changed (see `RuleScheduler`).
+
+    For every lane of rules (the rules working on the same paths), the manifest records the digest of the original
+    content of every entry under the paths the rules read and write (see `ConfigTree.__get_original_digests__`), and
+    of the parsed representation of the files under the paths the rules only read through a parser (only the files
+    not parsed like an empty file, e.g. the farm files using variables), the size and modification time of the files
+    the lane left in the converted configuration, and the conversion steps performed by its rules. A lane whose
+    inputs did not change, and whose files in the converted configuration are still the ones it wrote, is not run
+    again: its files are kept and its conversion steps reused.
+    The size, modification time and hash of the input files are recorded as well, so the files whose size and
+    modification time did not change are not hashed again.
+
+    Attributes:
+    __manifest_file (str): The path of the manifest.
+    __settings (dict): The settings of the conversion (e.g. the paths of the configuration and of the SDK, and the hash
+    of the sources of the rules), a manifest recorded with other settings is not used.
+    __file_digests (dict): The size, modification time and hash of every input file, keyed by its path on disk.
+    __previous_lanes (dict): The lanes recorded by the previous conversion, keyed by the indices of their rules.
+    __lanes (dict): The lanes of this conversion, keyed by the indices of their rules.
+    """
+    __manifest_file = None
+    __settings = None
+    __file_digests = None
+    __previous_lanes = None
+    __lanes = None
+
+    def __init__(self, manifest_file, settings):
+        """
+        Parameters:
+            manifest_file (str): The path of the manifest, read if it exists
+            settings (dict): The settings of the conversion (JSON values only)
+        """
+        self.__manifest_file = manifest_file
+        # the rules are part of the settings: a manifest recorded by other rules is not used
+        self.__settings = dict(settings, rules=ConversionManifest.__get_rules_key())
+        self.__file_digests = {}
+        self.__previous_lanes = {}
+        self.__lanes = {}
+        try:
+            with open(manifest_file) as file:
+                manifest = load(file)
+            if manifest["settings"] != self.__settings:
+                logger.info("ConversionManifest: Not using %s, it was recorded with other settings.", manifest_file)
+                return
+            self.__file_digests = manifest["files"]
+            self.__previous_lanes = manifest["lanes"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if isfile(manifest_file):
+                logger.error("ConversionManifest: Ignoring unreadable manifest %s - %s.", manifest_file, e)
+
+    def __get_reused_steps__(self, rule_indices, read_paths, write_paths, parsed_read_paths=()):
+        """
+        Record the inputs of a lane of rules, and get the conversion steps the rules performed in the previous
+        conversion if the lane does not need to run again.
+
+        Parameters:
+            rule_indices (List[int]): The indices of the rules of the lane
+            read_paths (List[str]): The paths (files or folders) read by the rules
+            write_paths (List[str]): The paths (files or folders) written by the rules
+            parsed_read_paths (List[Tuple[str, Callable]]): The paths (files or folders) only read by the rules through
+                given parser, whose files are only inputs by their parsed representation
+
+        Returns:
+            dict: The conversion steps of every rule of the lane (keyed by its index), `None` if the lane is to run
+        """
+        lane_key = ",".join(str(index) for index in rule_indices)
+        parsers = {}
+        for path, parser in parsed_read_paths:
+            parsers.setdefault(parser.__module__ + "." + parser.__qualname__, (parser, []))[1].append(path)
+        # the paths read through a parser are recorded along with the name of the parser
+        paths = sorted(set(read_paths + write_paths +
+                           [path + " " + parser_name for parser_name, (parser, parser_paths) in parsers.items()
+                            for path in parser_paths]))
+        try:
+            inputs = config_tree.__get_original_digests__(sorted(set(read_paths + write_paths)), self.__file_digests)
+            for parser_name, (parser, parser_paths) in sorted(parsers.items()):
+                inputs.update((key + " " + parser_name, digest) for key, digest in config_tree.__get_original_digests__(
+                    sorted(set(parser_paths)), self.__file_digests, parser).items())
+        except OSError as e:
+            logger.error("ConversionManifest: %s - %s.", e.filename, e.strerror)
+            inputs = None
+        self.__lanes[lane_key] = {"paths": paths, "write_paths": sorted(write_paths), "inputs": inputs, "steps": {},
+                                  "outputs": None}
+        previous_lane = self.__previous_lanes.get(lane_key)
+        if inputs is None or previous_lane is None or previous_lane.get("paths") != paths \
+                or previous_lane.get("write_paths") != sorted(write_paths) or previous_lane.get("inputs") != inputs \
+                or any(str(index) not in previous_lane.get("steps", {}) for index in rule_indices):
+            return None
+        if previous_lane.get("outputs") != ConversionManifest.__get_outputs(sorted(write_paths)):
+            logger.info("ConversionManifest: Running rules %s again, their converted files changed.", lane_key)
+            return None
+        steps_of_rules = {}
+        for index in rule_indices:
+            steps_of_rules[index] = [ConversionManifest.__load_step(step)
+                                     for step in previous_lane["steps"][str(index)]]
+        return steps_of_rules
+
+    def __record__(self, steps_of_rules):
+        """
+        Record the conversion steps performed (or reused) by the rules of every lane.
+
+        Parameters:
+            steps_of_rules (dict): The conversion steps of every rule, keyed by its index
+        """
+        for lane_key, lane in self.__lanes.items():
+            lane["steps"] = dict((str(index), [ConversionManifest.__dump_step(step) for step in steps_of_rules[index]])
+                                 for index in map(int, lane_key.split(",")))
+
+    def __write__(self):
+        """
+        Write the manifest, once the converted configuration is on disk. The manifest is written next to its final
+        path first and then moved into place, so an interrupted conversion never leaves a partial manifest.
+        """
+        for lane in self.__lanes.values():
+            lane["outputs"] = ConversionManifest.__get_outputs(lane["write_paths"])
+        makedirs(dirname(abspath(self.__manifest_file)), exist_ok=True)
+        AtomicFileUtility.__write__(self.__manifest_file, dumps(
+            {"settings": self.__settings, "files": self.__file_digests, "lanes": self.__lanes}, indent=1,
+            sort_keys=True))
+        logger.info("ConversionManifest: Wrote the manifest of %d lanes to %s.", len(self.__lanes),
+                    self.__manifest_file)
+
+    @staticmethod
+    def __get_rules_key():
+        """
+        Get the key of the rules: the hash of the sources of the converter and of the modules its rules use.
+        """
+        rules_hash = sha256()
+        for package in ("converter", "util"):
+            package_path = join(dirname(dirname(abspath(__file__))), package)
+            for file_name in sorted(name for name in listdir(package_path) if name.endswith(".py")):
+                with open(join(package_path, file_name), "rb") as file:
+                    rules_hash.update((package + "/" + file_name + "\n").encode() + sha256(file.read()).digest())
+        return rules_hash.hexdigest()
+
+    @staticmethod
+    def __get_outputs(paths):
+        """
+        Get the size and modification time of every file (the target of every symlink, `/` for directories) under
+        given paths of the converted configuration.
+        """
+        outputs = {}
+        for path in paths:
+            if islink(path):
+                outputs[path] = "-> " + readlink(path)
+            elif isfile(path):
+                outputs[path] = ConversionManifest.__get_file_output(path)
+            elif isdir(path):
+                for dir_path, dir_names, file_names in walk(path):
+                    outputs[dir_path] = "/"
+                    for name in dir_names + file_names:
+                        entry_path = join(dir_path, name)
+                        if islink(entry_path):
+                            outputs[entry_path] = "-> " + readlink(entry_path)
+                        elif name in file_names:
+                            outputs[entry_path] = ConversionManifest.__get_file_output(entry_path)
+        return outputs
+
+    @staticmethod
+    def __get_file_output(path):
+        stats = lstat(path)
+        return [stats.st_size, stats.st_mtime_ns]
+
+    @staticmethod
+    def __dump_step(step):
+        return [step.__get_rule__(), step.__get_description__(),
+                [[operation.__get_operation_type__(), operation.__get_operation_location__(),
+                  operation.__get_operation_action__()] for operation in step.__get_operations__()]]
+
+    @staticmethod
+    def __load_step(step):
+        rule, description, operations = step
+        conversion_step = ConversionStep(rule, description)
+        for operation_type, operation_location, operation_action in operations:
+            conversion_step.__add_operation__(ConversionOperation(operation_type, operation_location,
+                                                                  operation_action))
+        return conversion_step
@@ -0,0 +1,87 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+
+class ConversionResult:
+    """
+    ConversionResult describes the outcome of the conversion of a single dispatcher configuration of a fleet.
+
+    Attributes:
+    __name (str): The name of the configuration.
+    __status (str): The status of the conversion (`CONVERSION_SUCCEEDED` or `CONVERSION_FAILED`).
+    __target_path (str): The folder holding the converted configuration, its summary report and its log.
+    __steps_performed (int): The number of conversion steps which performed some operation.
+    __operation_count (int): The number of operations performed.
+    __error (str): The error which made the conversion fail, `None` if it succeeded.
+
+    """
+    __name = None
+    __status = None
+    __target_path = None
+    __steps_performed = 0
+    __operation_count = 0
+    __error = None
+
+    def __init__(self, name, status, target_path, steps_performed=0, operation_count=0, error=None):
+        """
+        Parameters:
+            name (str): The name of the configuration
+            status (str): The status of the conversion
+            target_path (str): The folder holding the converted configuration, its summary report and its log
+            steps_performed (int): The number of conversion steps which performed some operation
+            operation_count (int): The number of operations performed
+            error (str): The error which made the conversion fail
+        """
+        self.__name = name
+        self.__status = status
+        self.__target_path = target_path
+        self.__steps_performed = steps_performed
+        self.__operation_count = operation_count
+        self.__error = error
+
+    def __get_name__(self):
+        """
+        Get the name of the configuration
+        """
+        return self.__name
+
+    def __get_status__(self):
+        """
+        Get the status of the conversion
+        """
+        return self.__status
+
+    def __get_target_path__(self):
+        """
+        Get the folder holding the converted configuration, its summary report and its log
+        """
+        return self.__target_path
+
+    def __get_steps_performed__(self):
+        """
+        Get the number of conversion steps which performed some operation
+        """
+        return self.__steps_performed
+
+    def __get_operation_count__(self):
+        """
+        Get the number of operations performed
+        """
+        return self.__operation_count
+
+    def __get_error__(self):
+        """
+        Get the error which made the conversion fail (`None` if it succeeded)
+        """
+        return self.__error
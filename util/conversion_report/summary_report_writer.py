@@ -12,12 +12,13 @@
 **************************************************************************/
 """
 
-from util.constants import SUMMARY_REPORT_FILE, TARGET_FOLDER, SUMMARY_REPORT_LINE_SEPARATOR as LINE_SEP
+from util.constants import CONVERSION_SUCCEEDED, SUMMARY_REPORT_FILE, SUMMARY_REPORT_FILE_NAME, \
+    SUMMARY_REPORT_LINE_SEPARATOR as LINE_SEP
 from util.conversion_report.conversion_operation import ConversionOperation
+from util.conversion_report.conversion_result import ConversionResult
 from util.conversion_report.conversion_step import ConversionStep
 
 from os import getcwd, path, linesep
-from shutil import copy
 from typing import List
 
 
@@ -26,53 +27,87 @@ class SummaryReportWriter:
     A utility class that provides functionality for creation of summary report for the dispatcher converter
     """
 
+    # the header of the table of the operations of every conversion step
+    __TABLE_HEADER = linesep + "| Action Type | Location | Action |" + LINE_SEP + "| ----------- | -------- | ------ |" \
+        + LINE_SEP
+
     @staticmethod
-    def __write_summary_report__(conversion_steps: List[ConversionStep]):
+    def __write_summary_report__(conversion_steps: List[ConversionStep], summary_report_file=SUMMARY_REPORT_FILE):
         """
         Create a summary report which contains the step followed (and operations performed) during the conversion
 
         Parameters:
             conversion_steps(List[ConversionStep]): List of steps performed that are to be added to the summary report
+            summary_report_file (str): The path of the summary report (`target/conversion-report.md` by default)
+        """
+        summary_report = SummaryReportWriter.__get_summary_report__(conversion_steps)
+        with open(summary_report_file, "w") as file:
+            file.write(summary_report)
+
+    @staticmethod
+    def __get_summary_report__(conversion_steps: List[ConversionStep]):
         """
-        # create a copy of the summary report template file in the target folder
-        copy(path.join(getcwd(), "util", "conversion_report", "conversion-report.md"), TARGET_FOLDER)
+        Get the content of the summary report (see `__write_summary_report__`), e.g. to print it in a dry run.
+
+        Parameters:
+            conversion_steps(List[ConversionStep]): List of steps performed that are to be added to the summary report
 
-        with open(SUMMARY_REPORT_FILE, "a") as file:
-            for conversion_step in conversion_steps:
-                if isinstance(conversion_step, ConversionStep):
-                    # only if some operation is actually performed under the step
-                    if conversion_step.__is_performed__():
-                        file.write(LINE_SEP)
-                        file.write("##### " + conversion_step.__get_rule__())
-                        file.write(LINE_SEP)
-                        file.write(conversion_step.__get_description__())
-                        file.write(LINE_SEP)
-                        SummaryReportWriter.__append_table_header(file)
-                        SummaryReportWriter.__append_operation(file, conversion_step.__get_operations__())
+        Returns:
+            str: The summary report
+        """
+        # the report starts with the summary report template, the report is assembled in memory and written at once
+        with open(path.join(getcwd(), "util", "conversion_report", "conversion-report.md"), newline="") as file:
+            report = [file.read()]
+        for conversion_step in conversion_steps:
+            if isinstance(conversion_step, ConversionStep):
+                # only if some operation is actually performed under the step
+                if conversion_step.__is_performed__():
+                    report.append(LINE_SEP + "##### " + conversion_step.__get_rule__() + LINE_SEP
+                                  + conversion_step.__get_description__() + LINE_SEP)
+                    report.append(SummaryReportWriter.__TABLE_HEADER)
+                    report.extend(SummaryReportWriter.__get_operation_rows(conversion_step.__get_operations__()))
+        return "".join(report)
 
     @staticmethod
-    def __append_table_header(file):
-        file.write(linesep)
-        file.write("| ")
-        file.write("Action Type")
-        file.write(" | ")
-        file.write("Location")
-        file.write(" | ")
-        file.write("Action")
-        file.write(" |")
-        file.write(LINE_SEP)
-        file.write("| ----------- | -------- | ------ |")
-        file.write(LINE_SEP)
+    def __write_fleet_summary_report__(conversion_results: List[ConversionResult], fleet_report_file):
+        """
+        Create a summary report of the conversion of a fleet of dispatcher configurations, with the outcome of the
+        conversion of every configuration and a link to its own summary report.
+
+        Parameters:
+            conversion_results (List[ConversionResult]): The outcome of the conversion of every configuration
+            fleet_report_file (str): The path of the fleet summary report
+        """
+        fleet_report_dir = path.dirname(path.abspath(fleet_report_file))
+        failed_count = len([result for result in conversion_results
+                            if result.__get_status__() != CONVERSION_SUCCEEDED])
+        fleet_report = ["# AEM as a Cloud Service - Dispatcher Fleet Conversion Report" + LINE_SEP
+                        + "Converted " + str(len(conversion_results) - failed_count) + " of "
+                        + str(len(conversion_results)) + " dispatcher configurations (" + str(failed_count)
+                        + " failed). Review the summary report of every configuration, and run the dispatcher "
+                          "validator on each of them." + LINE_SEP + linesep
+                        + "| Configuration | Status | Steps Performed | Operations | Report |" + LINE_SEP
+                        + "| ------------- | ------ | --------------- | ---------- | ------ |" + LINE_SEP]
+        for result in conversion_results:
+            if result.__get_error__() is not None:
+                report = result.__get_error__().replace("|", "\\|").replace(LINE_SEP, " ")
+            else:
+                report_file = path.relpath(path.join(result.__get_target_path__(), SUMMARY_REPORT_FILE_NAME),
+                                           fleet_report_dir).replace(path.sep, "/")
+                report = "[" + SUMMARY_REPORT_FILE_NAME + "](" + report_file + ")"
+            fleet_report.append("| " + result.__get_name__() + " | " + result.__get_status__() + " | "
+                                + str(result.__get_steps_performed__()) + " | "
+                                + str(result.__get_operation_count__()) + " | " + report + " |" + LINE_SEP)
+        with open(fleet_report_file, "w") as file:
+            file.write("".join(fleet_report))
 
     @staticmethod
-    def __append_operation(file, conversion_operations):
-        for conversion_operation in conversion_operations:
-            if isinstance(conversion_operation, ConversionOperation):
-                file.write("|")
-                file.write(" " + conversion_operation.__get_operation_type__() + " ")
-                file.write("|")
-                file.write(" " + conversion_operation.__get_operation_location__() + " ")
-                file.write("|")
-                file.write(" " + conversion_operation.__get_operation_action__() + " ")
-                file.write("|")
-                file.write(LINE_SEP)
+    def __get_operation_rows(conversion_operations):
+        """
+        Get the rows of the table of the operations of a conversion step, one string per row.
+        """
+        return ["| " + conversion_operation.__get_operation_type__() + " | "
+                + conversion_operation.__get_operation_location__() + " | "
+                + conversion_operation.__get_operation_action__() + " |" + LINE_SEP
+                for conversion_operation in conversion_operations
+                if isinstance(conversion_operation, ConversionOperation)]
@@ -0,0 +1,237 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util.setup_logger_utility import logger
+
+from typing import List
+
+
+class FarmSection:
+    """
+    FarmSection describes a `/name { ... }` section of a dispatcher `.any` file.
+    The section only records where it is located in the file; the content itself stays in the lines of the file.
+
+    Attributes:
+    __name (str): The name of the section (e.g. `/rules`), `None` for anonymous sections and the root of the file.
+    __header_line (int): The index of the line holding the name of the section.
+    __open_line (int): The index of the line holding the opening brace.
+    __open_column (int): The column of the opening brace.
+    __close_line (int): The index of the line holding the closing brace (number of lines if it is missing).
+    __close_column (int): The column of the closing brace.
+    __children (List[FarmSection]): The sections nested directly within the section.
+    """
+    __name = None
+    __header_line = None
+    __open_line = None
+    __open_column = None
+    __close_line = None
+    __close_column = None
+    __children = None
+
+    def __init__(self, name, header_line, open_line, open_column):
+        """
+        Parameters:
+            name (str): The name of the section
+            header_line (int): The index of the line holding the name of the section
+            open_line (int): The index of the line holding the opening brace
+            open_column (int): The column of the opening brace
+        """
+        self.__name = name
+        self.__header_line = header_line
+        self.__open_line = open_line
+        self.__open_column = open_column
+        self.__children = []
+
+    def __close__(self, close_line, close_column):
+        self.__close_line = close_line
+        self.__close_column = close_column
+
+    def __add_child__(self, section):
+        self.__children.append(section)
+
+    def __get_name__(self):
+        return self.__name
+
+    def __get_header_line__(self):
+        return self.__header_line
+
+    def __get_open_line__(self):
+        return self.__open_line
+
+    def __get_open_column__(self):
+        return self.__open_column
+
+    def __get_close_line__(self):
+        return self.__close_line
+
+    def __get_close_column__(self):
+        return self.__close_column
+
+    def __get_children__(self):
+        return self.__children
+
+    def __is_closed__(self):
+        return self.__close_column is not None
+
+    def __get_inner_lines__(self):
+        """
+        Get the indices of the lines strictly between the opening and the closing brace.
+        """
+        return range(self.__open_line + 1, self.__close_line)
+
+
+class FarmFile:
+    """
+    FarmFile is the parsed representation (a tree of sections) of a dispatcher `.any` file.
+
+    Attributes:
+    __lines (List[str]): The lines the file was parsed from.
+    __root (FarmSection): The section spanning the whole file.
+    __sections (List[FarmSection]): All named and anonymous sections of the file, in document order.
+    """
+    __lines = None
+    __root = None
+    __sections = None
+
+    def __init__(self, lines, root, sections):
+        self.__lines = lines
+        self.__root = root
+        self.__sections = sections
+
+    def __get_lines__(self):
+        """
+        Get the lines the file was parsed from (must not be modified).
+        """
+        return self.__lines
+
+    def __get_root__(self):
+        return self.__root
+
+    def __find_sections__(self, section_header):
+        """
+        Get the outermost sections whose name starts with the given section header (e.g. `/clientheader` matches
+        `/clientheaders`), in document order. Sections nested within a matching section are not returned separately.
+
+        Parameters:
+            section_header (str): The section header to look for
+
+        Returns:
+            List[FarmSection]
+        """
+        sections = []
+        for section in self.__sections:
+            name = section.__get_name__()
+            if name is None or not name.startswith(section_header):
+                continue
+            # sections are in document order, so a section is nested within the last match if it opens before the
+            # last match closes
+            if sections and FarmFile.__opens_before_close(section, sections[-1]):
+                continue
+            sections.append(section)
+        return sections
+
+    @staticmethod
+    def __opens_before_close(section, other):
+        if not other.__is_closed__():
+            return True
+        return (section.__get_open_line__(), section.__get_open_column__()) < \
+               (other.__get_close_line__(), other.__get_close_column__())
+
+
+class FarmFileParser:
+    """
+    A tokenizer and parser for the dispatcher `.any` syntax: `/name value` properties, `/name { ... }` sections,
+    `$include "file"` statements, quoted strings and `#` comments.
+    """
+
+    # token types
+    __NAME = "name"
+    __VALUE = "value"
+    __OPEN = "{"
+    __CLOSE = "}"
+
+    @staticmethod
+    def __parse__(lines: List[str]):
+        """
+        Parse the lines of a dispatcher `.any` file into a tree of sections.
+        Unbalanced braces are tolerated: a missing closing brace ends the section at the end of the file, and a
+        superfluous one is ignored.
+
+        Parameters:
+            lines (List[str]): The lines of the file
+
+        Returns:
+            FarmFile
+        """
+        root = FarmSection(None, -1, -1, 0)
+        sections = []
+        stack = [root]
+        pending_name = None
+        for token_type, value, line_index, column in FarmFileParser.__tokenize(lines):
+            if token_type == FarmFileParser.__OPEN:
+                header_line = pending_name[1] if pending_name is not None else line_index
+                section = FarmSection(pending_name[0] if pending_name is not None else None, header_line,
+                                      line_index, column)
+                stack[-1].__add_child__(section)
+                sections.append(section)
+                stack.append(section)
+                pending_name = None
+            elif token_type == FarmFileParser.__CLOSE:
+                if len(stack) > 1:
+                    stack.pop().__close__(line_index, column)
+                else:
+                    logger.warning("FarmFileParser: Ignoring unbalanced '}' on line %d.", line_index + 1)
+                pending_name = None
+            elif token_type == FarmFileParser.__NAME:
+                pending_name = (value, line_index)
+            else:
+                pending_name = None
+        while len(stack) > 1:
+            section = stack.pop()
+            logger.warning("FarmFileParser: Section '%s' opened on line %d is not closed.", section.__get_name__(),
+                           section.__get_open_line__() + 1)
+            section.__close__(len(lines), None)
+        root.__close__(len(lines), None)
+        return FarmFile(lines, root, sections)
+
+    @staticmethod
+    def __tokenize(lines):
+        """
+        Split the lines into (token type, value, line index, column) tuples, skipping whitespace and comments.
+        """
+        for line_index, line in enumerate(lines):
+            column = 0
+            length = len(line)
+            while column < length:
+                char = line[column]
+                if char.isspace():
+                    column += 1
+                elif char == "#":
+                    break
+                elif char == "{" or char == "}":
+                    yield char, char, line_index, column
+                    column += 1
+                elif char == '"' or char == "'":
+                    end = column + 1
+                    while end < length and line[end] != char:
+                        end += 2 if line[end] == "\\" else 1
+                    yield FarmFileParser.__VALUE, line[column:end + 1], line_index, column
+                    column = end + 1
+                else:
+                    end = column
+                    while end < length and not line[end].isspace() and line[end] not in "{}\"'#":
+                        end += 1
+                    token_type = FarmFileParser.__NAME if char == "/" else FarmFileParser.__VALUE
+                    yield token_type, line[column:end], line_index, column
+                    column = end
@@ -13,16 +13,21 @@
 """
 
 from util import constants
+from util.config_tree import config_tree
+from util.farm_file_parser import FarmFileParser
+from util.file_transformer import FileTransformer
+from util.include_index import IncludeIndex, include_index
+from util.vhost_file_parser import VhostFileParser
 from util.setup_logger_utility import logger
+from util.symlink_resolver import symlink_resolver
+from util.variable_index import VariableIndex
 from util.conversion_report.conversion_operation import ConversionOperation
 from util.conversion_report.conversion_step import ConversionStep
 
-from collections import deque
-from glob import glob
+from functools import partial
 from ntpath import basename
-from os import listdir, remove, rename
-from os.path import exists, isfile, isdir, join, dirname
-from re import search
+from os.path import join, dirname
+from re import compile, escape, search
 from typing import List
 
 
@@ -43,9 +48,9 @@ class FileOperationsUtility:
         """
 
         # if path exists
-        if exists(file_path) and isfile(file_path):
+        if config_tree.__isfile__(file_path):
             try:
-                remove(file_path)
+                config_tree.__remove__(file_path)
                 logger.info("FileOperationsUtility: Deleted file %s", file_path)
                 conversion_operation = ConversionOperation(constants.ACTION_DELETED, dirname(file_path),
                                                            "Deleted file " + file_path)
@@ -65,9 +70,9 @@ class FileOperationsUtility:
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
         """
 
-        if exists(dir_path) and isdir(dir_path):
+        if config_tree.__isdir__(dir_path):
             # get all files with the specified extension under the provided path
-            files = [f for f in glob(join(dir_path, "*." + extension), recursive=False)]
+            files = config_tree.__glob__(join(dir_path, "*." + extension))
             for f in files:
                 logger.info("FileOperationsUtility: Deleted file %s", f)
                 conversion_operation = ConversionOperation(constants.ACTION_DELETED, dirname(f), "Deleted file " + f)
@@ -86,9 +91,9 @@ class FileOperationsUtility:
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
         """
 
-        if exists(dir_path) and isdir(dir_path):
+        if config_tree.__isdir__(dir_path):
             # get all files with the specified substring in their names under the provided path
-            files = [f for f in glob(join(dir_path, "*" + substring + "*.*"), recursive=False)]
+            files = config_tree.__glob__(join(dir_path, "*" + substring + "*.*"))
             for f in files:
                 logger.info("FileOperationsUtility: Deleted file %s", f)
                 conversion_operation = ConversionOperation(constants.ACTION_DELETED, dirname(f), "Deleted file " + f)
@@ -107,9 +112,9 @@ class FileOperationsUtility:
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
         """
 
-        if exists(dir_path) and isdir(dir_path):
+        if config_tree.__isdir__(dir_path):
             # get all files with the specified prefix under the provided path
-            files = [f for f in glob(join(dir_path, prefix + "*.*"), recursive=False)]
+            files = config_tree.__glob__(join(dir_path, prefix + "*.*"))
             for f in files:
                 logger.info("FileOperationsUtility: Deleted file %s", f)
                 conversion_operation = ConversionOperation(constants.ACTION_DELETED, dirname(f), "Deleted file " + f)
@@ -131,12 +136,12 @@ class FileOperationsUtility:
              a list containing the names of the files in the directory.
 
         """
-        files = [f for f in glob(join(dir_path, "**", pattern), recursive=True)]
+        files = config_tree.__glob__(join(dir_path, "**", pattern))
         # delete any other file present in the folder that doesn't match the pattern '*.vars'
-        for f in [f for f in glob(join(dir_path, "*.*"), recursive=True)]:
+        for f in config_tree.__glob__(join(dir_path, "*.*")):
             if f not in files:
                 FileOperationsUtility.__delete_file__(f, conversion_step)
-        return [f for f in glob(join(dir_path, "**", pattern), recursive=True)]
+        return config_tree.__glob__(join(dir_path, "**", pattern))
 
     @staticmethod
     def __rename_file__(src_path, dest_path, conversion_step):
@@ -150,9 +155,9 @@ class FileOperationsUtility:
         """
 
         # if path exists
-        if exists(src_path) and isfile(src_path):
+        if config_tree.__isfile__(src_path):
             try:
-                rename(src_path, dest_path)
+                config_tree.__rename__(src_path, dest_path)
                 logger.info("FileOperationsUtility: Renamed file %s to %s", src_path, dest_path)
                 conversion_operation = ConversionOperation(constants.ACTION_RENAMED, dirname(src_path), "Renamed file "
                                                            + basename(src_path) + " to " + basename(dest_path))
@@ -174,137 +179,161 @@ class FileOperationsUtility:
             str: Content of the file
         """
 
+        # if file is actually a symlink file, get the target file to extract the content from
+        if recursive:
+            target_file_path = symlink_resolver.__resolve__(file_path)
+            if target_file_path is None:
+                return ["# Content from file : '" + file_path[file_path.index("src"):] + "'\n"]
+            file_path = target_file_path
         # add the file name as comment in 1st line, to denote the source of the content
         rules = ["# Content from file : '" + file_path[file_path.index("src"):] + "'\n"]
-        if exists(file_path) and isfile(file_path):
-            try:
-                # open the file and read the file
-                with open(file_path) as file:
-                    file_content = file.readlines()
-                file.close()
-                # all lines (except blank newlines) in the file are added to content
-                for line in file_content:
-                    if line != "\n":
-                        rules.append(line)
+        try:
+            # all lines (except blank newlines) in the file are added to content
+            file_content = symlink_resolver.__get_content__(file_path)
+            if file_content is not None:
+                rules.extend(file_content)
                 logger.debug("FileOperationsUtility: Extracted content from file %s", file_path)
-            except OSError as e:
-                logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
-        # if file is actually a symlink file
-        # get the target link and extract the content from the target file if specified
-        if recursive and len(rules) == 2 and rules[1].startswith("../"):
-            target_file_path = join(dirname(file_path), rules[1])
-            rules = FileOperationsUtility.__get_content_from_file__(target_file_path, recursive)
+        except OSError as e:
+            logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
         return rules
 
     @staticmethod
-    def __remove_virtual_host_sections_not_port_80__(dir_path, conversion_step):
+    def __remove_virtual_host_sections_not_port_80__(dir_path, conversion_step, file_transformer=None):
         """
         Remove any VirtualHost section not referring to port 80 from all vhost files under specified directory.
 
         Parameters:
             dir_path (str): The path to dir where the vhost files reside
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
+            file_transformer (FileTransformer): The transformer to register the removal with, to fuse it with the
+                other transforms of the vhost files (if not given, the removal is applied right away)
         """
 
-        if exists(dir_path) and isdir(dir_path):
-            files = [f for f in glob(join(dir_path, "*.vhost"), recursive=False)]
-            for vhost_file in files:
-                if isfile(vhost_file):
-                    try:
-                        # flag denoting whether the
-                        virtual_host_section_not_port_80_flag = False
-                        # open the file in read-mode and read the file
-                        with open(vhost_file, "r") as file:
-                            file_content = file.readlines()
-                        file.close()
-                        # open the file in write-mode and write to the file,
-                        # removing the VirtualHost sections not referring to port 80
-                        with open(vhost_file, "w") as file:
-                            for line in file_content:
-                                # if it is start of a virtual host section which does not refer to port 80
-                                # mark the start of the virtual host section, i.e. lines to be removed
-                                if line.startswith(constants.VIRTUAL_HOST_SECTION_START) and not \
-                                        line.strip("\n").endswith(constants.VIRTUAL_HOST_SECTION_START_PORT_80):
-                                    virtual_host_section_not_port_80_flag = True
-                                    logger.debug(
-                                        "FileOperationsUtility: Found virtual host section (not port 80) found in %s",
-                                        vhost_file)
-                                    continue
-                                # if it end of is a virtual host section which does not refer to port 80
-                                # mark the end of the virtual host section, i.e. lines to persist
-                                if line.strip() == constants.VIRTUAL_HOST_SECTION_END and \
-                                        virtual_host_section_not_port_80_flag:
-                                    virtual_host_section_not_port_80_flag = False
-                                    logger.info(
-                                        "FileOperationsUtility: Removed virtual host section (not port 80) found in %s",
-                                        vhost_file)
-                                    conversion_operation = ConversionOperation(constants.ACTION_REMOVED,
-                                                                               vhost_file, "Removed virtual host"
-                                                                                           " section (not port 80)")
-                                    conversion_step.__add_operation__(conversion_operation)
-                                    continue
-                                # if current line belongs to a virtual host section which refers to port 80, keep it
-                                if not virtual_host_section_not_port_80_flag:
-                                    file.write(line)
-                    except OSError as e:
-                        logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
+        if config_tree.__isdir__(dir_path):
+            transformer = file_transformer if file_transformer is not None else FileTransformer()
+            transformer.__add_transform__(FileOperationsUtility.__remove_virtual_host_sections_not_port_80_in_file__,
+                                          [join(dir_path, "*.vhost")], conversion_step)
+            if file_transformer is None:
+                transformer.__apply__()
 
     @staticmethod
-    def __remove_or_replace_file_include(conversion_step, file_path, include_statement_syntax, old_rule_name,
-                                         new_rule_name=None, replace_rule=None):
+    def __remove_virtual_host_sections_not_port_80_in_file__(vhost_file, file_content, line_edits, conversion_step):
+        """
+        Remove any VirtualHost section not referring to port 80 from the vhost file (transform of a FileTransformer).
+        """
+
+        vhost_file_tree = FileTransformer.__get_parsed__(vhost_file, file_content, VhostFileParser.__parse__)
+        # collect the edits removing the VirtualHost sections not referring to port 80
+        for section in vhost_file_tree.__find_sections__(constants.VIRTUAL_HOST_SECTION_START):
+            if section.__get_text__().endswith(constants.VIRTUAL_HOST_SECTION_START_PORT_80) \
+                    or FileTransformer.__get_current_lines__(file_content, line_edits,
+                                                             section.__get_start_line__()) == []:
+                continue
+            logger.debug(
+                "FileOperationsUtility: Found virtual host section (not port 80) found in %s",
+                vhost_file)
+            for index in range(section.__get_start_line__(), section.__get_last_line__() + 1):
+                line_edits[index] = []
+            logger.info(
+                "FileOperationsUtility: Removed virtual host section (not port 80) found in %s",
+                vhost_file)
+            conversion_operation = ConversionOperation(constants.ACTION_REMOVED,
+                                                       vhost_file, "Removed virtual host"
+                                                                   " section (not port 80)")
+            conversion_step.__add_operation__(conversion_operation)
+
+    @staticmethod
+    def __remove_or_replace_file_include(file_path, include_statement_syntax, file_replacements, replace_rule=None):
         """
-        Remove or replace inclusion of some file. If replacement file is not specified, the include statement is removed.
+        Remove or replace inclusion of some files, in a single pass over the file. The replacement of every file name
+        is given in `file_replacements`; if it is `None`, the include statement is removed.
+        Returns the operations performed, along with the file name of their include statement.
         """
 
-        if exists(file_path) and isfile(file_path):
+        operations = []
+        if config_tree.__isfile__(file_path):
             try:
-                # open the file in read mode and read it
-                with open(file_path) as file:
-                    file_content = file.readlines()
-                file.close()
-                # open the file in write-mode and write to the file,
-                # replacing/removing the include statements as applicable
-                with open(file_path, "w") as file:
-                    for line in file_content:
-                        stripped_line = line.strip()
-                        if stripped_line.startswith(include_statement_syntax) and stripped_line.find(old_rule_name) > 1:
-                            logger.debug("FileOperationsUtility: Found include statement '%s' in file %s.",
-                                         stripped_line, file_path)
-                            # in the include statements, replace the old rule file with the new one
-                            if new_rule_name is not None:
-                                if replace_rule is not None:
-                                    line = line[:len(line) - len(
-                                        stripped_line) - 1] + include_statement_syntax + " " + new_rule_name + '\n'
-                                    file.write(line)
-                                    logger.info(
-                                        "FileOperationsUtility: Replacing include statement '%s' with '%s' in %s",
-                                        stripped_line, line.strip(), file_path)
-                                    conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
-                                                                               "Replacing include statement rule "
-                                                                               + stripped_line + " with " + line.strip())
-                                else:
-                                    line = line.replace(old_rule_name, new_rule_name)
-                                    file.write(line)
-                                    logger.info(
-                                        "FileOperationsUtility: Replacing include statement '%s' with '%s' in %s",
-                                        stripped_line, line.strip(), file_path)
-                                    conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
-                                                                               "Replacing include statement "
-                                                                               + old_rule_name + " with " + new_rule_name)
-                                conversion_step.__add_operation__(conversion_operation)
-                            # removing the include statements
-                            else:
-                                logger.info("FileOperationsUtility: Removing include statement '%s' from %s",
-                                            stripped_line, file_path)
-                                conversion_operation = ConversionOperation(constants.ACTION_REMOVED, file_path,
-                                                                           "Removing include statement "
-                                                                           + old_rule_name)
-                                conversion_step.__add_operation__(conversion_operation)
-                                continue
+                # look up the include statements of the file, along with the file they include
+                included_file_names = sorted(file_replacements)
+                include_statements = []
+                for index, stripped_line in config_tree.__get_parsed__(file_path,
+                                                                       IncludeIndex.__find_include_statements__):
+                    old_rule_name = IncludeIndex.__matches_any__(stripped_line, include_statement_syntax,
+                                                                 included_file_names)
+                    if old_rule_name is not None:
+                        include_statements.append((index, stripped_line, old_rule_name))
+                if not include_statements:
+                    return operations
+                # read the file
+                new_file_content = config_tree.__read_lines__(file_path)
+                # replace/remove the include statements as applicable
+                for index, stripped_line, old_rule_name in include_statements:
+                    new_rule_name = file_replacements[old_rule_name]
+                    line = new_file_content[index]
+                    logger.debug("FileOperationsUtility: Found include statement '%s' in file %s.",
+                                 stripped_line, file_path)
+                    # in the include statements, replace the old rule file with the new one
+                    if new_rule_name is not None:
+                        if replace_rule is not None:
+                            line = line[:len(line) - len(
+                                stripped_line) - 1] + include_statement_syntax + " " + new_rule_name + '\n'
+                            logger.info(
+                                "FileOperationsUtility: Replacing include statement '%s' with '%s' in %s",
+                                stripped_line, line.strip(), file_path)
+                            conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
+                                                                       "Replacing include statement rule "
+                                                                       + stripped_line + " with " + line.strip())
                         else:
-                            file.write(line)
+                            line = line.replace(old_rule_name, new_rule_name)
+                            logger.info(
+                                "FileOperationsUtility: Replacing include statement '%s' with '%s' in %s",
+                                stripped_line, line.strip(), file_path)
+                            conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
+                                                                       "Replacing include statement "
+                                                                       + old_rule_name + " with " + new_rule_name)
+                        new_file_content[index] = line
+                        operations.append((old_rule_name, conversion_operation))
+                    # removing the include statements
+                    else:
+                        logger.info("FileOperationsUtility: Removing include statement '%s' from %s",
+                                    stripped_line, file_path)
+                        conversion_operation = ConversionOperation(constants.ACTION_REMOVED, file_path,
+                                                                   "Removing include statement "
+                                                                   + old_rule_name)
+                        operations.append((old_rule_name, conversion_operation))
+                        new_file_content[index] = None
+                config_tree.__write_lines__(file_path, [line for line in new_file_content if line is not None])
             except OSError as e:
                 logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
+        return operations
+
+    @staticmethod
+    def __remove_or_replace_file_includes(dir_path, file_extension, include_statement_syntax, file_replacements,
+                                          conversion_step, replace_rule=None, followed_by=None):
+        """
+        Remove or replace inclusion of some files in all files of given file-extension in specified directory and
+        sub-directories, rewriting each file including any of them once.
+        The operations are reported file name by file name (in the order of `file_replacements`), and for every file
+        name file by file, as if the file names had been processed one after the other; `followed_by` is called with
+        every file name once its operations are reported.
+        """
+
+        operations_of_names = dict((file_name, []) for file_name in file_replacements)
+        if config_tree.__isdir__(dir_path) and file_replacements:
+            # get the files under given directory and sub-directories with given file extension,
+            # which include any of the files
+            files = include_index.__get_files_including_any__(dir_path, file_extension, include_statement_syntax,
+                                                              sorted(file_replacements))
+            # lookup for include statements of the specified rules, and remove/replace them
+            for file in files:
+                for file_name, operation in FileOperationsUtility.__remove_or_replace_file_include(
+                        file, include_statement_syntax, file_replacements, replace_rule):
+                    operations_of_names[file_name].append(operation)
+        for file_name, operations in operations_of_names.items():
+            for operation in operations:
+                conversion_step.__add_operation__(operation)
+            if followed_by is not None:
+                followed_by(file_name)
 
     @staticmethod
     def __remove_include_statement_for_some_rule__(dir_path, include_statement_syntax,
@@ -321,13 +350,33 @@ class FileOperationsUtility:
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
         """
 
-        if exists(dir_path) and isdir(dir_path):
-            # get all files under given directory and sub-directories with given file extension
-            files = [f for f in glob(join(dir_path, "**", "*." + file_extension), recursive=True)]
-            #  lookup for include statements of the specified rule and remove them
-            for file in files:
-                FileOperationsUtility.__remove_or_replace_file_include(conversion_step, file, include_statement_syntax,
-                                                                       rule_file_name_to_remove)
+        FileOperationsUtility.__remove_include_statements_for_rules__(dir_path, include_statement_syntax,
+                                                                      file_extension, [rule_file_name_to_remove],
+                                                                      conversion_step)
+
+    @staticmethod
+    def __remove_include_statements_for_rules__(dir_path, include_statement_syntax, file_extension,
+                                                rule_file_names_to_remove, conversion_step, followed_by=None):
+        """
+        Remove inclusion of a set of files from all files of given file-extension in specified directory and
+        sub-directories, in a single pass over each file.
+        Usage scenario : Remove the include statements of all files of `conf.d/whitelists` from the vhost files.
+
+        Parameters:
+            dir_path (str): The path to directory whose files are to be processed
+            include_statement_syntax (str): The syntax of the include statement to be looked for
+            file_extension (str): The extension of the type that needs to be processed
+            rule_file_names_to_remove (Iterable[str]): The rule file names (in include statement) that are to be removed
+            conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
+            followed_by (Callable[[str], None]): Called with every rule file name once the removal of its include
+                statements is reported (e.g. to delete the rule file), the actions are reported rule file name by rule
+                file name
+        """
+
+        FileOperationsUtility.__remove_or_replace_file_includes(dir_path, file_extension, include_statement_syntax,
+                                                                dict((rule_file_name, None) for rule_file_name
+                                                                     in rule_file_names_to_remove),
+                                                                conversion_step, followed_by=followed_by)
 
     @staticmethod
     def __replace_file_name_in_include_statement__(dir_path, file_extension, include_statement_syntax,
@@ -349,14 +398,35 @@ class FileOperationsUtility:
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
         """
 
-        if exists(dir_path) and isdir(dir_path):
-            # get all files under given directory and sub-directories with given file extension
-            files = [f for f in glob(join(dir_path, "**", "*." + file_extension), recursive=True)]
-            # lookup for include statements of the specified rule, and replace them with new rule
-            for file in files:
-                FileOperationsUtility.__remove_or_replace_file_include(conversion_step, file, include_statement_syntax,
-                                                                       file_to_replace,
-                                                                       file_to_replace_with)
+        FileOperationsUtility.__replace_file_names_in_include_statements__(dir_path, file_extension,
+                                                                           include_statement_syntax,
+                                                                           {file_to_replace: file_to_replace_with},
+                                                                           conversion_step)
+
+    @staticmethod
+    def __replace_file_names_in_include_statements__(dir_path, file_extension, include_statement_syntax,
+                                                     files_to_replace, conversion_step, followed_by=None):
+        """
+        Replace several file names (with their new file name) in all include statements from all files of given
+        file-extension in specified directory and sub-directories, in a single pass over each file.
+        Usage scenario : In all include statements including any of the consolidated `.vars` files, replace it with
+        inclusion of the file `custom.vars`.
+
+        Parameters:
+            dir_path (str): The path to directory whose files are to be processed
+            file_extension (str): The extension of the type that needs to be processed
+            include_statement_syntax (str): The syntax of the include statement to be looked for
+            files_to_replace (dict): The new rule file name for every rule file name (in include statement) that is to
+                be replaced
+            conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
+            followed_by (Callable[[str], None]): Called with every rule file name once the replacement of its include
+                statements is reported (e.g. to delete the rule file), the actions are reported rule file name by rule
+                file name
+        """
+
+        FileOperationsUtility.__remove_or_replace_file_includes(dir_path, file_extension, include_statement_syntax,
+                                                                files_to_replace, conversion_step,
+                                                                followed_by=followed_by)
 
     @staticmethod
     def __replace_rule_in_include_statement__(dir_path, file_extension, include_statement_syntax,
@@ -377,14 +447,33 @@ class FileOperationsUtility:
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
         """
 
-        if exists(dir_path) and isdir(dir_path):
-            # get all files under given directory and sub-directories with given file extension
-            files = [f for f in glob(join(dir_path, "**", "*." + file_extension), recursive=True)]
-            # lookup for include statements of the specified rule, and replace them with new rule
-            for file in files:
-                FileOperationsUtility.__remove_or_replace_file_include(conversion_step, file, include_statement_syntax,
-                                                                       file_to_replace,
-                                                                       rule_to_replace_with, True)
+        FileOperationsUtility.__replace_rules_in_include_statements__(dir_path, file_extension,
+                                                                      include_statement_syntax,
+                                                                      {file_to_replace: rule_to_replace_with},
+                                                                      conversion_step)
+
+    @staticmethod
+    def __replace_rules_in_include_statements__(dir_path, file_extension, include_statement_syntax, rules_to_replace,
+                                                conversion_step, followed_by=None):
+        """
+        Replace the inclusion rules of several files (with their new rule) from all files of given file-extension in
+        specified directory and sub-directories, in a single pass over each file.
+        Usage scenario : In all include statements including any of the `ams_*.any` cache files, replace it with the
+        rule `"../cache/default_rules.any"`
+
+        Parameters:
+            dir_path (str): The path to directory whose files are to be processed
+            file_extension (str): The extension of the type that needs to be processed
+            include_statement_syntax (str): The syntax of the include statement to be looked for
+            rules_to_replace (dict): The complete new rule (in include statement) for every file name (in the rule) that
+                is to be replaced
+            conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
+            followed_by (Callable[[str], None]): Called with every file name once the replacement of its include
+                statements is reported (e.g. to delete the file), the actions are reported file name by file name
+        """
+
+        FileOperationsUtility.__remove_or_replace_file_includes(dir_path, file_extension, include_statement_syntax,
+                                                                rules_to_replace, conversion_step, True, followed_by)
 
     @staticmethod
     def __remove_or_replace_include_pattern_in_section(file_path, section_header, include_pattern_to_replace,
@@ -393,65 +482,54 @@ class FileOperationsUtility:
         Remove-replace include statements of certain pattern within specified sections of a file.
         """
 
-        if exists(file_path) and isfile(file_path):
-            start_of_section = False
+        if config_tree.__isfile__(file_path):
             already_replaced = False
-            section_indentation = 0
             try:
-                # open the file in read mode and read it
-                with open(file_path) as file:
-                    file_content = file.readlines()
-                file.close()
-                # open the file in write-mode and write to the file,
-                with open(file_path, "w") as file:
-                    for line in file_content:
+                # files not holding the pattern at all are not parsed
+                if not config_tree.__contains_any__(file_path, [include_pattern_to_replace]):
+                    return
+                farm_file = config_tree.__get_parsed__(file_path, FarmFileParser.__parse__)
+                file_content = farm_file.__get_lines__()
+                # collect the edits to the lines within the given sections
+                line_edits = {}
+                for section in farm_file.__find_sections__(section_header):
+                    for index in section.__get_inner_lines__():
+                        line = file_content[index]
                         stripped_line = line.strip()
-                        # remove any contents in the given section
-                        # and replace with given include statements as applicable
-                        if stripped_line.startswith(section_header):
-                            section_indentation = len(line) - len(stripped_line)
-                            start_of_section = True
-                            file.write(line)
-                        # if section is found, replace the include statements within of the section
-                        elif start_of_section:
-                            if stripped_line.startswith(include_pattern_to_replace):
-                                # say we want to replace any clientheader include statements that looks as follows:
-                                # $include "/etc/httpd/conf.dispatcher.d/clientheaders/ams_publish_clientheaders.any"
-                                # $include "/etc/httpd/conf.dispatcher.d/clientheaders/ams_common_clientheaders.any"
-                                # with the statement:
-                                # $include "../clientheaders/default_clientheaders.any"
-                                # we only need to replace the include statement once.
-                                if already_replaced:
-                                    logger.info(
-                                        "FileOperationsUtility: Removed include statement '%s' in %s section of file "
-                                        "%s.", stripped_line, section_header, file_path)
-                                    conversion_operation = ConversionOperation(constants.ACTION_REMOVED, file_path,
-                                                                               "Removed include statement '" + stripped_line
-                                                                               + "' in section '" + section_header + "'")
-                                    conversion_step.__add_operation__(conversion_operation)
-                                    continue
-                                else:
-                                    already_replaced = True
-                                    file.write(line[:len(line) - len(stripped_line) - 1] +
-                                               include_pattern_to_replace_with + '\n')
-                                    logger.info(
-                                        "FileOperationsUtility: Replaced include statement '%s' of %s section with "
-                                        "include statement '%s' in file %s.",
-                                        stripped_line, section_header, include_pattern_to_replace_with, file_path)
-                                    conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
-                                                                               "Replaced include statement '" + stripped_line
-                                                                               + "' in section '" + section_header
-                                                                               + "' with '"
-                                                                               + include_pattern_to_replace_with + "'")
-                                    conversion_step.__add_operation__(conversion_operation)
-                            elif stripped_line == "}" and len(line) - len(stripped_line) == section_indentation:
-                                start_of_section = False
-                                file.write(line)
-                            else:
-                                file.write(line)
-                        # write out other lines as is
+                        if not stripped_line.startswith(include_pattern_to_replace):
+                            continue
+                        # say we want to replace any clientheader include statements that looks as follows:
+                        # $include "/etc/httpd/conf.dispatcher.d/clientheaders/ams_publish_clientheaders.any"
+                        # $include "/etc/httpd/conf.dispatcher.d/clientheaders/ams_common_clientheaders.any"
+                        # with the statement:
+                        # $include "../clientheaders/default_clientheaders.any"
+                        # we only need to replace the include statement once.
+                        if already_replaced:
+                            line_edits[index] = []
+                            logger.info(
+                                "FileOperationsUtility: Removed include statement '%s' in %s section of file "
+                                "%s.", stripped_line, section_header, file_path)
+                            conversion_operation = ConversionOperation(constants.ACTION_REMOVED, file_path,
+                                                                       "Removed include statement '" + stripped_line
+                                                                       + "' in section '" + section_header + "'")
+                            conversion_step.__add_operation__(conversion_operation)
                         else:
-                            file.write(line)
+                            already_replaced = True
+                            line_edits[index] = [FileOperationsUtility.__indentation(line) +
+                                                 include_pattern_to_replace_with + '\n']
+                            logger.info(
+                                "FileOperationsUtility: Replaced include statement '%s' of %s section with "
+                                "include statement '%s' in file %s.",
+                                stripped_line, section_header, include_pattern_to_replace_with, file_path)
+                            conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
+                                                                       "Replaced include statement '" + stripped_line
+                                                                       + "' in section '" + section_header
+                                                                       + "' with '"
+                                                                       + include_pattern_to_replace_with + "'")
+                            conversion_step.__add_operation__(conversion_operation)
+                if line_edits:
+                    config_tree.__write_lines__(file_path,
+                                                FileTransformer.__apply_line_edits__(file_content, line_edits))
             except OSError as e:
                 logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
 
@@ -471,9 +549,9 @@ class FileOperationsUtility:
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
         """
 
-        if exists(dir_path) and isdir(dir_path):
+        if config_tree.__isdir__(dir_path):
             # get all files under given directory and sub-directories with given file extension
-            files = [f for f in glob(join(dir_path, "**", "*." + file_extension), recursive=True)]
+            files = config_tree.__glob__(join(dir_path, "**", "*." + file_extension))
             # lookup for include statements of the specified rule, and replace them with new rule
             for file in files:
                 FileOperationsUtility.__remove_or_replace_include_pattern_in_section(file, section_header,
@@ -488,71 +566,59 @@ class FileOperationsUtility:
         Replace include statements of specified rule files within specified sections in a farm file.
         """
 
-        if exists(file_path) and isfile(file_path):
-            start_of_section = False
+        if config_tree.__isfile__(file_path):
             already_replaced = False
-            section_indentation = 0
             try:
-                # open the file in read mode and read it
-                with open(file_path) as file:
-                    file_content = file.readlines()
-                file.close()
-                # open the file in write-mode and write to the file,
-                with open(file_path, "w") as file:
-                    for line in file_content:
+                # files not naming any of the rule files are not parsed
+                if not config_tree.__contains_any__(file_path, rule_files_to_replace):
+                    return
+                farm_file = config_tree.__get_parsed__(file_path, FarmFileParser.__parse__)
+                file_content = farm_file.__get_lines__()
+                # collect the edits to the lines within the given sections
+                line_edits = {}
+                for section in farm_file.__find_sections__(section_header):
+                    for index in section.__get_inner_lines__():
+                        line = file_content[index]
                         stripped_line = line.strip()
-                        # remove any contents in the given section
-                        # and replace with given include statements as applicable
-                        if stripped_line.startswith(section_header):
-                            section_indentation = len(line) - len(stripped_line)
-                            start_of_section = True
-                            file.write(line)
-                        # if section is found, replace the include statements within of the section
-                        elif start_of_section:
-                            if stripped_line.startswith(constants.INCLUDE_SYNTAX_IN_FARM):
-                                included_file_name = stripped_line.split()[1]
-                                # remove the quotes to get the actual included file path
-                                included_file_name = basename(included_file_name[:len(included_file_name)-1])
-                                if included_file_name in rule_files_to_replace:
-                                    # say we want to replace any clientheader include statements that looks as follows:
-                                    # $include "/etc/httpd/conf.dispatcher.d/clientheaders/xyz_publish_clientheaders.any"
-                                    # $include "/etc/httpd/conf.dispatcher.d/clientheaders/xyz_common_clientheaders.any"
-                                    # with the statement:
-                                    # $include "../clientheaders/clientheaders.any"
-                                    # we only need to replace the include statement once.
-                                    if already_replaced:
-                                        logger.info(
-                                            "FileOperationsUtility: Removed include statement '%s' in %s section of file "
-                                            "%s.", stripped_line, section_header, file_path)
-                                        conversion_operation = ConversionOperation(constants.ACTION_REMOVED, file_path,
-                                                                                   "Removed include statement '" + stripped_line
-                                                                                   + "' in section '" + section_header + "'")
-                                        conversion_step.__add_operation__(conversion_operation)
-                                        continue
-                                    else:
-                                        already_replaced = True
-                                        file.write(line[:len(line) - len(stripped_line) - 1] +
-                                                   include_pattern_to_replace_with + '\n')
-                                        logger.info(
-                                            "FileOperationsUtility: Replaced include statement '%s' of %s section with "
-                                            "include statement '%s' in file %s.",
-                                            stripped_line, section_header, include_pattern_to_replace_with, file_path)
-                                        conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
-                                                                                   "Replaced include statement '" + stripped_line
-                                                                                   + "' in section '" + section_header
-                                                                                   + "' with '"
-                                                                                   + include_pattern_to_replace_with + "'")
-                                        conversion_step.__add_operation__(conversion_operation)
-                                else:
-                                    file.write(line)
-                            elif stripped_line == "}" and len(line) - len(stripped_line) == section_indentation:
-                                start_of_section = False
-                                file.write(line)
-                            else:
-                                file.write(line)
-                        # write out other lines as is
+                        if not stripped_line.startswith(constants.INCLUDE_SYNTAX_IN_FARM):
+                            continue
+                        included_file_name = stripped_line.split()[1]
+                        # remove the quotes to get the actual included file path
+                        included_file_name = basename(included_file_name[:len(included_file_name)-1])
+                        if included_file_name not in rule_files_to_replace:
+                            continue
+                        # say we want to replace any clientheader include statements that looks as follows:
+                        # $include "/etc/httpd/conf.dispatcher.d/clientheaders/xyz_publish_clientheaders.any"
+                        # $include "/etc/httpd/conf.dispatcher.d/clientheaders/xyz_common_clientheaders.any"
+                        # with the statement:
+                        # $include "../clientheaders/clientheaders.any"
+                        # we only need to replace the include statement once.
+                        if already_replaced:
+                            line_edits[index] = []
+                            logger.info(
+                                "FileOperationsUtility: Removed include statement '%s' in %s section of file "
+                                "%s.", stripped_line, section_header, file_path)
+                            conversion_operation = ConversionOperation(constants.ACTION_REMOVED, file_path,
+                                                                       "Removed include statement '" + stripped_line
+                                                                       + "' in section '" + section_header + "'")
+                            conversion_step.__add_operation__(conversion_operation)
                         else:
-                            file.write(line)
+                            already_replaced = True
+                            line_edits[index] = [FileOperationsUtility.__indentation(line) +
+                                                 include_pattern_to_replace_with + '\n']
+                            logger.info(
+                                "FileOperationsUtility: Replaced include statement '%s' of %s section with "
+                                "include statement '%s' in file %s.",
+                                stripped_line, section_header, include_pattern_to_replace_with, file_path)
+                            conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
+                                                                       "Replaced include statement '" + stripped_line
+                                                                       + "' in section '" + section_header
+                                                                       + "' with '"
+                                                                       + include_pattern_to_replace_with + "'")
+                            conversion_step.__add_operation__(conversion_operation)
+                if line_edits:
+                    config_tree.__write_lines__(file_path,
+                                                FileTransformer.__apply_line_edits__(file_content, line_edits))
             except OSError as e:
                 logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
 
@@ -563,74 +629,62 @@ class FileOperationsUtility:
         Replace include statements of specified rule files within specified IfModule sections in a vhost file.
         """
 
-        if exists(file_path) and isfile(file_path):
-            start_of_ifmodule = False
+        if config_tree.__isfile__(file_path):
             already_replaced = False
-            ifmodule_indentation = 0
             try:
-                # open the file in read mode and read it
-                with open(file_path) as file:
-                    file_content = file.readlines()
-                file.close()
-                # open the file in write-mode and write to the file,
-                with open(file_path, "w") as file:
-                    for line in file_content:
-                        stripped_line = line.strip()
-                        # remove any contents in the given section
-                        # and replace with given include statements as applicable
-                        if stripped_line.startswith(module_header):
-                            ifmodule_indentation = len(line) - len(stripped_line)
-                            start_of_ifmodule = True
-                            file.write(line)
-                        # if section is found, replace the include statements within of the section
-                        elif start_of_ifmodule:
-                            if stripped_line.startswith(constants.INCLUDE_SYNTAX_IN_VHOST):
-                                included_file_name = basename(stripped_line.split(" ")[1])
-                                if included_file_name in rule_files_to_replace:
-                                    # say we want to replace any rewrite include statements that looks as follows:
-                                    # Include /etc/httpd/conf.d/rewrites/block_pages.rules
-                                    # Include /etc/httpd/conf.d/rewrites/sitemap_rewrite.rules
-                                    # Include /etc/httpd/conf.d/rewrites/allow_search_engines.rules
-                                    # with the statement:
-                                    # Include /etc/httpd/conf.d/rewrites/rewite.rules
-                                    # we only need to replace the include statement once.
-                                    if already_replaced:
-                                        logger.info(
-                                            "FileOperationsUtility: Removed included file '%s' in %s module of file "
-                                            "%s.", included_file_name, module_header, file_path)
-                                        conversion_operation = ConversionOperation(constants.ACTION_REMOVED, file_path,
-                                                                                   "Removed included file '" +
-                                                                                   included_file_name + "' in module '" +
-                                                                                   module_header + "'")
-                                        conversion_step.__add_operation__(conversion_operation)
-                                        continue
-                                    else:
-                                        already_replaced = True
-                                        file.write(line[:len(line) - len(stripped_line) - 1] +
-                                                   stripped_line.replace(included_file_name, rule_file_to_replace_with)
-                                                   + '\n')
-                                        logger.info(
-                                            "FileOperationsUtility: Replaced included file '%s' of %s module with "
-                                            "'%s' in file %s.",
-                                            included_file_name, module_header, rule_file_to_replace_with, file_path)
-                                        conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
-                                                                                   "Replaced included file'"
-                                                                                   + included_file_name
-                                                                                   + "' of module '" + module_header
-                                                                                   + "' with '"
-                                                                                   + rule_file_to_replace_with + "'")
-                                        conversion_step.__add_operation__(conversion_operation)
-                                else:
-                                    file.write(line)
-                            elif stripped_line == constants.IFMODULE_END \
-                                    and len(line) - len(stripped_line) == ifmodule_indentation:
-                                start_of_ifmodule = False
-                                file.write(line)
-                            else:
-                                file.write(line)
-                        # write out other lines as is
+                # files not naming any of the rule files are not parsed
+                if not config_tree.__contains_any__(file_path, rule_files_to_replace):
+                    return
+                vhost_file = config_tree.__get_parsed__(file_path, VhostFileParser.__parse__)
+                file_content = vhost_file.__get_lines__()
+                # collect the edits to the include statements within the given modules
+                line_edits = {}
+                for module in vhost_file.__find_sections__(module_header):
+                    for directive in module.__walk__():
+                        text = directive.__get_text__()
+                        if directive.__is_section__() or not text.startswith(constants.INCLUDE_SYNTAX_IN_VHOST):
+                            continue
+                        arguments = directive.__get_arguments__().split()
+                        included_file_name = basename(arguments[0]) if arguments else ""
+                        if included_file_name not in rule_files_to_replace:
+                            continue
+                        # say we want to replace any rewrite include statements that looks as follows:
+                        # Include /etc/httpd/conf.d/rewrites/block_pages.rules
+                        # Include /etc/httpd/conf.d/rewrites/sitemap_rewrite.rules
+                        # Include /etc/httpd/conf.d/rewrites/allow_search_engines.rules
+                        # with the statement:
+                        # Include /etc/httpd/conf.d/rewrites/rewite.rules
+                        # we only need to replace the include statement once.
+                        for index in range(directive.__get_start_line__(), directive.__get_end_line__() + 1):
+                            line_edits[index] = []
+                        if already_replaced:
+                            logger.info(
+                                "FileOperationsUtility: Removed included file '%s' in %s module of file "
+                                "%s.", included_file_name, module_header, file_path)
+                            conversion_operation = ConversionOperation(constants.ACTION_REMOVED, file_path,
+                                                                       "Removed included file '" +
+                                                                       included_file_name + "' in module '" +
+                                                                       module_header + "'")
+                            conversion_step.__add_operation__(conversion_operation)
                         else:
-                            file.write(line)
+                            already_replaced = True
+                            line_edits[directive.__get_start_line__()] = [
+                                FileOperationsUtility.__indentation(file_content[directive.__get_start_line__()]) +
+                                text.replace(included_file_name, rule_file_to_replace_with) + '\n']
+                            logger.info(
+                                "FileOperationsUtility: Replaced included file '%s' of %s module with "
+                                "'%s' in file %s.",
+                                included_file_name, module_header, rule_file_to_replace_with, file_path)
+                            conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
+                                                                       "Replaced included file'"
+                                                                       + included_file_name
+                                                                       + "' of module '" + module_header
+                                                                       + "' with '"
+                                                                       + rule_file_to_replace_with + "'")
+                            conversion_step.__add_operation__(conversion_operation)
+                if line_edits:
+                    config_tree.__write_lines__(file_path,
+                                                FileTransformer.__apply_line_edits__(file_content, line_edits))
             except OSError as e:
                 logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
 
@@ -654,9 +708,9 @@ class FileOperationsUtility:
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
         """
 
-        if exists(dir_path) and isdir(dir_path):
+        if config_tree.__isdir__(dir_path):
             # get all files under given directory and sub-directories with given file extension
-            files = [f for f in glob(join(dir_path, "**", "*." + file_extension), recursive=True)]
+            files = config_tree.__glob__(join(dir_path, "**", "*." + file_extension))
             # lookup for include statements of the specified rule, and replace them with new rule
             for file in files:
                 if file_extension == constants.FARM:
@@ -671,48 +725,84 @@ class FileOperationsUtility:
                                                                                             conversion_step)
 
     @staticmethod
-    def __replace_file_include_with_file_content(file_path, include_statement_syntax, rule_file_to_replace,
-                                                 rule_file_content, conversion_step):
+    def __get_included_rule_file(stripped_line, include_statement_syntax, rule_file_positions, after_position):
         """
-        Replace file include statements with the content of the included file itself.
+        Get the rule file (of the ones after `after_position`) included by the (stripped) line, if it is an include
+        statement of given syntax. If several rule files match, the longest name is returned.
         """
+        if not stripped_line.startswith(include_statement_syntax):
+            return None
+        matching_names = [rule_file_name for rule_file_name, position in rule_file_positions.items()
+                          if position > after_position and (stripped_line.endswith(rule_file_name)
+                                                            or stripped_line.endswith(rule_file_name + '"'))]
+        return max(matching_names, key=len) if matching_names else None
 
-        if exists(file_path) and isfile(file_path):
+    @staticmethod
+    def __replace_file_includes_with_file_contents_in_lines(file_path, lines, include_statement_syntax,
+                                                           rule_file_contents, rule_file_positions, after_position,
+                                                           operations):
+        """
+        Replace the include statements of the rule files after `after_position` (in the order of `rule_file_contents`)
+        in given lines with the content of the included file itself. The include statements in the content of a rule
+        file are replaced as well, if they include a rule file coming after it.
+        Returns the new lines (`None` if no include statement was replaced), the operations performed are added to
+        `operations`, along with the rule file name of their include statement.
+        """
+
+        new_lines = None
+        for index, line in enumerate(lines):
+            stripped_line = line.strip()
+            rule_file_name = FileOperationsUtility.__get_included_rule_file(stripped_line, include_statement_syntax,
+                                                                            rule_file_positions, after_position)
+            if rule_file_name is None:
+                if new_lines is not None:
+                    new_lines.append(line)
+                continue
+            # the lines before the first include statement are copied as a whole slice
+            if new_lines is None:
+                new_lines = lines[:index]
+            logger.debug("FileOperationsUtility: Found include statement '%s' in file %s.", stripped_line, file_path)
+            rule_file_content = rule_file_contents[rule_file_name]
+            # replace the include statement with the rule file's content
+            if rule_file_content is not None:
+                # get the indentation of the include statement, and adjust the lines to match it
+                indentation = len(line) - len(stripped_line)
+                content_lines = [line[:indentation - 1] + line_from_rule_file_content
+                                 for line_from_rule_file_content in rule_file_content] + ["\n"]
+                logger.info("FileOperationsUtility: Replaced include statement '%s' in file %s.",
+                            stripped_line, file_path)
+                conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
+                                                           "Replaced include statement '" + stripped_line
+                                                           + " with content of file '" + rule_file_name + "'")
+                operations.append((rule_file_name, conversion_operation))
+                replaced_content_lines = FileOperationsUtility.__replace_file_includes_with_file_contents_in_lines(
+                    file_path, content_lines, include_statement_syntax, rule_file_contents, rule_file_positions,
+                    rule_file_positions[rule_file_name], operations)
+                new_lines.extend(content_lines if replaced_content_lines is None else replaced_content_lines)
+        return new_lines
+
+    @staticmethod
+    def __replace_file_includes_with_file_contents(file_path, include_statement_syntax, rule_file_contents):
+        """
+        Replace the include statements of several rule files with the content of the included file itself, in a
+        single pass over the file, as if the rule files had been replaced one after the other (in the order of
+        `rule_file_contents`).
+        Returns the operations performed, along with the rule file name of their include statement.
+        """
+
+        operations = []
+        if config_tree.__isfile__(file_path):
             try:
-                # open the file in read mode and read it
-                with open(file_path) as file:
-                    file_content = file.readlines()
-                file.close()
-                # open the file in write-mode and write to the file,
-                # replacing/removing the include statements as applicable
-                with open(file_path, "w") as file:
-                    for line in file_content:
-                        stripped_line = line.strip()
-                        if stripped_line.startswith(include_statement_syntax) and (
-                                stripped_line.endswith(rule_file_to_replace) or stripped_line.endswith(
-                            rule_file_to_replace + '"')):
-                            logger.debug("FileOperationsUtility: Found include statement '%s' in file %s.",
-                                         stripped_line, file_path)
-                            # get the indentation of the include statement
-                            indentation = len(line) - len(stripped_line)
-                            # replace the include statement with the rule file's content
-                            if rule_file_content is not None:
-                                for line_from_rule_file_content in rule_file_content:
-                                    # adjust the line to match the include statement's indentation
-                                    file.write(line[:indentation - 1] + line_from_rule_file_content)
-                                file.write("\n")
-                                logger.info("FileOperationsUtility: Replaced include statement '%s' in file %s.",
-                                            stripped_line, file_path)
-                                conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
-                                                                           "Replaced include statement '" + stripped_line
-                                                                           + " with content of file '"
-                                                                           + rule_file_to_replace + "'")
-                                conversion_step.__add_operation__(conversion_operation)
-                        # write out other lines as is
-                        else:
-                            file.write(line)
+                rule_file_positions = dict((rule_file_name, position)
+                                           for position, rule_file_name in enumerate(rule_file_contents))
+                new_file_content = FileOperationsUtility.__replace_file_includes_with_file_contents_in_lines(
+                    file_path, config_tree.__read_lines__(file_path), include_statement_syntax, rule_file_contents,
+                    rule_file_positions, -1, operations)
+                if new_file_content is not None:
+                    config_tree.__write_lines__(file_path, new_file_content)
             except OSError as e:
                 logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
+        return operations
 
     @staticmethod
     def __replace_include_statement_with_content_of_rule_file__(dir_path, file_extension,
@@ -731,148 +821,210 @@ class FileOperationsUtility:
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
         """
 
-        if exists(dir_path) and isdir(dir_path):
-            # get all files under given directory and sub-directories with given file extension
-            files = [f for f in glob(join(dir_path, "**", "*." + file_extension), recursive=True)]
-            # lookup for include statements of the specified rule, and replace them with new rule
-            for file in files:
-                FileOperationsUtility.__replace_file_include_with_file_content(file, include_statement_syntax,
-                                                                               rule_file_to_replace, content,
-                                                                               conversion_step)
+        FileOperationsUtility.__replace_include_statements_with_content_of_rule_files__(
+            dir_path, file_extension, {rule_file_to_replace: content}, include_statement_syntax, conversion_step)
 
     @staticmethod
-    def __replace_variable_usage(file_path, variable_to_replace, new_variable, conversion_step):
-        """
-        Replace usage of a variable with a new variable.
+    def __replace_include_statements_with_content_of_rule_files__(dir_path, file_extension, rule_file_contents,
+                                                                  include_statement_syntax, conversion_step,
+                                                                  followed_by=None):
         """
-
-        if exists(file_path) and isfile(file_path):
-            try:
-                # open the file in read mode and read it
-                with open(file_path) as file:
-                    file_content = file.readlines()
-                file.close()
-                # open the file in write-mode and write to the file,
-                # replacing the variable, if found, with the new variable
-                with open(file_path, "w") as file:
-                    for line in file_content:
-                        if line.find(variable_to_replace) != -1:
-                            file.write(line.replace(variable_to_replace, new_variable))
-                            logger.info("FileOperationsUtility: Replaced variable '%s' with variable '%s' in file %s.",
-                                        variable_to_replace, new_variable, file_path)
-                            conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
-                                                                       "Replaced variable '" + variable_to_replace
-                                                                       + " with new variable '" + new_variable + "'")
-                            conversion_step.__add_operation__(conversion_operation)
-                        else:
-                            file.write(line)
-            except OSError as e:
-                logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
-
-    @staticmethod
-    def __replace_all_usage_of_old_variable_with_new_variable__(dir_path, file_extension, variable_to_replace,
-                                                                new_variable, conversion_step):
-        """
-        Replace usage of a variable with a new variable in all files of given file-type in specified directory and
-        sub-directories.
+        Replace the include statements of several rule files with the content of the included file itself, in all
+        files of given file-type in specified directory and sub-directories, rewriting each file including any of them
+        once. The rule files are replaced in the order of `rule_file_contents`: the include statements in the content
+        of a rule file are replaced as well, if they include a rule file coming after it.
+        Usage scenario : Replace the include statements of all farm specific `*_cache.any` files in the farm files with
+        their content.
 
         Parameters:
             dir_path (str): The path to directory whose files are to be processed
             file_extension (str): The extension of the type that needs to be processed
-            variable_to_replace (str): The variable that is to be replaced
-            new_variable (str): The variable that is to be replaced with
+            rule_file_contents (dict): The content (List[str]) with which the include statements of every rule file
+                name are to be replaced
+            include_statement_syntax (str): The syntax of the include statement to be replaced
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
-        """
-
-        if exists(dir_path) and isdir(dir_path):
-            # get all files under given directory and sub-directories with given file extension
-            files = [f for f in glob(join(dir_path, "**", "*." + file_extension), recursive=True)]
-            # lookup for include statements of the specified rule, and replace them with new rule
+            followed_by (Callable[[str], None]): Called with every rule file name once the replacement of its include
+                statements is reported (e.g. to delete the rule file), the actions are reported rule file name by rule
+                file name
+        """
+
+        operations_of_names = dict((rule_file_name, []) for rule_file_name in rule_file_contents)
+        if config_tree.__isdir__(dir_path) and rule_file_contents:
+            # get the files under given directory and sub-directories with given file extension, which include any of
+            # the rule files (the include statements in the content of a rule file are only found in the files
+            # including that rule file)
+            files = include_index.__get_files_including_any__(dir_path, file_extension, include_statement_syntax,
+                                                              sorted(rule_file_contents))
             for file in files:
-                FileOperationsUtility.__replace_variable_usage(file, variable_to_replace, new_variable, conversion_step)
+                for rule_file_name, operation in FileOperationsUtility.__replace_file_includes_with_file_contents(
+                        file, include_statement_syntax, rule_file_contents):
+                    operations_of_names[rule_file_name].append(operation)
+        for rule_file_name, operations in operations_of_names.items():
+            for operation in operations:
+                conversion_step.__add_operation__(operation)
+            if followed_by is not None:
+                followed_by(rule_file_name)
 
     @staticmethod
-    def __remove_variable_usage(file_path, variable_to_replace, conversion_step):
-        """
-        Remove usage of specified variable.
+    def __rewrite_variable_usage_in_file__(variable_actions, variable_matcher, file_path, file_content, line_edits,
+                                           conversion_step):
+        """
+        Rewrite the usage of the variables of the table in a single pass over the file (transform of a
+        FileTransformer). The result is the one of rewriting the variables one after the other, in the order of the
+        table: a line using several removed variables is removed for the first of them, and a variable renamed in a
+        line is reported even if the line is removed for a variable coming later in the table. The operations are
+        returned along with the position of their variable in the table, to be reported variable by variable.
+        """
+
+        variable_positions = dict((variable, position) for position, variable in enumerate(variable_actions))
+        removed_variables = set(variable for variable, (action, new_variable) in variable_actions.items()
+                                if action == constants.VARIABLE_REMOVE)
+        renamed_variables = dict((variable, new_variable) for variable, (action, new_variable)
+                                 in variable_actions.items() if action == constants.VARIABLE_RENAME)
+        # the lines using any of the removed variables (or within an `<If>` block using one in its condition), along
+        # with the position of the variable they are removed for (the edits are added once the renames are collected)
+        removed_lines = {}
+        # the operations, along with the position of their variable and the line they are reported at
+        operations = []
+        if removed_variables:
+            vhost_file = FileTransformer.__get_parsed__(file_path, file_content, VhostFileParser.__parse__)
+            if_blocks = dict((directive.__get_start_line__(), directive)
+                             for directive in vhost_file.__get_directives__() if directive.__is_section__()
+                             and directive.__get_text__().startswith(constants.IF_BLOCK_START))
+            FileOperationsUtility.__remove_variable_usage_in_lines(
+                0, len(file_content) - 1, None, len(variable_positions), if_blocks,
+                dict((variable, variable_positions[variable]) for variable in removed_variables), variable_matcher,
+                file_path, file_content, line_edits, removed_lines, operations)
+        # rename the variables in the remaining lines, and report the renames done before a line is removed
+        if renamed_variables:
+            for index in range(len(file_content)):
+                lines = FileTransformer.__get_current_lines__(file_content, line_edits, index)
+                variables_to_replace = []
+                for line in lines:
+                    for match in variable_matcher.finditer(line):
+                        if match.group(0) in renamed_variables and match.group(0) not in variables_to_replace \
+                                and variable_positions[match.group(0)] < removed_lines.get(index,
+                                                                                           len(variable_positions)):
+                            variables_to_replace.append(match.group(0))
+                if not variables_to_replace:
+                    continue
+                if index not in removed_lines:
+                    line_edits[index] = [variable_matcher.sub(
+                        lambda match: renamed_variables.get(match.group(0), match.group(0)), line) for line in lines]
+                for variable_to_replace in variables_to_replace:
+                    new_variable = renamed_variables[variable_to_replace]
+                    logger.info("FileOperationsUtility: Replaced variable '%s' with variable '%s' in file %s.",
+                                variable_to_replace, new_variable, file_path)
+                    conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
+                                                               "Replaced variable '" + variable_to_replace
+                                                               + " with new variable '" + new_variable + "'")
+                    operations.append((variable_positions[variable_to_replace], index, conversion_operation))
+        for index in removed_lines:
+            line_edits[index] = []
+        # variable by variable, line by line
+        operations.sort(key=lambda operation: operation[:2])
+        return [(position, conversion_operation) for position, index, conversion_operation in operations]
+
+    @staticmethod
+    def __remove_variable_usage_in_lines(first_line, last_line, enclosing_variable, enclosing_position, if_blocks,
+                                         removed_positions, variable_matcher, file_path, file_content, line_edits,
+                                         removed_lines, operations):
         """
+        Remove the lines of given range using any of the removed variables (the whole `<If>` block if the variable is
+        used in its condition), as if the variables were removed one after the other in the order of the table (see
+        `__rewrite_variable_usage_in_file__`).
 
-        if exists(file_path) and isfile(file_path):
-            try:
-                # open the file in read mode and read it
-                with open(file_path) as file:
-                    file_content = file.readlines()
-                file.close()
-                # a FIFO based record to keep track of nested if-block opening and closing
-                # (something like parentheses balancing)
-                stack = deque([], 10)
-                # a flag denoting whether the current statement being processed lies inside a if-block
-                # which is to be removed
-                skip_flag = False
-                # open the file in write-mode and write to the file,
-                with open(file_path, "w") as file:
-                    for line in file_content:
-                        # if variable to be removed is used in if-statement, remove the whole if-block
-                        # keeping track of if-block opening and closing (for nested if-blocks) in the FIFO record
-                        if line.strip().startswith(constants.IF_BLOCK_START) and line.find(variable_to_replace) != -1:
-                            stack.append(constants.IF_BLOCK_START)
-                            skip_flag = True
-                            logger.debug(
-                                "FileOperationsUtility: Found usage of variable '%s' in 'if' condition in file %s.",
-                                variable_to_replace, file_path)
-                        # if variable to be removed is used in normal line of statement, remove the line
-                        elif line.find(variable_to_replace) != -1:
-                            logger.info("FileOperationsUtility: Removed usage of variable '%s' in file %s.",
-                                        variable_to_replace, file_path)
-                            conversion_operation = ConversionOperation(constants.ACTION_REMOVED, file_path,
-                                                                       "Removed variable '" + variable_to_replace + "'")
-                            conversion_step.__add_operation__(conversion_operation)
-                            continue
-                        # if current line is under an if-block which used the variable to replace
-                        # remove the current line, take care of inner if blocks if present
-                        elif skip_flag:
-                            # when a new nested if-block starts, keep track of it,
-                            # by adding entry denoting start of new if-block
-                            if line.strip().startswith(constants.IF_BLOCK_START):
-                                stack.append(constants.IF_BLOCK_START)
-                            # when if-block ends, remove the entry for the if-block previously recorded,
-                            # this will continue until the original if-block is processed and stack becomes empty
-                            elif line.strip().endswith(constants.IF_BLOCK_END):
-                                stack.pop()
-                                # stack is empty, i.e. the whole if-block has been removed, set skip flag to False
-                                if not stack:
-                                    skip_flag = False
-                                    logger.debug(
-                                        "FileOperationsUtility: Removed usage of variable '%s' in 'if' condition in "
-                                        "file %s.", variable_to_replace, file_path)
-                                    conversion_operation = ConversionOperation(constants.ACTION_REMOVED, file_path,
-                                                                               "Removed 'if' condition which used "
-                                                                               "variable '" + variable_to_replace + "'")
-                                    conversion_step.__add_operation__(conversion_operation)
-                        # if it is just a normal statement, keep it
-                        else:
-                            file.write(line)
-            except OSError as e:
-                logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
+        Parameters:
+            first_line (int): The index of the first line of the range
+            last_line (int): The index of the last line of the range
+            enclosing_variable (str): The variable the enclosing `<If>` block is removed for, its usages in the lines
+                of the block are reported as removed along with it (`None` if there is none)
+            enclosing_position (int): The position of the variable the enclosing `<If>` block is removed for, lines
+                using a variable coming before it are removed on their own (the size of the table if there is none)
+            if_blocks (dict): The `<If>` sections of the file, keyed by the index of their first line
+            removed_positions (dict): The position in the table of every removed variable
+            removed_lines (dict): The lines being removed, along with the position of the variable they are removed
+                for, to be completed
+            operations (List[Tuple[int, int, ConversionOperation]]): The operations performed, along with the
+                position of their variable and the line they are reported at, to be completed
+        """
+        index = first_line
+        while index <= last_line:
+            text = "".join(FileTransformer.__get_current_lines__(file_content, line_edits, index))
+            # comment lines using a variable are removed as well
+            used_variables = set(match.group(0) for match in variable_matcher.finditer(text)
+                                 if match.group(0) in removed_positions)
+            variable_to_remove = min(used_variables, key=removed_positions.get, default=None)
+            if_block = if_blocks.get(index)
+            # the line is kept, or removed along with the enclosing `<If>` block: the usage of the variable of the
+            # block is reported, except in the condition of a nested `<If>` block
+            if variable_to_remove is None or removed_positions[variable_to_remove] >= enclosing_position:
+                if enclosing_variable in used_variables and if_block is None:
+                    logger.info("FileOperationsUtility: Removed usage of variable '%s' in file %s.",
+                                enclosing_variable, file_path)
+                    operations.append((enclosing_position, index, ConversionOperation(
+                        constants.ACTION_REMOVED, file_path, "Removed variable '" + enclosing_variable + "'")))
+                index += 1
+                continue
+            position = removed_positions[variable_to_remove]
+            # if variable to be removed is used in if-statement, remove the whole if-block, along with the lines of
+            # the block using variables coming before it
+            if if_block is not None:
+                close_line = if_block.__get_close_line__()
+                for block_index in range(index, close_line + 1):
+                    removed_lines[block_index] = min(position, removed_lines.get(block_index, position))
+                FileOperationsUtility.__remove_variable_usage_in_lines(
+                    index + 1, close_line, variable_to_remove, position, if_blocks, removed_positions,
+                    variable_matcher, file_path, file_content, line_edits, removed_lines, operations)
+                logger.debug(
+                    "FileOperationsUtility: Removed usage of variable '%s' in 'if' condition in "
+                    "file %s.", variable_to_remove, file_path)
+                operations.append((position, close_line, ConversionOperation(
+                    constants.ACTION_REMOVED, file_path,
+                    "Removed 'if' condition which used variable '" + variable_to_remove + "'")))
+                index = close_line + 1
+            # if variable to be removed is used in normal line of statement (including the opening tag of any other
+            # section), remove the line
+            else:
+                removed_lines[index] = min(position, removed_lines.get(index, position))
+                logger.info("FileOperationsUtility: Removed usage of variable '%s' in file %s.",
+                            variable_to_remove, file_path)
+                operations.append((position, index, ConversionOperation(
+                    constants.ACTION_REMOVED, file_path, "Removed variable '" + variable_to_remove + "'")))
+                index += 1
 
     @staticmethod
-    def __remove_all_usage_of_old_variable__(dir_path, file_extension, variable_to_remove, conversion_step):
+    def __rewrite_variables__(dir_path, file_extension, variable_actions, conversion_step, file_transformer=None):
         """
-        Replace usage of specified variable in all files of given file-type in specified directory and sub-directories.
+        Rewrite the usage of several variables in all files of given file-type in specified directory and
+        sub-directories, applying the action of every variable in a single pass over each file. The actions are
+        applied (and reported) in the order of the table: the operations are reported variable by variable, and for
+        every variable file by file, as if the variables had been rewritten one after the other.
 
         Parameters:
             dir_path (str): The path to directory whose files are to be processed
             file_extension (str): The extension of the type that needs to be processed
-            variable_to_remove (str): The variable that is to be removed
+            variable_actions (dict): The action for each variable, either `(VARIABLE_RENAME, new_variable)` to replace
+                it with the new variable, or `(VARIABLE_REMOVE, None)` to remove the directives using it (or the whole
+                `<If>` block if it is used in the condition)
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
-        """
-
-        if exists(dir_path) and isdir(dir_path):
-            # get all files under given directory and sub-directories with given file extension
-            files = [f for f in glob(join(dir_path, "**", "*." + file_extension), recursive=True)]
-            # lookup for include statements of the specified rule, and replace them with new rule
-            for file in files:
-                FileOperationsUtility.__remove_variable_usage(file, variable_to_remove, conversion_step)
+            file_transformer (FileTransformer): The transformer to register the rewrite with, to fuse it with the
+                other transforms of the files (if not given, the rewrite is applied right away)
+        """
+
+        if config_tree.__isdir__(dir_path) and variable_actions:
+            # a single pattern matching any of the variables (the longest first, if a variable is part of another)
+            variable_matcher = compile("|".join(escape(variable) for variable in
+                                                sorted(variable_actions, key=len, reverse=True)))
+            transformer = file_transformer if file_transformer is not None else FileTransformer()
+            # all files under given directory and sub-directories with given file extension
+            # only the files using any of the variables are transformed
+            transformer.__add_transform__(partial(FileOperationsUtility.__rewrite_variable_usage_in_file__,
+                                                  variable_actions, variable_matcher),
+                                          [join(dir_path, "**", "*." + file_extension)], conversion_step,
+                                          list(variable_actions), ordered=True)
+            if file_transformer is None:
+                transformer.__apply__()
 
     @staticmethod
     def __replace_particular_section_content_with_include_statement(file_path, section_header,
@@ -882,51 +1034,49 @@ class FileOperationsUtility:
         Replace the content of specified section with given file include statement.
         """
 
-        if exists(file_path) and isfile(file_path):
-            start_of_section = False
-            retrieved_content_indentation = False
-            content_indentation = ""
-            section_indentation = 0
+        if config_tree.__isfile__(file_path):
             try:
-                # open the file in read mode and read it
-                with open(file_path) as file:
-                    file_content = file.readlines()
-                file.close()
-                # open the file in write-mode and write to the file,
-                with open(file_path, "w") as file:
-                    for index, line in enumerate(file_content):
-                        stripped_line = line.strip()
-                        # remove any contents in the given section
-                        # and replace with given include statements as applicable
-                        if stripped_line.startswith(section_header):
-                            section_indentation = len(line) - len(stripped_line)
-                            start_of_section = True
-                            file.write(line)
-                            if not stripped_line.endswith("{"):
-                                next_line = file_content[index + 1]
-                                file.write(next_line)
-                                section_indentation = len(next_line) - len(next_line.strip())
-                        # if section is found, replace the content of the section
-                        elif start_of_section:
-                            if stripped_line == "}" and len(line) - len(stripped_line) == section_indentation:
-                                start_of_section = False
-                                file.write(content_indentation + include_statement_to_replace_with + '\n')
-                                file.write(line)
-                                logger.info(
-                                    "FileOperationsUtility: Replaced content of %s section with include statement "
-                                    "'%s' in file %s.", section_header, include_statement_to_replace_with, file_path)
-                                conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
-                                                                           "Replaced content of section '"
-                                                                           + section_header + "' with include statement "
-                                                                           + include_statement_to_replace_with)
-                                conversion_step.__add_operation__(conversion_operation)
-                            # for any content inside the section, retrieve the line's indentation
-                            elif not retrieved_content_indentation:
-                                content_indentation = line[:len(line) - len(stripped_line) - 1]
-                                retrieved_content_indentation = True
-                        # write out other lines as is
-                        else:
-                            file.write(line)
+                farm_file = config_tree.__get_parsed__(file_path, FarmFileParser.__parse__)
+                file_content = farm_file.__get_lines__()
+                # collect the edits replacing everything between the braces of the given sections
+                line_edits = {}
+                for section in farm_file.__find_sections__(section_header):
+                    if not section.__is_closed__():
+                        logger.warning("FileOperationsUtility: Section %s in file %s is not closed, skipping it.",
+                                       section_header, file_path)
+                        continue
+                    open_line = file_content[section.__get_open_line__()]
+                    close_line = file_content[section.__get_close_line__()]
+                    # keep the closing brace at its indentation, or at the indentation of the header if it shares
+                    # its line with other content
+                    close_indentation = close_line[:section.__get_close_column__()]
+                    if close_indentation.strip():
+                        close_indentation = FileOperationsUtility.__indentation(
+                            file_content[section.__get_header_line__()])
+                    # indent the include statement like the first line of content, or one level deeper than the
+                    # closing brace if the section has no content on lines of its own
+                    content_indentation = close_indentation + "\t"
+                    for index in section.__get_inner_lines__():
+                        if file_content[index].strip():
+                            content_indentation = FileOperationsUtility.__indentation(file_content[index])
+                            break
+                    new_section_content = [open_line[:section.__get_open_column__() + 1] + '\n',
+                                           content_indentation + include_statement_to_replace_with + '\n',
+                                           close_indentation + close_line[section.__get_close_column__():]]
+                    line_edits[section.__get_open_line__()] = new_section_content
+                    for index in range(section.__get_open_line__() + 1, section.__get_close_line__() + 1):
+                        line_edits[index] = []
+                    logger.info(
+                        "FileOperationsUtility: Replaced content of %s section with include statement "
+                        "'%s' in file %s.", section_header, include_statement_to_replace_with, file_path)
+                    conversion_operation = ConversionOperation(constants.ACTION_REPLACED, file_path,
+                                                               "Replaced content of section '"
+                                                               + section_header + "' with include statement "
+                                                               + include_statement_to_replace_with)
+                    conversion_step.__add_operation__(conversion_operation)
+                if line_edits:
+                    config_tree.__write_lines__(file_path,
+                                                FileTransformer.__apply_line_edits__(file_content, line_edits))
             except OSError as e:
                 logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
 
@@ -944,9 +1094,9 @@ class FileOperationsUtility:
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
         """
 
-        if exists(dir_path) and isdir(dir_path):
+        if config_tree.__isdir__(dir_path):
             # get all farm files under given directory and sub-directories
-            files = [f for f in glob(join(dir_path, "**", "*." + extension), recursive=True)]
+            files = config_tree.__glob__(join(dir_path, "**", "*." + extension))
             # lookup and remove any contents in the given section and replace them with given include statement
             for file in files:
                 FileOperationsUtility.__replace_particular_section_content_with_include_statement(file, section_header,
@@ -964,83 +1114,43 @@ class FileOperationsUtility:
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
         """
 
-        if exists(dir_path) and isdir(dir_path):
+        if config_tree.__isdir__(dir_path):
             # get files of the format dir_path/*.vhost
-            files = [f for f in glob(join(dir_path, "*.vhost"), recursive=False)]
+            files = config_tree.__glob__(join(dir_path, "*.vhost"))
             non_whitelisted_directive_usage = []
             for file_path in files:
-                # open the file in read mode and read it
-                with open(file_path) as file:
-                    file_content = file.readlines()
-                file.close()
-                line_count = 0
-                start_of_section_directives_list = []
-                # open the file in write-mode and write to the file,
-                with open(file_path, "w") as file:
-                    for line in file_content:
-                        line_count += 1
-                        stripped_line = line.strip()
-                        file_path_with_line = file_path[file_path.find("conf.d"):] + ':' + str(line_count)
-                        # if section with non-whitelisted directive is found
-                        if len(start_of_section_directives_list) > 0:
-                            # we need to comment all lines in the section
-                            file.write(constants.COMMENT_ANNOTATION + line)
-                            logger.info(
-                                "FileOperationsUtility: Commenting non-whitelisted directive usage in %s.",
+                vhost_file = config_tree.__get_parsed__(file_path, VhostFileParser.__parse__)
+                file_content = vhost_file.__get_lines__()
+                relative_file_path = file_path[file_path.find("conf.d"):]
+                # collect the edits commenting out the non-whitelisted directives
+                line_edits = {}
+                # the last line of the section being commented out, directives up to this line are commented along
+                # with it
+                commented_until_line = -1
+                for directive in vhost_file.__get_directives__():
+                    if directive.__get_start_line__() <= commented_until_line:
+                        continue
+                    if directive.__is_section__():
+                        name = "<" + directive.__get_name__() + ">"
+                    else:
+                        name = directive.__get_name__()
+                    if name.lower() in whitelisted_directives_set:
+                        continue
+                    # comment out the directive, or all lines of the section
+                    for index in range(directive.__get_start_line__(), directive.__get_last_line__() + 1):
+                        line_edits[index] = [constants.COMMENT_ANNOTATION + file_content[index]]
+                    commented_until_line = directive.__get_last_line__()
+                    file_path_with_line = relative_file_path + ':' + str(directive.__get_start_line__() + 1)
+                    non_whitelisted_directive_usage.append(file_path_with_line + ' ' + name)
+                    logger.info("FileOperationsUtility: Commenting non-whitelisted directive usage in %s.",
                                 file_path_with_line)
-                            # check if start of section, pop last added directive from stack
-                            if stripped_line.startswith('</'):
-                                directive = stripped_line.replace('/', '')
-                                # if non-whitelisted directive is found, add to log
-                                if directive.lower() not in whitelisted_directives_set:
-                                    non_whitelisted_directive_usage.append(file_path_with_line + ' ' + directive)
-                                start_of_section_directives_list.pop()
-                            elif stripped_line.startswith('<'):
-                                # check if start of section, push directive to stack
-                                directive = stripped_line.split()[0] + '>'
-                                start_of_section_directives_list.append(directive)
-                        elif not stripped_line.startswith(constants.COMMENT_ANNOTATION) and not stripped_line == "" \
-                                and not stripped_line.startswith('\\'):
-                            # if line is not empty or a comment, or is not a continuation of previous line
-                            # check if end of section
-                            if stripped_line.startswith('</'):
-                                directive = stripped_line.replace('/', '')
-                                # if non-whitelisted directive is found, add to log and comment line
-                                if directive.lower() not in whitelisted_directives_set:
-                                    non_whitelisted_directive_usage.append(file_path_with_line + ' ' + directive)
-                                    file.write(constants.COMMENT_ANNOTATION + line)
-                                    logger.info(
-                                        "FileOperationsUtility: Commenting non-whitelisted directive usage in %s.",
-                                        file_path_with_line)
-                                else:
-                                    file.write(line)
-                            elif stripped_line.startswith('<'):
-                                # check if start of section
-                                directive = stripped_line.split()[0] + '>'
-                                # if non-whitelisted directive is found, add to log and comment line
-                                if directive.lower() not in whitelisted_directives_set:
-                                    start_of_section_directives_list.append(directive)
-                                    non_whitelisted_directive_usage.append(file_path_with_line + ' ' + directive)
-                                    file.write(constants.COMMENT_ANNOTATION + line)
-                                    logger.info(
-                                        "FileOperationsUtility: Commenting non-whitelisted directive usage in %s.",
-                                        file_path_with_line)
-                                else:
-                                    file.write(line)
-                            else:
-                                # if non-whitelisted directive is used, comment the line
-                                directive = stripped_line.split()[0]
-                                if directive.lower() not in whitelisted_directives_set:
-                                    non_whitelisted_directive_usage.append(file_path_with_line + ' ' + directive)
-                                    file.write(constants.COMMENT_ANNOTATION + line)
-                                    logger.info(
-                                        "FileOperationsUtility: Commenting non-whitelisted directive usage in %s.",
-                                        file_path_with_line)
-                                else:
-                                    file.write(line)
-                        else:
-                            file.write(line)
-                file.close()
+                    # report the closing tag of the section as well
+                    if directive.__is_section__() and directive.__is_closed__():
+                        non_whitelisted_directive_usage.append(
+                            relative_file_path + ':' + str(directive.__get_close_line__() + 1) + ' ' + name)
+                if line_edits:
+                    config_tree.__write_lines__(file_path,
+                                                FileTransformer.__apply_line_edits__(file_content, line_edits))
             if len(non_whitelisted_directive_usage) > 0:
                 print('\nApache configuration uses non-whitelisted directives:')
                 logger.error('Apache configuration uses non-whitelisted directives:')
@@ -1059,48 +1169,37 @@ class FileOperationsUtility:
         Remove usage of variables within specified sections of a file.
         """
 
-        if exists(file_path) and isfile(file_path):
-            start_of_section = False
-            section_indentation = 0
+        if config_tree.__isfile__(file_path):
             try:
-                # open the file in read mode and read it
-                with open(file_path) as file:
-                    file_content = file.readlines()
-                file.close()
-                # open the file in write-mode and write to the file,
-                with open(file_path, "w") as file:
-                    for line in file_content:
+                # files not using any variable are not parsed
+                if not config_tree.__contains_any__(file_path, ["${"]):
+                    return
+                farm_file = config_tree.__get_parsed__(file_path, FarmFileParser.__parse__)
+                file_content = farm_file.__get_lines__()
+                # collect the edits to the lines within the given sections
+                line_edits = {}
+                for section in farm_file.__find_sections__(section_header):
+                    for index in section.__get_inner_lines__():
+                        line = file_content[index]
                         stripped_line = line.strip()
-                        # identify the start of section
-                        if stripped_line.startswith(section_header):
-                            section_indentation = len(line) - len(stripped_line)
-                            start_of_section = True
-                            file.write(line)
-                        elif start_of_section:
-                            # if section is found, remove all variable usages within of the section
-                            # find usage of variable via regular expression (${variable_name})
-                            # The regex matches the first "${", then it matches everything that's not a "}":
-                            # \$\{ matches the character "${" literally
-                            # the capturing group ([^}]+) greedily matches anything that's not a "}"
-                            if search('\${([^}]+)', stripped_line):
-                                logger.info(
-                                    "FileOperationsUtility: Removed usage of variable '%s' in %s section of file "
-                                    "%s.", stripped_line, section_header, file_path)
-                                conversion_operation = ConversionOperation(constants.ACTION_REMOVED, file_path,
-                                                                           "Removed usage of variable '" + stripped_line
-                                                                           + "' in section '" + section_header + "'")
-                                conversion_step.__add_operation__(conversion_operation)
-                                # comment out the line
-                                file.write(constants.COMMENT_ANNOTATION + line)
-                            elif stripped_line == "}" and len(line) - len(stripped_line) == section_indentation:
-                                # mark the end of section
-                                start_of_section = False
-                                file.write(line)
-                            else:
-                                file.write(line)
-                        # write out other lines as is
-                        else:
-                            file.write(line)
+                        # remove all variable usages within of the section
+                        # find usage of variable via regular expression (${variable_name})
+                        # The regex matches the first "${", then it matches everything that's not a "}":
+                        # \$\{ matches the character "${" literally
+                        # the capturing group ([^}]+) greedily matches anything that's not a "}"
+                        if search('\${([^}]+)', stripped_line):
+                            logger.info(
+                                "FileOperationsUtility: Removed usage of variable '%s' in %s section of file "
+                                "%s.", stripped_line, section_header, file_path)
+                            conversion_operation = ConversionOperation(constants.ACTION_REMOVED, file_path,
+                                                                       "Removed usage of variable '" + stripped_line
+                                                                       + "' in section '" + section_header + "'")
+                            conversion_step.__add_operation__(conversion_operation)
+                            # comment out the line
+                            line_edits[index] = [constants.COMMENT_ANNOTATION + line]
+                if line_edits:
+                    config_tree.__write_lines__(file_path,
+                                                FileTransformer.__apply_line_edits__(file_content, line_edits))
             except OSError as e:
                 logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
 
@@ -1117,9 +1216,9 @@ class FileOperationsUtility:
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
         """
 
-        if exists(dir_path) and isdir(dir_path):
+        if config_tree.__isdir__(dir_path):
             # get all files under given directory and sub-directories with given file extension
-            files = [f for f in glob(join(dir_path, "**", "*." + file_extension), recursive=True)]
+            files = config_tree.__glob__(join(dir_path, "**", "*." + file_extension))
             for file in files:
                 FileOperationsUtility.__remove_variable_usage_in_section_in_file(file, section_header, conversion_step)
 
@@ -1135,16 +1234,20 @@ class FileOperationsUtility:
         """
 
         enabled_dir_files = set()
-        for file in listdir(src_dir):
-            if isfile(join(src_dir, file)):
+        for file in config_tree.__listdir__(src_dir):
+            if config_tree.__isfile__(join(src_dir, file)):
                 enabled_dir_files.add(file)
-        for file in listdir(dest_dir):
-            if isfile(join(dest_dir, file)):
-                if file not in enabled_dir_files:
+        # files targeted by the (actual or symlink file) symlinks in the source dir are kept as well,
+        # regardless of their name
+        enabled_dir_targets = symlink_resolver.__get_targets__(src_dir)
+        for file in config_tree.__listdir__(dest_dir):
+            if config_tree.__isfile__(join(dest_dir, file)):
+                if file not in enabled_dir_files \
+                        and config_tree.__realpath__(join(dest_dir, file)) not in enabled_dir_targets:
                     FileOperationsUtility.__delete_file__(join(dest_dir, file), conversion_step)
 
     @staticmethod
-    def __consolidate_variable_files__(files: List[str], new_file_path, conversion_step):
+    def __consolidate_variable_files__(files: List[str], new_file_path, conversion_step, variable_index=None):
         """
         Returns a list of the variables after consolidating the variables (duplicates not allowed)
         from given files into a single new file.
@@ -1153,64 +1256,83 @@ class FileOperationsUtility:
             files (List[str]): The variable files to be consolidated
             new_file_path (str): The new file that will contain the consolidated variables
             conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
+            variable_index (VariableIndex): The index to which the variable definitions are to be added.
 
         Returns the list of variables consolidated.
         """
+        if variable_index is None:
+            variable_index = VariableIndex()
         # list of defined variables (only the variable)
         variables_list = []
         # list of variable definitions
         variables_definition_list = []
-        # get the content of each vars file
+        # get the content of each vars file (or of its target, if it is a symlink file)
         for file in files:
-            variables_extracted_from_file = FileOperationsUtility.__get_content_from_file__(file, True)
-            for variable_def in variables_extracted_from_file:
-                if not variable_def.startswith(constants.COMMENT_ANNOTATION):
-                    var_definition = variable_def.split()
-                    # if not duplicate
-                    if var_definition[1] not in variables_list:
-                        variables_list.append(var_definition[1])
-                        variables_definition_list.append(variable_def)
-        with open(new_file_path, "w") as f:
-            pass
-            # write the list of consolidated variables into the new file
-            for variable_def in variables_definition_list:
-                f.write(variable_def)
+            target_file = symlink_resolver.__resolve__(file)
+            if target_file is None or not config_tree.__isfile__(target_file):
+                continue
+            file_content = config_tree.__read_lines__(target_file)
+            # only the first definition of each variable is kept
+            for variable, variable_def in variable_index.__add_definitions__(file, file_content):
+                variables_list.append(variable)
+                variables_definition_list.append(variable_def if variable_def.endswith("\n") else variable_def + "\n")
+        # write the list of consolidated variables into the new file
+        config_tree.__write_lines__(new_file_path, variables_definition_list)
+        variable_index.__set_consolidated_file__(new_file_path, variables_list)
+        # report variables whose other definitions were dropped in favour of the first one, with a different value
+        for variable, kept_definition, differing_definitions in variable_index.__get_conflicting_definitions__():
+            kept_location = kept_definition[0] + ":" + str(kept_definition[1])
+            locations = ", ".join(file_path + ":" + str(line_number)
+                                  for file_path, line_number, value in differing_definitions)
+            logger.warning("FileOperationsUtility: Variable '%s' is defined at %s with a different value than the "
+                           "kept definition at %s.", variable, locations, kept_location)
+            conversion_operation = ConversionOperation(constants.WARNING, new_file_path,
+                                                       "Variable '" + variable + "' is defined at " + locations +
+                                                       " with a different value than the kept definition at " +
+                                                       kept_location)
+            conversion_step.__add_operation__(conversion_operation)
         return variables_list
 
     @staticmethod
-    def __check_for_undefined_variables__(dir_path, defined_variables_list: List[str]):
+    def __check_variables__(dir_path, farm_dir_path, variable_index, conversion_step):
         """
-        Check vhost files for usage of undefined variables.
-        If found, print warning in terminal and log error.
+        Check vhost files for usage of undefined variables, and the consolidated variables file for variables used
+        neither in vhost, rule or farm files nor in the value of another variable. Usage of undefined variables is
+        printed in terminal and logged as error, unused variables are reported as warnings, once each, at their line in
+        the consolidated variables file.
 
         Parameters:
-            dir_path (str): The directory to be searched under
-            defined_variables_list (List[str]): The list of variables that are defined
-        """
-        flag_first = True
-        files = [f for f in glob(join(dir_path, "**", "*.vhost"), recursive=True)]
-        for vhost_file in files:
-            with open(vhost_file, "r") as file:
-                file_content = file.readlines()
-            file.close()
-            line_index = 0
-            for line in file_content:
-                line_index += 1
-                stripped_line = line.strip()
-                # if line is not a comment
-                if not stripped_line.startswith(constants.COMMENT_ANNOTATION):
-                    # find usage of variable via regular expression (${variable_name}), and check if it is defined
-                    # The regex matches the first "${", then it matches everything that's not a "}":
-                    # \$\{ matches the character "${" literally
-                    # the capturing group ([^}]+) greedily matches anything that's not a "}"
-                    match = search('\${([^}]+)', stripped_line)
-                    if match and match.group(1) not in defined_variables_list:
-                        if flag_first:
-                            flag_first = False
-                            print("\nFound usage of undefined variable:")
-                        print(vhost_file + ":" + str(line_index) + " : " + match.group(1))
-                        logger.error("FileOperationsUtility: Undefined variable usage found at : %s",
-                                     vhost_file + ":" + str(line_index) + " : " + match.group(1))
+            dir_path (str): The directory to be searched under for vhost, rule and variables files
+            farm_dir_path (str): The directory to be searched under for farm files
+            variable_index (VariableIndex): The index of the defined variables (and of the consolidated variables file)
+            conversion_step (ConversionStep): The conversion step to which the performed actions are to be added.
+        """
+        # index the variable usages in the vhost files, every usage in a line is found
+        for vhost_file in config_tree.__glob__(join(dir_path, "**", "*." + constants.VHOST)):
+            if config_tree.__isfile__(vhost_file):
+                variable_index.__add_usages__(vhost_file)
+        undefined_usages = variable_index.__get_undefined_usages__()
+        if undefined_usages:
+            print("\nFound usage of undefined variable:")
+        for file_path, line_number, variable in undefined_usages:
+            print(file_path + ":" + str(line_number) + " : " + variable)
+            logger.error("FileOperationsUtility: Undefined variable usage found at : %s",
+                         file_path + ":" + str(line_number) + " : " + variable)
+        # variables only used in rule files (e.g. rewrite rules), in the value of other variables (`Define B ${A}`) or
+        # in farm files are not unused
+        # (the usages in farm files are not checked, since they still use the AMS variables at this point)
+        for file in config_tree.__glob__(join(dir_path, "**", "*.rules")) + \
+                config_tree.__glob__(join(dir_path, "**", "*.vars")) + \
+                config_tree.__glob__(join(farm_dir_path, "**", "*." + constants.FARM)) + \
+                config_tree.__glob__(join(farm_dir_path, "**", "*.any")):
+            if config_tree.__isfile__(file):
+                variable_index.__add_usages__(file)
+        for file_path, line_number, variable in variable_index.__get_unused_variables__():
+            logger.warning("FileOperationsUtility: Variable '%s' defined at %s is not used.", variable,
+                           file_path + ":" + str(line_number))
+            conversion_operation = ConversionOperation(constants.WARNING, file_path + ":" + str(line_number),
+                                                       "Variable '" + variable + "' is not used")
+            conversion_step.__add_operation__(conversion_operation)
 
     @staticmethod
     def __consolidate_all_rule_files_into_single_rule_file__(rule_files, consolidated_rule_file_path, conversion_step):
@@ -1227,11 +1349,8 @@ class FileOperationsUtility:
             rule_file_content.extend(FileOperationsUtility.__get_content_from_file__(file, True))
             rule_file_content.append("\n")
             FileOperationsUtility.__delete_file__(file, conversion_step)
-        with open(consolidated_rule_file_path, "w") as f:
-            pass
-            # write the list of consolidated rules into the new file
-            for line_from_rule_file_content in rule_file_content:
-                f.write(line_from_rule_file_content)
+        # write the list of consolidated rules into the new file
+        config_tree.__write_lines__(consolidated_rule_file_path, rule_file_content)
         logger.info("FileOperationsUtility: Consolidated content of rule files %s into %s",
                     ', '.join(rule_files), consolidated_rule_file_path)
         conversion_operation = ConversionOperation(constants.ACTION_ADDED, dirname(consolidated_rule_file_path),
@@ -1268,13 +1387,11 @@ class FileOperationsUtility:
         Returns:
              a set of file (from among the given rule files) which are actually included/used.
         """
-        if exists(file_path) and isfile(file_path):
+        if config_tree.__isfile__(file_path):
             rule_files_included = set()
             try:
-                # open the file and read the file
-                with open(file_path) as file:
-                    file_content = file.readlines()
-                file.close()
+                # read the file
+                file_content = config_tree.__read_lines__(file_path)
                 # find all rule files (from the given list of rule files to check) that are actually included/used
                 for line in file_content:
                     stripped_line = line.strip()
@@ -1291,3 +1408,11 @@ class FileOperationsUtility:
             except OSError as e:
                 logger.error("FileOperationsUtility: %s - %s.", e.filename, e.strerror)
             return rule_files_included
+
+    @staticmethod
+    def __indentation(line):
+        """
+        Get the leading whitespace of a line.
+        """
+        return line[:len(line) - len(line.lstrip())]
+
@@ -0,0 +1,241 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util.config_tree import config_tree
+from util.setup_logger_utility import logger
+from util.conversion_report.conversion_step import ConversionStep
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+
+class FileTransformer:
+    """
+    Fuses the line-level transforms of several rules working on the same files into a single pass over each file.
+
+    Every rule registers a transform, along with the glob patterns of the files it applies to and its conversion step.
+    A transform may also give the tokens it looks for (e.g. the names of the variables it rewrites): it is then only
+    applied to the files containing any of them (see `ConfigTree.__contains_any__`), and files no transform applies
+    to are neither read nor handed to the worker processes.
+    When applied, every file is read once, the transforms collect their line edits (in the order they were
+    registered) on top of each other, and the file is written once. The operations of every transform are added to
+    its own conversion step, in the order the transform would have reported them if it had run on its own: file by
+    file, or, for a transform registered as ordered, by the key it returned every operation with (e.g. variable by
+    variable).
+
+    A transform is a function `transform(file_path, file_content, line_edits, conversion_step)`:
+    `file_content` holds the lines of the file before any transform (it must not be modified), and `line_edits` the
+    edits collected so far, mapping the index of a line to the lines replacing it (an empty list removes the line).
+    A transform adds its own edits to `line_edits`, skips lines already removed, and rewrites the replacement of lines
+    already replaced (see `__get_current_lines__`). An ordered transform returns its operations as `(key, operation)`
+    pairs rather than adding them to `conversion_step`. Transforms must be idempotent: a file reachable through several
+    paths (symlinks) is only transformed once by every transform.
+
+    With several workers, the files are transformed in parallel by a pool of processes. Transforms then run without
+    the configuration tree: they must be picklable (module level functions, public static methods, or `partial`s of
+    them) and get parsed content through `__get_parsed__` only.
+
+    Attributes:
+    __transforms (List[Tuple[Callable, List[str], ConversionStep, List[str], bool]]): The registered transforms, with
+    the glob patterns of their files, their conversion step, the tokens they look for and whether they are ordered.
+    __workers (int): The number of worker processes transforming the files (`1` transforms them in this process).
+    """
+    __transforms = None
+    __workers = 1
+
+    # whether the current process is a worker process, without access to the configuration tree
+    __in_worker = False
+
+    # the number of worker processes left to the current process, if it runs alongside other processes
+    # (see `RuleScheduler`), `None` if not limited
+    __worker_share = None
+
+    def __init__(self, workers=1):
+        """
+        Parameters:
+            workers (int): The number of worker processes transforming the files
+        """
+        self.__transforms = []
+        self.__workers = workers
+
+    @staticmethod
+    def __apply_line_edits__(lines: List[str], line_edits):
+        """
+        Build new content from given lines, replacing the lines at the indices in `line_edits` with the corresponding
+        list of lines (an empty list removes the line). Unchanged stretches are copied as whole slices.
+        """
+        new_lines = []
+        start = 0
+        for index in sorted(line_edits):
+            new_lines.extend(lines[start:index])
+            new_lines.extend(line_edits[index])
+            start = index + 1
+        new_lines.extend(lines[start:])
+        return new_lines
+
+    @staticmethod
+    def __get_current_lines__(file_content: List[str], line_edits, index):
+        """
+        Get the current content of given line, i.e. its replacement if an earlier transform edited it (an empty list
+        if it was removed).
+        """
+        return line_edits[index] if index in line_edits else [file_content[index]]
+
+    @staticmethod
+    def __get_parsed__(file_path, file_content: List[str], parser):
+        """
+        Get `parser(file_content)` for the file being transformed. The result is shared with the other rules through
+        the configuration tree, except in worker processes, where the content is parsed directly.
+        """
+        if FileTransformer.__in_worker:
+            return parser(file_content)
+        return config_tree.__get_parsed__(file_path, parser)
+
+    @staticmethod
+    def __set_worker_share__(worker_share):
+        """
+        Limit the number of worker processes of the transformers of the current process (and of the processes it
+        forks), e.g. to its share of the workers while several processes run rules at once (`None` for no limit).
+        """
+        FileTransformer.__worker_share = worker_share
+
+    def __add_transform__(self, transform, file_patterns: List[str], conversion_step, tokens=None,
+                          ordered=False):
+        """
+        Register a transform.
+
+        Parameters:
+            transform (Callable): The transform, see `FileTransformer`
+            file_patterns (List[str]): The glob patterns of the files to be transformed, looked up when applied
+            conversion_step (ConversionStep): The conversion step to which the performed actions are to be added
+            tokens (List[str]): The tokens the transform looks for, it is only applied to the (original content of
+                the) files containing any of them; `None` to apply it to all files
+            ordered (bool): Whether the transform returns its operations along with a key, by which they are ordered
+                across all its files (the order is stable, operations with the same key stay file by file), rather
+                than adding them to its conversion step
+        """
+        self.__transforms.append((transform, file_patterns, conversion_step, tokens, ordered))
+
+    def __apply__(self):
+        """
+        Apply all registered transforms, in a single pass over each file.
+        """
+        # the files of every transform (in the order the transform processes them), along with the transforms of
+        # every (real) file
+        files_of_transforms = []
+        files = []
+        transforms_of_files = {}
+        skipped_file_count = 0
+        for transform_index, (transform, file_patterns, conversion_step, tokens, ordered) \
+                in enumerate(self.__transforms):
+            transform_files = []
+            for file_pattern in file_patterns:
+                for file_path in config_tree.__glob__(file_pattern):
+                    if not config_tree.__isfile__(file_path):
+                        continue
+                    real_path = config_tree.__realpath__(file_path)
+                    # a file reachable through several paths is transformed through the first one
+                    if transform_index in transforms_of_files.get(real_path, ()):
+                        continue
+                    # files not containing any of the tokens the transform looks for cannot match
+                    try:
+                        if tokens is not None and not config_tree.__contains_any__(file_path, tokens):
+                            skipped_file_count += 1
+                            continue
+                    except OSError as e:
+                        logger.error("FileTransformer: %s - %s.", e.filename, e.strerror)
+                        continue
+                    if real_path not in transforms_of_files:
+                        files.append(real_path)
+                        transforms_of_files[real_path] = {}
+                    transforms_of_files[real_path][transform_index] = file_path
+                    transform_files.append(real_path)
+            files_of_transforms.append(transform_files)
+        # read every file, along with the transforms to apply to it (in registration order)
+        jobs = []
+        for real_path in files:
+            transforms_of_file = transforms_of_files[real_path]
+            file_transforms = []
+            for transform_index in sorted(transforms_of_file):
+                transform, file_patterns, conversion_step, tokens, ordered = self.__transforms[transform_index]
+                file_transforms.append((transform_index, transforms_of_file[transform_index], transform,
+                                        conversion_step.__get_rule__(), conversion_step.__get_description__()))
+            try:
+                jobs.append((real_path, file_transforms, config_tree.__read_lines__(file_transforms[0][1])))
+            except OSError as e:
+                logger.error("FileTransformer: %s - %s.", e.filename, e.strerror)
+        workers = self.__workers if FileTransformer.__worker_share is None \
+            else min(self.__workers, FileTransformer.__worker_share)
+        if workers > 1 and len(jobs) > 1:
+            logger.info("FileTransformer: Transforming %d files with %d worker processes.", len(jobs), workers)
+            # no thread of the tree (e.g. reading files ahead) may run while the worker processes are forked
+            config_tree.__stop_io__()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(FileTransformer.__transform_file_in_worker__,
+                                            [file_transforms for real_path, file_transforms, file_content in jobs],
+                                            [file_content for real_path, file_transforms, file_content in jobs],
+                                            chunksize=max(1, len(jobs) // (workers * 4))))
+        else:
+            results = [FileTransformer.__transform_file(file_transforms, file_content)
+                       for real_path, file_transforms, file_content in jobs]
+        # write the transformed files, and collect the operations performed by every transform on every file
+        operations = {}
+        for (real_path, file_transforms, file_content), (line_edits, operations_of_file) in zip(jobs, results):
+            if line_edits:
+                config_tree.__write_lines__(file_transforms[0][1],
+                                            FileTransformer.__apply_line_edits__(file_content, line_edits))
+            for transform_index, transform_operations in operations_of_file.items():
+                operations[(transform_index, real_path)] = transform_operations
+        # add the operations to the conversion steps, in the order of the files of every transform (or of its key)
+        for transform_index, (transform, file_patterns, conversion_step, tokens, ordered) \
+                in enumerate(self.__transforms):
+            transform_operations = [keyed_operation for real_path in files_of_transforms[transform_index]
+                                    for keyed_operation in operations.get((transform_index, real_path), [])]
+            if ordered:
+                transform_operations.sort(key=lambda keyed_operation: keyed_operation[0])
+            for key, operation in transform_operations:
+                conversion_step.__add_operation__(operation)
+        logger.debug("FileTransformer: Applied %d transforms to %d files (%d files skipped by the transforms not "
+                     "finding their tokens).", len(self.__transforms), len(files), skipped_file_count)
+
+    @staticmethod
+    def __transform_file_in_worker__(file_transforms, file_content: List[str]):
+        """
+        Transform a file in a worker process (see `__transform_file`).
+        """
+        FileTransformer.__in_worker = True
+        return FileTransformer.__transform_file(file_transforms, file_content)
+
+    @staticmethod
+    def __transform_file(file_transforms, file_content: List[str]):
+        """
+        Apply the transforms to the content of a file.
+
+        Parameters:
+            file_transforms (List[Tuple[int, str, Callable, str, str]]): The index, file path, function, and rule and
+                description of the conversion step of every transform to apply, in registration order
+            file_content (List[str]): The lines of the file
+
+        Returns:
+            Tuple[dict, dict]: The line edits of all transforms, and the operations performed by every transform,
+                along with their key (`None` for the transforms which are not ordered)
+        """
+        line_edits = {}
+        operations = {}
+        for transform_index, file_path, transform, rule, description in file_transforms:
+            file_step = ConversionStep(rule, description)
+            keyed_operations = transform(file_path, file_content, line_edits, file_step)
+            operations[transform_index] = keyed_operations if keyed_operations is not None \
+                else [(None, operation) for operation in file_step.__get_operations__()]
+        return line_edits, operations
@@ -13,14 +13,13 @@
 """
 
 from util import constants
+from util.config_tree import config_tree
 from util.setup_logger_utility import logger
 from util.conversion_report.conversion_step import ConversionStep
 from util.conversion_report.conversion_operation import ConversionOperation
 
-from os import rename
 from ntpath import basename
-from os.path import exists, isdir, dirname
-from shutil import rmtree
+from os.path import dirname
 
 
 class FolderOperationsUtility:
@@ -39,9 +38,9 @@ class FolderOperationsUtility:
         """
 
         # if is directory
-        if exists(dir_path) and isdir(dir_path):
+        if config_tree.__isdir__(dir_path):
             try:
-                rmtree(dir_path)
+                config_tree.__rmtree__(dir_path)
                 conversion_operation = ConversionOperation(constants.ACTION_DELETED, dir_path,
                                                            "Deleted folder " + dir_path)
                 conversion_step.__add_operation__(conversion_operation)
@@ -61,9 +60,9 @@ class FolderOperationsUtility:
         """
 
         # if path exists
-        if exists(src_path) and isdir(src_path):
+        if config_tree.__isdir__(src_path):
             try:
-                rename(src_path, dest_path)
+                config_tree.__rename__(src_path, dest_path)
                 conversion_operation = ConversionOperation(constants.ACTION_RENAMED, dirname(src_path), "Renamed folder "
                                                            + basename(src_path) + " to " + basename(dest_path))
                 conversion_step.__add_operation__(conversion_operation)
@@ -0,0 +1,164 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util import constants
+from util.config_tree import config_tree
+from util.setup_logger_utility import logger
+
+from glob import glob
+from os import sep
+from os.path import abspath, join, normpath
+from typing import List
+
+
+class IncludeIndex:
+    """
+    An index of the include statements (`Include` in vhost files, `$include` in farm files) of the configuration
+    tree, mapping every include statement to the files containing it.
+
+    The index is built lazily, per file extension, the first time files of that extension are looked up. It follows
+    the changes made to the configuration tree: files created, modified, moved or removed by the conversion rules are
+    re-indexed on the next lookup.
+
+    Attributes:
+    __files_by_statement (dict): The files (absolute paths) containing each include statement (stripped line).
+    __statements_by_file (dict): The include statements contained in each indexed file.
+    __indexed_extensions (set): The file extensions indexed so far.
+    __outdated_files (set): The files changed since they were last indexed.
+    """
+    __files_by_statement = None
+    __statements_by_file = None
+    __indexed_extensions = None
+    __outdated_files = None
+
+    def __init__(self):
+        self.__reset(None)
+        config_tree.__add_listener__(self.__reset)
+
+    @staticmethod
+    def __find_include_statements__(lines: List[str]):
+        """
+        Find the include statements (`Include` or `$include`) in the lines of a file.
+
+        Parameters:
+            lines (List[str]): The lines of the file
+
+        Returns:
+            List[Tuple[int, str]]: The index and stripped content of each line holding an include statement
+        """
+        statements = []
+        for index, line in enumerate(lines):
+            stripped_line = line.strip()
+            if stripped_line.startswith(constants.INCLUDE_SYNTAX_IN_VHOST) \
+                    or stripped_line.startswith(constants.INCLUDE_SYNTAX_IN_FARM):
+                statements.append((index, stripped_line))
+        return statements
+
+    @staticmethod
+    def __matches_any__(stripped_line, include_statement_syntax, included_file_names: List[str]):
+        """
+        Get the file name (of the given ones) included by the (stripped) line, if it is an include statement of given
+        syntax. If several file names match, the longest one is returned (e.g. `custom_rewrite.rules` rather than
+        `rewrite.rules`).
+
+        Returns:
+            str: The included file name, or `None` if the line does not include any of the files
+        """
+        if not stripped_line.startswith(include_statement_syntax):
+            return None
+        matching_names = [name for name in included_file_names if stripped_line.find(name) > 1]
+        return max(matching_names, key=len) if matching_names else None
+
+    def __get_files_including_any__(self, dir_path, file_extension, include_statement_syntax, included_file_names):
+        """
+        Get the files (of given file extension) in specified directory and sub-directories, which contain an include
+        statement of given syntax including any of the given files. Files reachable through several paths (symlinks)
+        are only returned once, symlinks to files outside of the directory are returned by the path of the symlink.
+
+        Parameters:
+            dir_path (str): The path to directory whose files are to be looked up
+            file_extension (str): The extension of the files to be looked up
+            include_statement_syntax (str): The syntax of the include statement to be looked for
+            included_file_names (Iterable[str]): The file names (in include statement) to be looked for
+
+        Returns:
+            List[str]: The (sorted) paths of the files, relative to `dir_path` as given
+        """
+        included_file_names = list(included_file_names)
+        root = config_tree.__get_root__()
+        dir_real_path = normpath(abspath(dir_path))
+        if root is None or not (dir_real_path == root or dir_real_path.startswith(root + sep)):
+            # not part of the configuration tree, look up the files directly
+            return [file for file in sorted(glob(join(dir_path, "**", "*." + file_extension), recursive=True))
+                    if any(IncludeIndex.__matches_any__(stripped_line, include_statement_syntax, included_file_names)
+                           is not None for index, stripped_line in
+                           config_tree.__get_parsed__(file, IncludeIndex.__find_include_statements__))]
+        self.__update(root, file_extension)
+        files = set()
+        for stripped_line, statement_files in self.__files_by_statement.items():
+            if IncludeIndex.__matches_any__(stripped_line, include_statement_syntax, included_file_names) is not None:
+                files.update(statement_files)
+        if not files:
+            return []
+        # the files are indexed by their real path, they are returned by their path under given directory (the path of
+        # the symlink, for symlinks to files outside of the directory), through the first path reaching them
+        matching_files = []
+        for file in config_tree.__glob__(join(dir_path, "**", "*." + file_extension)):
+            if config_tree.__isfile__(file):
+                real_path = config_tree.__realpath__(file)
+                if real_path in files:
+                    files.discard(real_path)
+                    matching_files.append(file)
+        return matching_files
+
+    def __reset(self, file_path):
+        """
+        Mark given file as outdated (or the complete index, if no file is given).
+        """
+        if file_path is None:
+            self.__files_by_statement = {}
+            self.__statements_by_file = {}
+            self.__indexed_extensions = set()
+            self.__outdated_files = set()
+        elif file_path in self.__statements_by_file \
+                or any(file_path.endswith("." + extension) for extension in self.__indexed_extensions):
+            # files indexed through a symlink keep the extension of their target
+            self.__outdated_files.add(file_path)
+
+    def __update(self, root, file_extension):
+        """
+        Index the files of given extension (if not yet done) and re-index the outdated files.
+        """
+        if file_extension not in self.__indexed_extensions:
+            self.__indexed_extensions.add(file_extension)
+            self.__outdated_files.update(config_tree.__realpath__(file) for file in
+                                         config_tree.__glob__(join(root, "**", "*." + file_extension))
+                                         if config_tree.__isfile__(file))
+        for file in self.__outdated_files:
+            for stripped_line in self.__statements_by_file.pop(file, ()):
+                self.__files_by_statement[stripped_line].discard(file)
+            if not config_tree.__isfile__(file):
+                continue
+            statements = set(stripped_line for index, stripped_line in
+                             config_tree.__get_parsed__(file, IncludeIndex.__find_include_statements__))
+            self.__statements_by_file[file] = statements
+            for stripped_line in statements:
+                self.__files_by_statement.setdefault(stripped_line, set()).add(file)
+        if self.__outdated_files:
+            logger.debug("IncludeIndex: Indexed include statements of %d files.", len(self.__outdated_files))
+            self.__outdated_files = set()
+
+
+# the include index of the shared configuration tree
+include_index = IncludeIndex()
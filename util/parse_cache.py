@@ -0,0 +1,247 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util.atomic_file_utility import AtomicFileUtility
+from util.setup_logger_utility import logger
+
+from hashlib import sha256
+from io import BytesIO
+from os import makedirs, remove, stat, utime, walk
+from os.path import dirname, join
+from pickle import Pickler, Unpickler, UnpicklingError
+from sys import modules
+from typing import List
+
+
+class ParseCache:
+    """
+    A persistent cache of the parsed representations of files (e.g. the `FarmFile` of a `.any` file), shared by all
+    runs (and conversions) using the same cache folder, so unchanged files are not parsed again by the next run.
+
+    Every parsed representation is stored as `<hash[:2]>/<hash>`, keyed by the SHA-256 hash of the parser, of the
+    source of its module and of the content of the file: a file changed since it was cached gets a new entry, and so
+    do all files once the parser (or the classes of its parsed representations, defined in the same module) changed,
+    while identical files (e.g. the default farm files of every tenant) share one, whatever their path or
+    modification time. Every entry holds the hash of its data, so corrupt entries are detected, removed and parsed
+    again. The lines of the file are not stored: the parsed representation refers to the lines it is loaded for
+    instead. As the lines are read anyway, there is no key by path, size and modification time: hashing the content
+    only takes a small part of loading an entry (about 4%, loading the entry itself taking most of the time).
+    The entries are pickled: the hash of an entry detects corruption, not tampering. Loading an entry only creates
+    instances of the classes defined in the modules of the parsers (see `ParseCacheUnpickler`), but the cache folder
+    must still be trusted, i.e. only be writable by the users running the converter.
+    Entries are touched when used, and `__evict__` removes the least recently used entries once the cache exceeds its
+    maximum size. A read-only cache (e.g. for a dry run) only loads entries: it neither stores, touches, rebuilds nor
+    evicts any.
+
+    Attributes:
+    __cache_path (str): The path to the cache folder.
+    __max_size (int): The maximum size of the cache, in bytes.
+    __parsers (List[Callable]): The parsers whose parsed representations are cached.
+    __read_only (bool): Whether nothing is written to the cache folder.
+    __parser_keys (dict): The key of every parser (its name and the hash of the source of its module), keyed by the
+    parser.
+    __hit_count (int): The number of parsed representations loaded from the cache.
+    __miss_count (int): The number of files parsed (and cached).
+    __rebuilt_count (int): The number of corrupt entries parsed again.
+    """
+    __cache_path = None
+    __max_size = 0
+    __parsers = None
+    __read_only = False
+    __parser_keys = None
+    __hit_count = 0
+    __miss_count = 0
+    __rebuilt_count = 0
+
+    # pickle protocol of the entries (supported by all python versions running the converter)
+    __PROTOCOL = 4
+
+    # the persistent id standing for the lines of the file in the entries
+    __LINES_ID = "lines"
+
+    def __init__(self, cache_path, max_size, parsers, read_only=False):
+        """
+        Parameters:
+            cache_path (str): The path to the cache folder (created if required)
+            max_size (int): The maximum size of the cache, in bytes
+            parsers (List[Callable[[List[str]], Any]]): The parsers whose parsed representations are cached (module
+                level functions or static methods, identified by their name)
+            read_only (bool): Whether entries are only loaded, nothing being written to the cache folder
+        """
+        self.__cache_path = cache_path
+        self.__max_size = max_size
+        self.__parsers = parsers
+        self.__read_only = read_only
+        self.__parser_keys = {}
+        for parser in parsers:
+            try:
+                self.__parser_keys[parser] = ParseCache.__get_parser_key(parser)
+            except (OSError, AttributeError, TypeError) as e:
+                # the parser is simply run
+                logger.debug("ParseCache: Not caching %s, its source cannot be read - %s.", parser.__qualname__, e)
+
+    def __get_parsed__(self, lines: List[str], parser):
+        """
+        Get `parser(lines)`, loaded from the cache if the content was parsed before, and stored in the cache otherwise.
+        Parsers not cached are simply run.
+
+        Parameters:
+            lines (List[str]): The lines of the file
+            parser (Callable[[List[str]], Any]): The function parsing the lines of the file
+        """
+        if parser not in self.__parser_keys:
+            return parser(lines)
+        digest = sha256((self.__parser_keys[parser] + "\n" + "".join(lines)).encode()).hexdigest()
+        entry_path = join(self.__cache_path, digest[:2], digest)
+        try:
+            with open(entry_path, "rb") as file:
+                data = file.read()
+        except OSError:
+            data = None
+        if data is not None:
+            try:
+                parsed = self.__load(data, lines)
+                if not self.__read_only:
+                    utime(entry_path)
+                self.__hit_count += 1
+                return parsed
+            except Exception as e:
+                # the entry is parsed again and replaced
+                logger.debug("ParseCache: Rebuilding corrupt entry %s - %s.", entry_path, e)
+                self.__rebuilt_count += 1
+        self.__miss_count += 1
+        parsed = parser(lines)
+        if self.__read_only:
+            return parsed
+        try:
+            ParseCache.__store(entry_path, ParseCache.__dump(parsed, lines))
+        except OSError as e:
+            logger.debug("ParseCache: Could not store %s - %s.", entry_path, e.strerror)
+        return parsed
+
+    def __evict__(self):
+        """
+        Remove the least recently used entries until the cache does not exceed its maximum size (nothing is removed
+        from a read-only cache).
+        """
+        if self.__read_only:
+            logger.info("ParseCache: %d files loaded from %s, %d files parsed (read-only, nothing stored or evicted).",
+                        self.__hit_count, self.__cache_path, self.__miss_count)
+            return
+        entries = []
+        cache_size = 0
+        for dir_path, dir_names, file_names in walk(self.__cache_path):
+            for file_name in file_names:
+                path = join(dir_path, file_name)
+                try:
+                    stats = stat(path)
+                except OSError:
+                    # removed by another run meanwhile
+                    continue
+                entries.append((stats.st_mtime_ns, stats.st_size, path))
+                cache_size += stats.st_size
+        evicted_count = 0
+        for mtime, size, path in sorted(entries):
+            if cache_size <= self.__max_size:
+                break
+            try:
+                remove(path)
+            except OSError:
+                pass
+            cache_size -= size
+            evicted_count += 1
+        logger.info("ParseCache: %d files loaded from %s, %d files parsed (%d corrupt entries rebuilt), %d entries "
+                    "evicted (%d bytes kept).", self.__hit_count, self.__cache_path, self.__miss_count,
+                    self.__rebuilt_count, evicted_count, cache_size)
+
+    @staticmethod
+    def __dump(parsed, lines):
+        """
+        Serialize a parsed representation, without the lines it refers to, prefixed by the hash of the data.
+        """
+        buffer = BytesIO()
+        pickler = Pickler(buffer, ParseCache.__PROTOCOL)
+        pickler.persistent_id = lambda value: ParseCache.__LINES_ID if value is lines else None
+        pickler.dump(parsed)
+        data = buffer.getvalue()
+        return sha256(data).digest() + data
+
+    def __load(self, data, lines):
+        """
+        Deserialize a parsed representation, referring to given lines, after checking the hash of the data. Only the
+        classes of the modules of the parsers are loaded.
+        """
+        digest_size = sha256().digest_size
+        if sha256(data[digest_size:]).digest() != data[:digest_size]:
+            raise ValueError("hash mismatch")
+        return ParseCacheUnpickler(BytesIO(data[digest_size:]), lines,
+                                   set(parser.__module__ for parser in self.__parser_keys)).load()
+
+    @staticmethod
+    def __get_parser_key(parser):
+        """
+        Get the key of a parser: its name and the hash of the source of its module, which defines the classes of its
+        parsed representations as well.
+        """
+        with open(modules[parser.__module__].__file__, "rb") as file:
+            return parser.__module__ + "." + parser.__qualname__ + " " + sha256(file.read()).hexdigest()
+
+    @staticmethod
+    def __store(entry_path, data):
+        """
+        Write an entry atomically (see `AtomicFileUtility`), so concurrent runs never see a partially written entry.
+        """
+        makedirs(dirname(entry_path), exist_ok=True)
+        AtomicFileUtility.__write__(entry_path, data)
+
+
+class ParseCacheUnpickler(Unpickler):
+    """
+    Loads the entries of a `ParseCache`: the lines of the file take the place of the persistent id standing for them,
+    and only classes defined in given modules (the modules of the parsers) are loaded, any other global (e.g. a
+    function an entry would call) is refused.
+
+    Attributes:
+    __lines (List[str]): The lines of the file the entry is loaded for.
+    __modules (set): The names of the modules whose classes may be loaded.
+    """
+    __lines = None
+    __modules = None
+
+    def __init__(self, file, lines: List[str], allowed_modules):
+        """
+        Parameters:
+            file (IO[bytes]): The data of the entry
+            lines (List[str]): The lines of the file the entry is loaded for
+            allowed_modules (set): The names of the modules whose classes may be loaded
+        """
+        super().__init__(file)
+        self.__lines = lines
+        self.__modules = allowed_modules
+
+    def persistent_load(self, persistent_id):
+        """
+        Get the object standing for a persistent id, i.e. the lines of the file.
+        """
+        return self.__lines
+
+    def find_class(self, module, name):
+        """
+        Get the class with given name, refusing anything but the classes of the allowed modules.
+        """
+        if module in self.__modules:
+            value = getattr(modules[module], name, None)
+            if isinstance(value, type) and value.__module__ == module:
+                return value
+        raise UnpicklingError("ParseCacheUnpickler: Refusing to load " + module + "." + name)
@@ -0,0 +1,272 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util.config_tree import config_tree
+from util.file_transformer import FileTransformer
+from util.setup_logger_utility import logger
+
+from multiprocessing import get_context
+from os import sep
+from os.path import abspath, normpath
+from traceback import format_exc
+
+
+class RuleScheduler:
+    """
+    RuleScheduler runs the conversion rules, each declaring the paths it reads and writes, and writes the configuration
+    tree back to disk. Rules depending on each other run in order in the same lane, independent lanes run in forked
+    processes, each on its own copy of the tree. Every process writes back the paths of its own rules only once the
+    rules of all processes ran, so no rule sees the changes of another lane. The threads of the tree are stopped before
+    forking (`ConfigTree.__stop_io__`): a forked process would not get them, and would miss the reads and writes they
+    had pending.
+    """
+
+    # private attributes
+    # the rules, along with the paths they read, write, and read through a parser
+    __rules = None
+    # maximum number of lanes running at once
+    __workers = 1
+    # manifest of the previous and current conversion, `None` to run all rules
+    __manifest = None
+    __changed_file_count = 0
+    __patch_entries = None
+
+    def __init__(self, workers=1, manifest=None):
+        """
+        Parameters:
+            workers (int): The maximum number of lanes running at once
+            manifest (ConversionManifest): The manifest of the conversion, `None` to run all rules
+        """
+        self.__rules = []
+        self.__workers = workers
+        self.__manifest = manifest
+
+    def __add_rule__(self, rule, read_paths, write_paths, parsed_read_paths=None):
+        """
+        Add a rule, running after the rules added so far it depends on.
+
+        Parameters:
+            rule (Callable[[], List[ConversionStep]]): The rule
+            read_paths (List[str]): The paths of the files and folders read by the rule
+            write_paths (List[str]): The paths of the files and folders written (created, changed or removed) by the
+                rule
+            parsed_read_paths (List[Tuple[str, Callable[[List[str]], Any]]]): The paths of the files and folders the
+                rule only reads through given parser (see `ConfigTree.__get_parsed__`), e.g. the variables used in the
+                farm files: with a manifest, only a change of the parsed representation of their files makes the rule
+                run again
+        """
+        self.__rules.append((rule, [normpath(abspath(path)) for path in read_paths],
+                             [normpath(abspath(path)) for path in write_paths],
+                             [(normpath(abspath(path)), parser) for path, parser in parsed_read_paths or []]))
+
+    def __run__(self):
+        """
+        Run all rules and write the configuration tree back to disk (see `ConfigTree.__flush__`).
+
+        Returns:
+            List[ConversionStep]: The conversion steps performed by the rules, in the order the rules were added
+        """
+        lanes = self.__get_lanes()
+        steps_of_rules = {}
+        kept_paths = []
+        if self.__manifest is not None:
+            lanes, kept_paths = self.__reuse_lanes(lanes, steps_of_rules)
+        context = RuleScheduler.__get_fork_context()
+        if self.__workers <= 1 or len(lanes) <= 1 or context is None:
+            steps_of_rules.update(self.__run_rules(sorted(index for lane in lanes for index in lane)))
+            self.__changed_file_count = config_tree.__flush__(excluded_paths=kept_paths)
+            self.__patch_entries = config_tree.__get_patch_entries__()
+        else:
+            steps_of_rules.update(self.__run_lanes(context, lanes, kept_paths))
+        if self.__manifest is not None:
+            self.__manifest.__record__(steps_of_rules)
+        return [step for index in range(len(self.__rules)) for step in steps_of_rules[index]]
+
+    def __get_changed_file_count__(self):
+        """
+        Get the number of files written or removed when `__run__` wrote the tree back to disk.
+        """
+        return self.__changed_file_count
+
+    def __get_patch_entries__(self):
+        """
+        Get the entries of the patch collected by all processes when `__run__` wrote the tree back to disk, sorted by
+        path (`None` if the tree does not collect a patch).
+        """
+        return None if self.__patch_entries is None else sorted(self.__patch_entries)
+
+    def __get_lanes(self):
+        """
+        Group the rules into lanes: every rule goes into the lane of the earlier rules writing a path it reads or
+        writes.
+
+        Returns:
+            List[List[int]]: The indices of the rules of every lane, in order
+        """
+        lane_of_rules = list(range(len(self.__rules)))
+        for index, (rule, read_paths, write_paths, parsed_read_paths) in enumerate(self.__rules):
+            paths = read_paths + write_paths + [path for path, parser in parsed_read_paths]
+            for earlier_index in range(index):
+                if RuleScheduler.__overlap(self.__rules[earlier_index][2], paths):
+                    lane = lane_of_rules[earlier_index]
+                    old_lane = lane_of_rules[index]
+                    lane_of_rules = [lane if rule_lane == old_lane else rule_lane for rule_lane in lane_of_rules]
+        lanes = {}
+        for index, lane in enumerate(lane_of_rules):
+            lanes.setdefault(lane, []).append(index)
+        return sorted(lanes.values())
+
+    def __reuse_lanes(self, lanes, steps_of_rules):
+        """
+        Reuse the conversion steps of the lanes whose inputs did not change (see `ConversionManifest`), keeping
+        their paths in the converted configuration; the paths of the other lanes are only written where they differ
+        from the converted configuration (see `ConfigTree.__keep_root__`).
+
+        Returns:
+            Tuple[List[List[int]], List[str]]: The lanes to run, and the paths written by the reused lanes
+        """
+        lanes_to_run = []
+        kept_paths = []
+        for lane in lanes:
+            steps = self.__manifest.__get_reused_steps__(
+                lane, [path for index in lane for path in self.__rules[index][1]], self.__get_write_paths(lane),
+                [parsed_path for index in lane for parsed_path in self.__rules[index][3]])
+            if steps is None:
+                lanes_to_run.append(lane)
+            else:
+                steps_of_rules.update(steps)
+                kept_paths.extend(self.__get_write_paths(lane))
+        logger.info("RuleScheduler: Reusing %d of %d lanes, their inputs did not change since the previous "
+                    "conversion.", len(lanes) - len(lanes_to_run), len(lanes))
+        config_tree.__keep_root__(kept_paths)
+        return lanes_to_run, kept_paths
+
+    def __run_lanes(self, context, lanes, kept_paths):
+        """
+        Run the lanes concurrently, the lanes of the first rule in this process and the other ones in forked
+        processes, then write back the paths written by the rules of every process (except the kept paths of the
+        lanes not run).
+
+        Returns:
+            dict: The conversion steps performed by every rule, keyed by its index
+        """
+        # the lanes are spread over the processes, every process runs the rules of its lanes in order
+        process_count = min(self.__workers, len(lanes))
+        rules_of_processes = [sorted(index for lane in lanes[offset::process_count] for index in lane)
+                              for offset in range(process_count)]
+        logger.info("RuleScheduler: Running %d rules in %d independent lanes with %d processes.", len(self.__rules),
+                    len(lanes), process_count)
+        # every process transforms its files with its share of the workers only
+        FileTransformer.__set_worker_share__(max(1, self.__workers // process_count))
+        # no thread of the tree (e.g. reading files ahead) may run while the processes are forked
+        config_tree.__stop_io__()
+        children = []
+        for rule_indices in rules_of_processes[1:]:
+            connection, child_connection = context.Pipe()
+            process = context.Process(target=self.__run_rules_in_child, args=(rule_indices, child_connection))
+            process.start()
+            children.append((process, connection))
+        completed = False
+        try:
+            steps_of_rules = self.__run_rules(rules_of_processes[0])
+            for process, connection in children:
+                steps_of_rules.update(RuleScheduler.__receive(connection))
+            # all rules ran, every process writes back its own paths
+            for process, connection in children:
+                connection.send(True)
+            # this process writes back everything but the paths of the forked processes (e.g. the entries never
+            # changed, which are written as well when the tree is staged)
+            self.__changed_file_count = config_tree.__flush__(
+                excluded_paths=kept_paths + self.__get_write_paths([index for rule_indices in rules_of_processes[1:]
+                                                                    for index in rule_indices]))
+            patch_entries = config_tree.__get_patch_entries__()
+            self.__patch_entries = None if patch_entries is None else list(patch_entries)
+            for process, connection in children:
+                changed_file_count, patch_entries = RuleScheduler.__receive(connection)
+                self.__changed_file_count += changed_file_count
+                if self.__patch_entries is not None:
+                    self.__patch_entries.extend(patch_entries)
+            completed = True
+        finally:
+            # after an error, the processes still running are stopped before they write anything back
+            for process, connection in children:
+                if not completed:
+                    process.terminate()
+                process.join()
+                connection.close()
+            FileTransformer.__set_worker_share__(None)
+        return steps_of_rules
+
+    def __run_rules(self, rule_indices):
+        """
+        Run given rules, in order.
+
+        Returns:
+            dict: The conversion steps performed by every rule, keyed by its index
+        """
+        steps_of_rules = {}
+        for index in rule_indices:
+            steps_of_rules[index] = self.__rules[index][0]()
+        return steps_of_rules
+
+    def __run_rules_in_child(self, rule_indices, connection):
+        """
+        Run given rules in a forked process, send their conversion steps back, and write back their paths once told
+        to (i.e. once the rules of all processes ran), sending back the number of changed files and the patch
+        entries of the paths.
+        """
+        try:
+            connection.send((True, self.__run_rules(rule_indices)))
+            connection.recv()
+            changed_file_count = config_tree.__flush__(self.__get_write_paths(rule_indices))
+            config_tree.__wait_for_writes__()
+            connection.send((True, (changed_file_count, config_tree.__get_patch_entries__())))
+        except Exception:
+            connection.send((False, format_exc()))
+        finally:
+            connection.close()
+
+    def __get_write_paths(self, rule_indices):
+        return [path for index in rule_indices for path in self.__rules[index][2]]
+
+    @staticmethod
+    def __receive(connection):
+        """
+        Receive the result of a forked process, raising the error of the process if it failed.
+        """
+        try:
+            succeeded, result = connection.recv()
+        except EOFError:
+            raise RuntimeError("RuleScheduler: A rule process stopped unexpectedly.")
+        if not succeeded:
+            raise RuntimeError("RuleScheduler: A rule failed in a forked process:\n" + result)
+        return result
+
+    @staticmethod
+    def __get_fork_context():
+        """
+        Get the multiprocessing context forking processes, or `None` where processes cannot be forked.
+        """
+        try:
+            return get_context("fork")
+        except ValueError:
+            return None
+
+    @staticmethod
+    def __overlap(paths, other_paths):
+        """
+        Check whether any of the paths is, contains or lies within any of the other paths.
+        """
+        return any(path == other_path or path.startswith(other_path + sep) or other_path.startswith(path + sep)
+                   for path in paths for other_path in other_paths)
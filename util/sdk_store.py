@@ -0,0 +1,146 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util.atomic_file_utility import AtomicFileUtility
+from util.setup_logger_utility import logger
+
+from hashlib import sha256
+from json import dumps, load
+from os import makedirs, stat, walk
+from os.path import abspath, basename, dirname, isfile, join, normpath, relpath
+
+
+class SdkStore:
+    """
+    A persistent, content-addressed store of the files of dispatcher SDKs, shared by all conversions (and runs) using
+    the same store folder.
+
+    Every SDK file is stored once per content, as `objects/<hash[:2]>/<hash>` (the SHA-256 hash of the file). The
+    files of every SDK folder are recorded in `sdks/<hash of the folder path>.json`, along with their size,
+    modification time and hash, and the version of the SDK (the hash of its recorded files): SDK files whose size
+    and modification time did not change since the previous run are neither hashed nor stored again.
+    The conversions stage the SDK files they copy into the configuration from the store (see
+    `ConfigTree.__load_read_only__`), e.g. reflinking them instead of writing them again. Stored objects are never
+    hardlinked into a configuration: the files copied from the SDK (e.g. `default.vhost` or `rules.any`) are the ones
+    customers edit, and editing a hardlinked file would change the object shared by every later conversion. Objects
+    are checked against their hash before they are staged (see `__check_object__`), so an object changed anyway is
+    stored again.
+    """
+
+    # read buffer size when hashing files
+    __BUFFER_SIZE = 1 << 16
+
+    @staticmethod
+    def __store__(root_path, store_path):
+        """
+        Store the files of given SDK folder, unless already stored.
+
+        Parameters:
+            root_path (str): The path to the SDK `src` folder
+            store_path (str): The path to the store folder (created if required)
+
+        Returns:
+            dict: The path of the stored object of every file of the SDK, keyed by the absolute path of the file
+        """
+        root_path = normpath(abspath(root_path))
+        index_path = join(store_path, "sdks", sha256(root_path.encode()).hexdigest() + ".json")
+        recorded_files = SdkStore.__read_index(index_path)
+        files = {}
+        stored_files = {}
+        added_count = 0
+        for dir_path, dir_names, file_names in walk(root_path):
+            for file_name in file_names:
+                path = join(dir_path, file_name)
+                relative_path = relpath(path, root_path)
+                stats = stat(path)
+                recorded = recorded_files.get(relative_path)
+                if recorded is not None and recorded[0] == stats.st_size and recorded[1] == stats.st_mtime_ns:
+                    digest = recorded[2]
+                else:
+                    digest = SdkStore.__hash_file__(path)
+                object_path = join(store_path, "objects", digest[:2], digest)
+                # objects removed from the store (e.g. to free space) are stored again
+                if not isfile(object_path):
+                    SdkStore.__store_file(path, object_path)
+                    added_count += 1
+                files[relative_path] = [stats.st_size, stats.st_mtime_ns, digest]
+                stored_files[path] = object_path
+        version = sha256("".join(relative_path + " " + files[relative_path][2] + "\n"
+                                 for relative_path in sorted(files)).encode()).hexdigest()
+        if files != recorded_files:
+            SdkStore.__write_index(index_path, {"root": root_path, "version": version, "files": files})
+        logger.info("SdkStore: Stored %d files of the SDK %s (version %s) in %s (%d files added).", len(files),
+                    root_path, version[:12], store_path, added_count)
+        return stored_files
+
+    @staticmethod
+    def __check_object__(object_path, path):
+        """
+        Check that a stored object still holds the content it was stored with (its name is the hash of its content),
+        and store the SDK file again if it does not (e.g. a stored object hardlinked by a previous version and edited
+        since).
+
+        Parameters:
+            object_path (str): The path of the stored object
+            path (str): The path of the SDK file the object was stored from
+
+        Returns:
+            bool: `True` if the object is intact, `False` if it was stored again (the SDK file is then to be used
+            instead, in case it changed since it was stored)
+        """
+        if SdkStore.__hash_file__(object_path) == basename(object_path):
+            return True
+        logger.warning("SdkStore: The stored object %s of %s was changed, storing the file again.", object_path, path)
+        SdkStore.__store_file(path, object_path)
+        return False
+
+    @staticmethod
+    def __read_index(index_path):
+        """
+        Read the files recorded for an SDK folder by the previous run (none if the index is missing or unreadable).
+        """
+        try:
+            with open(index_path) as file:
+                files = load(file)["files"]
+            return dict((relative_path, recorded) for relative_path, recorded in files.items()
+                        if isinstance(recorded, list) and len(recorded) == 3)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            if isfile(index_path):
+                logger.debug("SdkStore: Ignoring unreadable index %s - %s.", index_path, e)
+            return {}
+
+    @staticmethod
+    def __write_index(index_path, index):
+        makedirs(dirname(index_path), exist_ok=True)
+        AtomicFileUtility.__write__(index_path, dumps(index, indent=1, sort_keys=True))
+
+    @staticmethod
+    def __store_file(path, object_path):
+        """
+        Copy a file into the store atomically (see `AtomicFileUtility`), so concurrent runs never see a partially
+        written object.
+        """
+        makedirs(dirname(object_path), exist_ok=True)
+        AtomicFileUtility.__copy__(path, object_path)
+
+    @staticmethod
+    def __hash_file__(path):
+        """
+        Get the SHA-256 hash of a file, read one block at a time.
+        """
+        digest = sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(SdkStore.__BUFFER_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
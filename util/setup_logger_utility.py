@@ -15,10 +15,45 @@
 import logging
 from util import constants
 
+from contextlib import contextmanager
+from multiprocessing import current_process
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+
+LOG_DATE_FORMAT = '%a, %d %b %Y %H:%M:%S'
+
+# the log file is created (emptied) by the main process only, and all processes append to it, so that the lines
+# logged by worker processes are not overwritten
+if current_process().name == 'MainProcess':
+    open(constants.LOG_FILE, 'w').close()
 logging.basicConfig(filename=constants.LOG_FILE,
                     level=logging.INFO,
-                    format='%(asctime)s %(levelname)s %(message)s',
-                    datefmt='%a, %d %b %Y %H:%M:%S',
-                    filemode='w')
+                    format=LOG_FORMAT,
+                    datefmt=LOG_DATE_FORMAT,
+                    filemode='a')
+
+logger = logging.getLogger()
+
+
+@contextmanager
+def log_to_file(log_file):
+    """
+    Log to given file (instead of the shared log file) within the block, e.g. while converting a single
+    configuration of a fleet.
 
-logger = logging.getLogger()
\ No newline at end of file
+    Parameters:
+        log_file (str): The path of the log file, created (or emptied) when entering the block
+    """
+    handler = logging.FileHandler(log_file, mode='w')
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+    shared_handlers = list(logger.handlers)
+    for shared_handler in shared_handlers:
+        logger.removeHandler(shared_handler)
+    logger.addHandler(handler)
+    try:
+        yield
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+        for shared_handler in shared_handlers:
+            logger.addHandler(shared_handler)
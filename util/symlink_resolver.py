@@ -0,0 +1,122 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util.config_tree import config_tree
+from util.setup_logger_utility import logger
+
+from os.path import join, dirname
+from typing import List
+
+
+class SymlinkResolver:
+    """
+    Resolves the targets of the symlinks of the configuration tree, both actual (OS) symlinks and "symlink files",
+    i.e. files whose only content is the relative path (`../...`) of the target, as found in AMS configurations
+    checked out without symlink support.
+
+    Resolved targets are cached until the configuration tree changes. Chains of symlink files are followed, and
+    cycles are detected and reported instead of being followed forever.
+
+    Attributes:
+    __targets (dict): The resolved target of each path looked up (`None` for paths caught in a cycle).
+    """
+    __targets = None
+
+    def __init__(self):
+        self.__reset(None)
+        config_tree.__add_listener__(self.__reset)
+
+    @staticmethod
+    def __get_content_lines__(lines: List[str]):
+        """
+        Get the content of a file, i.e. all lines except blank newlines.
+        """
+        return [line for line in lines if line != "\n"]
+
+    def __get_content__(self, file_path):
+        """
+        Get the content (all lines except blank newlines) of given file, following symlinks, or `None` if the file
+        does not exist. The content is cached with the file and must not be modified.
+        """
+        if not config_tree.__isfile__(file_path):
+            return None
+        return config_tree.__get_parsed__(file_path, SymlinkResolver.__get_content_lines__)
+
+    def __is_symlink_file__(self, file_path):
+        """
+        Check whether given file is a symlink file (a single line holding the relative path of the target).
+        """
+        content = self.__get_content__(file_path)
+        return content is not None and len(content) == 1 and content[0].startswith("../")
+
+    def __resolve__(self, file_path):
+        """
+        Get the path of the file given path eventually refers to, following chains of symlink files.
+        (Actual symlinks are followed transparently by the configuration tree.)
+
+        Parameters:
+            file_path (str): The path to resolve
+
+        Returns:
+            str: The path of the target, or `None` if the path is caught in a symlink cycle
+        """
+        if file_path in self.__targets:
+            return self.__targets[file_path]
+        visited = set()
+        target = file_path
+        while True:
+            try:
+                real_path = config_tree.__realpath__(target)
+                if real_path in visited:
+                    logger.error("SymlinkResolver: Found a symlink cycle while resolving %s.", file_path)
+                    target = None
+                    break
+                visited.add(real_path)
+                if not self.__is_symlink_file__(target):
+                    break
+            except OSError as e:
+                logger.error("SymlinkResolver: %s - %s.", e.filename, e.strerror)
+                target = None
+                break
+            target = join(dirname(target), self.__get_content__(target)[0].strip())
+        self.__targets[file_path] = target
+        return target
+
+    def __get_targets__(self, dir_path):
+        """
+        Get the (real) paths of the files targeted by the files and symlinks in given directory.
+
+        Parameters:
+            dir_path (str): The path to the directory (e.g. `enabled_vhosts`)
+
+        Returns:
+            set: The real paths of the targets
+        """
+        targets = set()
+        if config_tree.__isdir__(dir_path):
+            for name in config_tree.__listdir__(dir_path):
+                target = self.__resolve__(join(dir_path, name))
+                if target is not None and config_tree.__isfile__(target):
+                    targets.add(config_tree.__realpath__(target))
+        return targets
+
+    def __reset(self, file_path):
+        """
+        Forget the resolved targets, the configuration tree has changed.
+        """
+        self.__targets = {}
+
+
+# the symlink resolver of the shared configuration tree
+symlink_resolver = SymlinkResolver()
@@ -0,0 +1,169 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util import constants
+from util.config_tree import config_tree
+
+from re import compile
+from typing import List
+
+
+class VariableIndex:
+    """
+    An index of the variable definitions (`Define NAME value` in `.vars` files) and of the variable usages
+    (`${NAME}` in vhost, rule, variables and farm files) of a configuration.
+
+    Attributes:
+    __definitions (dict): The definitions of every variable, as a list of (file, line number, value) tuples.
+    __usages (dict): The usages of every variable, as a list of (file, line number) tuples.
+    __indexed_files (set): The (real) paths of the files whose usages have been indexed.
+    __consolidated_definitions (dict): The (file, line number) of the definition of every variable in the file the
+    variables files were consolidated into.
+    """
+    __definitions = None
+    __usages = None
+    __indexed_files = None
+    __consolidated_definitions = None
+
+    # usage of a variable: "${", followed by the name of the variable (anything that's not a "}"), followed by "}"
+    __VARIABLE_USAGE = compile('\\$\\{([^}]+)\\}')
+
+    # the directive defining a variable
+    __DEFINE = "define"
+
+    def __init__(self):
+        self.__definitions = {}
+        self.__usages = {}
+        self.__indexed_files = set()
+        self.__consolidated_definitions = {}
+
+    @staticmethod
+    def __find_usages__(lines: List[str]):
+        """
+        Find all usages of variables in the (non-comment) lines of a file.
+
+        Parameters:
+            lines (List[str]): The lines of the file
+
+        Returns:
+            List[Tuple[int, str]]: The line number and variable name of every usage, in order
+        """
+        usages = []
+        for index, line in enumerate(lines):
+            if line.lstrip().startswith(constants.COMMENT_ANNOTATION):
+                continue
+            for match in VariableIndex.__VARIABLE_USAGE.finditer(line):
+                usages.append((index + 1, match.group(1)))
+        return usages
+
+    @staticmethod
+    def __find_used_names__(lines: List[str]):
+        """
+        Find the names of the variables used in the (non-comment) lines of a file, e.g. to only depend on the variables
+        used in a file rather than on its content (see `RuleScheduler.__add_rule__`).
+
+        Parameters:
+            lines (List[str]): The lines of the file
+
+        Returns:
+            List[str]: The (sorted) names of the variables used
+        """
+        return sorted(set(name for line_number, name in VariableIndex.__find_usages__(lines)))
+
+    def __add_definitions__(self, file_path, lines: List[str]):
+        """
+        Index the variable definitions in the given lines of a variables file.
+        A variable defined again is recorded as well, it is reported as conflicting if the value differs.
+
+        Parameters:
+            file_path (str): The path to the variables file
+            lines (List[str]): The lines of the file
+
+        Returns:
+            List[Tuple[str, str]]: The name and line of every variable defined for the first time, in order
+        """
+        new_definitions = []
+        for index, line in enumerate(lines):
+            tokens = line.split(None, 2)
+            if len(tokens) < 2 or tokens[0].lower() != VariableIndex.__DEFINE:
+                continue
+            name = tokens[1]
+            value = tokens[2].strip() if len(tokens) > 2 else ""
+            if name not in self.__definitions:
+                self.__definitions[name] = []
+                new_definitions.append((name, line))
+            self.__definitions[name].append((file_path, index + 1, value))
+        return new_definitions
+
+    def __set_consolidated_file__(self, file_path, names: List[str]):
+        """
+        Record the file the variables files were consolidated into, the unused variables are reported against it.
+
+        Parameters:
+            file_path (str): The path to the consolidated variables file
+            names (List[str]): The name of the variable defined by every line of the file, in order
+        """
+        for index, name in enumerate(names):
+            self.__consolidated_definitions[name] = (file_path, index + 1)
+
+    def __add_usages__(self, file_path):
+        """
+        Index the variable usages in given file. Files reachable through several paths (symlinks) are only indexed
+        once.
+
+        Parameters:
+            file_path (str): The path to the vhost, rule, variables or farm file (the usages in a variables file are
+                the ones in the value of its definitions)
+        """
+        real_path = config_tree.__realpath__(file_path)
+        if real_path in self.__indexed_files:
+            return
+        self.__indexed_files.add(real_path)
+        for line_number, name in config_tree.__get_parsed__(file_path, VariableIndex.__find_usages__):
+            self.__usages.setdefault(name, []).append((file_path, line_number))
+
+    def __get_undefined_usages__(self):
+        """
+        Get the usages of variables which are not defined, as (file, line number, name) tuples ordered by file and
+        line (and by position within the line).
+        """
+        undefined_usages = []
+        for name, usages in self.__usages.items():
+            if name not in self.__definitions:
+                undefined_usages.extend((file_path, line_number, name) for file_path, line_number in usages)
+        # the order of the usages within a line is kept
+        return sorted(undefined_usages, key=lambda usage: (usage[0], usage[1]))
+
+    def __get_conflicting_definitions__(self):
+        """
+        Get the variables defined more than once with different values, ordered by name, along with the value of
+        their first definition (the one kept) and the (file, line number, value) definitions whose value differs from
+        it.
+        """
+        conflicting_definitions = []
+        for name, definitions in sorted(self.__definitions.items()):
+            kept_value = definitions[0][2]
+            differing_definitions = [definition for definition in definitions[1:] if definition[2] != kept_value]
+            if differing_definitions:
+                conflicting_definitions.append((name, definitions[0], differing_definitions))
+        return conflicting_definitions
+
+    def __get_unused_variables__(self):
+        """
+        Get the variables of the consolidated variables file which are not used anywhere, as (file, line number, name)
+        tuples ordered by line.
+        """
+        return sorted((file_path, line_number, name)
+                      for name, (file_path, line_number) in self.__consolidated_definitions.items()
+                      if name not in self.__usages)
@@ -0,0 +1,231 @@
+"""
+*************************************************************************
+* Copyright 2020 Adobe. All rights reserved.
+* This file is licensed to you under the Apache License, Version 2.0 (the "License");
+* you may not use this file except in compliance with the License. You may obtain a copy
+* of the License at http://www.apache.org/licenses/LICENSE-2.0
+*
+* Unless required by applicable law or agreed to in writing, software distributed under
+* the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR REPRESENTATIONS
+* OF ANY KIND, either express or implied. See the License for the specific language
+* governing permissions and limitations under the License.
+**************************************************************************/
+"""
+
+from util.setup_logger_utility import logger
+
+from typing import List
+
+
+class VhostDirective:
+    """
+    VhostDirective describes a directive of an Apache configuration file: either a plain directive
+    (e.g. `Include conf.d/rewrites/rewrite.rules`) or a section (e.g. `<IfModule mod_rewrite.c> ... </IfModule>`).
+    The directive only records where it is located in the file; the content itself stays in the lines of the file.
+
+    Attributes:
+    __name (str): The name of the directive, without angle brackets for sections (e.g. `IfModule`).
+    __arguments (str): The arguments of the directive (e.g. `mod_rewrite.c`).
+    __text (str): The directive as written, with continuation lines joined (e.g. `<IfModule mod_rewrite.c>`).
+    __start_line (int): The index of the first line of the directive (or of the opening tag of a section).
+    __end_line (int): The index of the last line of the directive (or of the opening tag of a section).
+    __close_line (int): The index of the line holding the closing tag of a section (last line if it is missing).
+    __closed (bool): Whether the closing tag of the section was found.
+    __children (List[VhostDirective]): The directives within a section, `None` for plain directives.
+    """
+    __name = None
+    __arguments = None
+    __text = None
+    __start_line = None
+    __end_line = None
+    __close_line = None
+    __closed = False
+    __children = None
+
+    def __init__(self, name, arguments, text, start_line, end_line, section=False):
+        """
+        Parameters:
+            name (str): The name of the directive
+            arguments (str): The arguments of the directive
+            text (str): The directive as written, with continuation lines joined
+            start_line (int): The index of the first line of the directive
+            end_line (int): The index of the last line of the directive
+            section (bool): Whether the directive opens a section
+        """
+        self.__name = name
+        self.__arguments = arguments
+        self.__text = text
+        self.__start_line = start_line
+        self.__end_line = end_line
+        self.__close_line = end_line
+        self.__children = [] if section else None
+
+    def __close__(self, close_line, closed=True):
+        self.__close_line = close_line
+        self.__closed = closed
+
+    def __add_child__(self, directive):
+        self.__children.append(directive)
+
+    def __get_name__(self):
+        return self.__name
+
+    def __get_arguments__(self):
+        return self.__arguments
+
+    def __get_text__(self):
+        return self.__text
+
+    def __get_start_line__(self):
+        return self.__start_line
+
+    def __get_end_line__(self):
+        return self.__end_line
+
+    def __get_close_line__(self):
+        return self.__close_line
+
+    def __get_last_line__(self):
+        """
+        Get the index of the last line of the directive, including the content and closing tag of a section.
+        """
+        return self.__close_line if self.__children is not None else self.__end_line
+
+    def __is_section__(self):
+        return self.__children is not None
+
+    def __is_closed__(self):
+        return self.__closed
+
+    def __get_children__(self):
+        return self.__children
+
+    def __walk__(self):
+        """
+        Iterate over all directives within the section (depth first, in document order).
+        """
+        for child in self.__children:
+            yield child
+            if child.__is_section__():
+                yield from child.__walk__()
+
+
+class VhostFile:
+    """
+    VhostFile is the parsed representation (a tree of directives) of an Apache configuration file
+    (`.vhost`, `.rules`, `.vars`, `.conf`).
+
+    Attributes:
+    __lines (List[str]): The lines the file was parsed from.
+    __root (VhostDirective): The section spanning the whole file.
+    __directives (List[VhostDirective]): All directives of the file, in document order.
+    """
+    __lines = None
+    __root = None
+    __directives = None
+
+    def __init__(self, lines, root):
+        self.__lines = lines
+        self.__root = root
+        self.__directives = list(root.__walk__())
+
+    def __get_lines__(self):
+        """
+        Get the lines the file was parsed from (must not be modified).
+        """
+        return self.__lines
+
+    def __get_root__(self):
+        return self.__root
+
+    def __get_directives__(self):
+        return self.__directives
+
+    def __find_sections__(self, section_header):
+        """
+        Get the outermost sections whose opening tag starts with the given header (e.g. `<VirtualHost`), in document
+        order. Sections nested within a matching section are not returned separately.
+
+        Parameters:
+            section_header (str): The section header to look for
+
+        Returns:
+            List[VhostDirective]
+        """
+        sections = []
+        for directive in self.__directives:
+            if not directive.__is_section__() or not directive.__get_text__().startswith(section_header):
+                continue
+            if sections and directive.__get_start_line__() <= sections[-1].__get_close_line__():
+                continue
+            sections.append(directive)
+        return sections
+
+
+class VhostFileParser:
+    """
+    A parser for the Apache configuration syntax: directives, `<Section ...> ... </Section>` blocks (such as
+    `<VirtualHost>`, `<IfModule>`, `<If>` or `<LocationMatch>`), `#` comments and lines continued with a trailing `\\`.
+    """
+
+    @staticmethod
+    def __parse__(lines: List[str]):
+        """
+        Parse the lines of an Apache configuration file into a tree of directives.
+        Unbalanced sections are tolerated: a missing closing tag ends the section at the end of the file, and a
+        closing tag not matching any open section is ignored.
+
+        Parameters:
+            lines (List[str]): The lines of the file
+
+        Returns:
+            VhostFile
+        """
+        root = VhostDirective(None, "", "", -1, -1, True)
+        stack = [root]
+        index = 0
+        while index < len(lines):
+            start_line = index
+            text = lines[index].rstrip("\r\n")
+            # join continuation lines (a backslash at the very end of the line)
+            while text.endswith("\\") and index + 1 < len(lines):
+                index += 1
+                text = text[:-1].rstrip() + " " + lines[index].strip()
+            end_line = index
+            index += 1
+            text = text.strip()
+            if text == "" or text.startswith("#"):
+                continue
+            if text.startswith("</"):
+                name = text[2:].rstrip(">").strip().lower()
+                open_names = [section.__get_name__().lower() for section in stack[1:]]
+                if name not in open_names:
+                    logger.warning("VhostFileParser: Ignoring unbalanced '%s' on line %d.", text, start_line + 1)
+                    continue
+                # close the matching section, along with any section left open within it
+                while True:
+                    section = stack.pop()
+                    if section.__get_name__().lower() == name:
+                        section.__close__(end_line)
+                        break
+                    logger.warning("VhostFileParser: Section '%s' opened on line %d is not closed.",
+                                   section.__get_text__(), section.__get_start_line__() + 1)
+                    section.__close__(start_line - 1, False)
+            elif text.startswith("<"):
+                header = text[1:-1] if text.endswith(">") else text[1:]
+                parts = header.split(None, 1)
+                section = VhostDirective(parts[0] if parts else "", parts[1] if len(parts) > 1 else "", text,
+                                         start_line, end_line, True)
+                stack[-1].__add_child__(section)
+                stack.append(section)
+            else:
+                parts = text.split(None, 1)
+                stack[-1].__add_child__(VhostDirective(parts[0], parts[1] if len(parts) > 1 else "", text,
+                                                       start_line, end_line))
+        while len(stack) > 1:
+            section = stack.pop()
+            logger.warning("VhostFileParser: Section '%s' opened on line %d is not closed.", section.__get_text__(),
+                           section.__get_start_line__() + 1)
+            section.__close__(len(lines) - 1, False)
+        root.__close__(len(lines) - 1)
+        return VhostFile(lines, root)